@@ -1,260 +1,626 @@
-from flask import Flask, render_template, Response, jsonify, send_file, request
+from flask import Flask, render_template, Response, jsonify, request, stream_with_context
 import cv2
-import supervision as sv
-from ultralytics import YOLO
+import numpy as np
 import time
+import json
+import base64
 import os
 import threading
 import sys
 import logging
-import csv
-from datetime import datetime
+import atexit
+import signal
+
+from archive import (EXPORT_FORMATS, DetectionArchive, cluster_columns, combined_columns, export_rows,
+                     iter_export, newest_rows, summarize_range)
+from backends import ModelLoader
+from gps import GpsReader
+from metrics import MetricsRegistry, gauge, start_queue_logging
+from multicam import MultiCameraManager
+from pipeline import FrameBroadcaster, FramePipeline, SharedResource, TooManyClientsError
+from scheduler import InferenceScheduler, measure_cpu
+from sources import CameraDiscovery, ReconnectingSource, create_source, parse_source
+from storage import BatchedDetectionWriter, DetectionStore, parse_bbox, parse_time_range
+from streaming import StreamHub, StreamProfile, parse_profile
+from tracking import CropWriter, PotholeTracker, encode_thumbnail
+from visualizer import (PR_BACKEND_CONFIG, PR_INFERENCE_CONFIG, PR_MODEL_PATH, PyResearchVisualizer,
+                        check_model_exists)
 
 # Flask App Initialization
 app = Flask(__name__)
 
 # Konfiguriere Logging für bessere Sichtbarkeit
+# Terminal und Datei hängen hinter einer Queue - log() blockiert den Frame-Loop nie mit I/O
 log_file = 'flask_app.log'
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(log_file, mode='a', encoding='utf-8')
-    ]
-)
+log_handlers = [
+    logging.StreamHandler(sys.stdout),
+    logging.FileHandler(log_file, mode='a', encoding='utf-8')
+]
+for handler in log_handlers:
+    handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+logging.getLogger().setLevel(logging.INFO)
+log_listener = start_queue_logging(logging.getLogger(), log_handlers)
+atexit.register(log_listener.stop)  # Restliche Log-Einträge beim Beenden schreiben
 logger = logging.getLogger(__name__)
 
 # Deaktiviere Werkzeug/Flask's eigene Logs für klarere Ausgabe
 logging.getLogger('werkzeug').setLevel(logging.WARNING)
 
-# Helper function für sofortige Console-Ausgabe
-def log(message):
-    """Logging mit sofortiger Ausgabe in Terminal UND Datei"""
-    logger.info(message)
-    print(f"[LOG] {message}", flush=True)
-    sys.stdout.flush()
+# Helper function für Console- und Datei-Ausgabe
+def log(message, level=logging.INFO):
+    """Logging in Terminal UND Datei (über die Log-Queue, ohne I/O im aufrufenden Thread)"""
+    logger.log(level, message)
+
+# Prometheus-Metriken für /metrics (siehe metrics.py)
+metrics_registry = MetricsRegistry()
+stage_latency = metrics_registry.histogram(
+    'stage_latency_seconds', 'Latenz pro Verarbeitungsstufe (capture, yolo, annotate, encode, ...)',
+    labelnames=('stage',)
+)
+db_write_latency = metrics_registry.histogram(
+    'db_write_seconds', 'Dauer der Schreibvorgänge in die Detection-Datenbank',
+    labelnames=('operation',)
+)
+
+def observe_stage(stage, seconds):
+    stage_latency.observe(seconds, stage)
 
 # PyResearch Configuration Constants
-PR_MODEL_PATH = "best.pt"
-CSV_FILE_PATH = "detections.csv"  # CSV-Datei für Pothole-Detections
+# (Modell, Backend und Inferenz-Auflösung: siehe visualizer.py)
+CSV_FILE_PATH = "detections.csv"  # Alte CSV-Datei (wird einmalig in die Datenbank importiert)
+DB_FILE_PATH = "detections.db"    # SQLite-Datenbank für Pothole-Detections
+PR_WARMUP_CONFIG = {
+    'preload_on_start': True,         # Modell schon beim Serverstart im Hintergrund laden
+    'warmup_runs': 3,                 # Dummy-Inferenzen vor dem ersten echten Frame
+    'warmup_frame_size': (720, 1280)  # Wie die Kamera-Auflösung (Höhe, Breite)
+}
 PR_DISPLAY_CONFIG = {
     'window_title': "PyResearch - Pothole Computer Vision Project",
     'window_size': (1280, 720),
     'color_scheme': "PR_DARK_BLUE",
     'fps_display': True
 }
+PR_STREAM_CONFIG = {
+    'jpeg_quality': 95,  # Erhöht von 85 auf 95 (Standard-Profil ohne Query-Parameter)
+    'width': 1280,       # Standard-Breite des Streams
+    'max_fps': 30,       # Standard-FPS des Streams
+    'adaptive': True,    # Qualität/Auflösung pro Client an den gemessenen Durchsatz anpassen
+    'queue_size': 1,     # Latest-Frame-Wins: veraltete Frames werden verworfen
+    'max_clients': 5,    # Maximale Anzahl gleichzeitiger /video_feed Clients
+    'client_buffer_size': 2,  # Ringpuffer pro Client (langsame Clients überspringen Frames)
+    'max_event_clients': 20,  # Maximale Anzahl gleichzeitiger /detection_events Clients
+    'event_buffer_size': 30,  # Ringpuffer pro Event-Client
+    'camera_event_interval': 3.0  # Sekunden zwischen Kamera-Status-Events
+}
+PR_SCHEDULER_CONFIG = {
+    'enabled': True,
+    'cpu_budget': 0.5,          # Inferenz max. 50% eines CPU-Kerns (0 = kein Budget)
+    'min_interval': 1,          # Inferenz mindestens jeden N-ten Frame ...
+    'max_interval': 15,         # ... und spätestens jeden 15. Frame
+    'motion_threshold': 0.02,   # Mittlere Bilddifferenz (0-1) ab der neu detektiert wird
+    'track_motion': True        # Boxen zwischen Inferenzen per Bildverschiebung mitbewegen
+}
+PR_MAP_CONFIG = {
+    'cluster_max_zoom': 14,       # Unterhalb dieser Zoomstufe werden Cluster geliefert
+    'cluster_cells_per_tile': 4,  # Grid-Zellen pro Kartenkachel (ca. 64px pro Cluster)
+    'max_markers': 2000           # Mehr Detections im Ausschnitt -> immer clustern
+}
+PR_ARCHIVE_CONFIG = {
+    # Abgeschlossene Monate wandern aus der Datenbank in komprimierte Spalten-Dateien (siehe archive.py)
+    'enabled': True,
+    'directory': 'archive',
+    'partition': 'month',         # 'month' oder 'day'
+    'format': 'npz',              # 'npz' (NumPy) oder 'parquet' (braucht pyarrow)
+    'roll_interval': 6 * 3600     # So oft nach abgeschlossenen Zeiträumen schauen (Sekunden)
+}
+PR_DEDUP_CONFIG = {
+    'radius_m': 8.0  # Meldungen innerhalb dieses Radius gelten als dasselbe Schlagloch
+}
+PR_GPS_CONFIG = {
+    # GPS-Quelle im Backend, z.B. 'serial:COM3@9600', 'gpsd://localhost:2947', 'file:fahrt.nmea'
+    # (None = nur Browser-GPS wie bisher)
+    'source': os.environ.get('PR_GPS_SOURCE'),
+    'max_fix_age': 5.0,           # Ältere GPS-Fixes werden nicht verwendet (Sekunden)
+    'min_log_interval': 2.0,      # Mindestabstand zwischen zwei gespeicherten Detections
+    'writer_batch_size': 50,      # Detections pro Schreibvorgang
+    'writer_flush_interval': 2.0  # Spätestens nach so vielen Sekunden schreiben
+}
+PR_SERVER_CONFIG = {
+    # 'dev' = Flask-Entwicklungsserver mit Reloader, 'production' = waitress (feste Anzahl Worker-Threads)
+    'mode': os.environ.get('PR_SERVER_MODE', 'dev'),
+    'host': '0.0.0.0',
+    'port': int(os.environ.get('PR_PORT', '5000')),
+    'api_threads': 8,             # Worker nur für JSON-Endpunkte - Streams bekommen zusätzlich je einen
+    'connection_limit': 100,      # Maximal offene Verbindungen (waitress)
+    'channel_timeout': 60,        # Inaktive Verbindungen nach so vielen Sekunden schließen
+    'camera_idle_timeout': 30.0   # Kamera ohne Zuschauer nach so vielen Sekunden schließen (0 = nie)
+}
+PR_SOURCE_CONFIG = {
+    # Video-Quelle: Kamera-Index ('0'), Video-Datei, rtsp://- bzw. http://-URL oder
+    # Bild-Verzeichnis / Glob-Muster ('aufnahmen/*.jpg') - siehe sources.py
+    'source': os.environ.get('PR_VIDEO_SOURCE', '0'),
+    'realtime': True,             # Dateien/Bildfolgen im Originaltakt (False = so schnell wie möglich)
+    'replay_fps': 10.0,           # Takt der virtuellen Uhr für Bildfolgen
+    'loop': True,                 # Dateien/Bildfolgen am Ende von vorn abspielen
+    'min_backoff': 0.5,           # Erster Neuversuch nach Verbindungsverlust (Sekunden) ...
+    'max_backoff': 10.0,          # ... verdoppelt bis höchstens hierhin
+    'discovery_max_index': 5,     # Kamera-Suche prüft die Indizes 0..N-1
+    'discovery_ttl': 60.0         # Suchergebnis so lange cachen (Sekunden)
+}
+PR_TRACKING_CONFIG = {
+    # ByteTrack: ein Schlagloch = ein Track = genau ein Event/Eintrag, wenn der Track endet
+    'enabled': True,
+    'track_thresh': 0.25,         # Mindest-Confidence für neue Tracks
+    'lost_track_buffer': 30,      # Track endet nach so vielen Inferenzen ohne Treffer
+    'min_hits': 3,                # Kürzere Tracks gelten als Fehl-Detection
+    'crop_dir': 'pothole_crops',  # Bester Bildausschnitt pro Schlagloch (None = nicht speichern)
+    'thumbnail_width': 160        # Vorschaubild im 'pothole'-Event (px)
+}
+PR_MULTICAM_CONFIG = {
+    'max_batch_size': 4,  # Maximale Anzahl Frames pro self.model([...]) Aufruf
+    'max_wait_ms': 20,    # Wartefenster um einen Batch zu füllen
+    'max_clients': 4      # Maximale Anzahl /multi_video_feed Clients (alle Kameras zusammen)
+}
 
 # Global variables
 detection_count = 0
-camera_index = 0  # Standard-Kamera-Index (0 = erste verfügbare Kamera)
+camera_index = parse_source(PR_SOURCE_CONFIG['source'])  # Kamera-Index oder Pfad/URL der aktuellen Quelle
 visualizer_instance = None
-camera_capture = None
+video_source = None  # ReconnectingSource der aktuellen Quelle (siehe sources.py)
 camera_lock = threading.Lock()  # Lock für Thread-Safe Kamera-Zugriff
 yolo_error_logged = False  # Flag um YOLO-Fehler nur einmal zu loggen
 yolo_enabled = False  # YOLO ist standardmäßig deaktiviert
+frame_pipeline = None  # Capture -> Inferenz -> Encoder (siehe pipeline.py)
+shutdown_event = threading.Event()  # Gesetzt beim Beenden - Stream-Generatoren hören dann auf
+pipeline_lock = threading.Lock()
+multicam_manager = None  # Multi-Kamera-Modus mit Batch-Inferenz (siehe multicam.py)
+detection_events = FrameBroadcaster(  # Per-Frame Detection-Events für /detection_events (SSE)
+    max_clients=PR_STREAM_CONFIG['max_event_clients'],
+    buffer_size=PR_STREAM_CONFIG['event_buffer_size']
+)
+stream_hub = StreamHub(  # Ein Encoding pro Stream-Profil, geteilt von allen Clients (siehe streaming.py)
+    default_profile=StreamProfile.create(
+        PR_STREAM_CONFIG['width'], PR_STREAM_CONFIG['jpeg_quality'], PR_STREAM_CONFIG['max_fps']
+    ),
+    max_clients=PR_STREAM_CONFIG['max_clients'],
+    buffer_size=PR_STREAM_CONFIG['client_buffer_size']
+)
+detection_store = None  # SQLite-Speicher (siehe storage.py)
+detection_archive = DetectionArchive(  # Zeit-partitioniertes Archiv älterer Detections (siehe archive.py)
+    PR_ARCHIVE_CONFIG['directory'], PR_ARCHIVE_CONFIG['partition'], PR_ARCHIVE_CONFIG['format']
+) if PR_ARCHIVE_CONFIG['enabled'] else None
+store_lock = threading.Lock()
+gps_reader = None  # GPS im Backend (siehe gps.py)
+detection_writer = None  # Gepuffertes Schreiben im Hintergrund
+gps_log_state = {'count': 0, 'time': 0.0}
+gps_log_lock = threading.Lock()
+inference_scheduler = InferenceScheduler(
+    cpu_budget=PR_SCHEDULER_CONFIG['cpu_budget'],
+    min_interval=PR_SCHEDULER_CONFIG['min_interval'],
+    max_interval=PR_SCHEDULER_CONFIG['max_interval'],
+    motion_threshold=PR_SCHEDULER_CONFIG['motion_threshold'],
+    track_motion=PR_SCHEDULER_CONFIG['track_motion']
+) if PR_SCHEDULER_CONFIG['enabled'] else None
 
-def check_model_exists():
-    """Prüft ob das Modell existiert"""
-    if not os.path.exists(PR_MODEL_PATH):
-        raise FileNotFoundError(f"Modell-Datei '{PR_MODEL_PATH}' nicht gefunden!")
-    return True
+def get_detection_store():
+    """Öffnet die Detection-Datenbank beim ersten Zugriff (inkl. einmaligem CSV-Import)"""
+    global detection_store
+    with store_lock:
+        if detection_store is None:
+            detection_store = DetectionStore(
+                DB_FILE_PATH,
+                dedup_radius_m=PR_DEDUP_CONFIG['radius_m'],
+                observer=lambda operation, seconds: db_write_latency.observe(seconds, operation)
+            )
+            imported = detection_store.import_csv(CSV_FILE_PATH)
+            if imported:
+                log(f"✓ {imported} Detections aus '{CSV_FILE_PATH}' in die Datenbank importiert")
+            if detection_archive is not None:
+                threading.Thread(target=archive_loop, name='archive-roller', daemon=True).start()
+        return detection_store
 
-class PyResearchVisualizer:
-    """PyResearch Standard Visualization Engine"""
-    
-    def __init__(self):
+def archive_loop():
+    """Verschiebt regelmäßig abgeschlossene Zeiträume ins Archiv (läuft im Hintergrund)"""
+    while not shutdown_event.is_set():
         try:
-            check_model_exists()
-            # PyTorch 2.6 Fix: Deaktiviere weights_only für vertrauenswürdige Modelle
-            import torch
-            
-            # Setze die globale torch.load Einstellung auf weights_only=False
-            # Dies ist sicher, da wir unserem eigenen trainierten Modell vertrauen
-            original_load = torch.load
-            def patched_load(*args, **kwargs):
-                kwargs['weights_only'] = False
-                return original_load(*args, **kwargs)
-            torch.load = patched_load
-            
-            log("Lade YOLO Modell mit PyTorch 2.6 Fix (weights_only=False)...")
-            self.model = YOLO(PR_MODEL_PATH)
-            log("✓✓✓ YOLO Modell erfolgreich geladen!")
-            
-            # Stelle torch.load wieder her
-            torch.load = original_load
-        except FileNotFoundError as e:
-            raise e
+            detection_archive.roll(detection_store)
         except Exception as e:
-            raise Exception(f"Fehler beim Laden des Modells: {str(e)}")
-        
-        self.box_annotator = sv.BoundingBoxAnnotator(
-            thickness=2,
-            color=sv.Color.from_hex("#0055FF")
-        )
-        self.label_annotator = sv.LabelAnnotator(
-            text_scale=0.7,
-            text_thickness=1,
-            text_color=sv.Color.WHITE,
-            text_padding=10
+            log(f"✗ Archivieren fehlgeschlagen: {str(e)}", level=logging.ERROR)
+        shutdown_event.wait(PR_ARCHIVE_CONFIG['roll_interval'])
+
+def publish_detection_event(detections, source, inferred=True, tracked=False):
+    """Verteilt die Detections eines Frames an alle /detection_events Clients"""
+    confidences = detections.confidence if detections.confidence is not None else []
+    detection_events.publish({
+        'timestamp': time.time(),
+        'source': source,
+        'inferred': inferred,  # False = vom Scheduler übernommene Detections
+        'count': len(detections),
+        'boxes': [[int(v) for v in box] for box in detections.xyxy],
+        'confidences': [round(float(c), 4) for c in confidences],
+        'class_ids': [int(c) for c in detections.class_id] if detections.class_id is not None else [],
+        'track_ids': [int(t) for t in detections.tracker_id] if detections.tracker_id is not None else [],
+        'tracking': tracked,  # True = Schlaglöcher kommen einzeln als 'pothole'-Event
+        'unique_total': pothole_tracker.unique_total if tracked else None
+    })
+
+def start_gps_logging():
+    """Startet GPS-Reader und Batch-Writer, falls eine GPS-Quelle konfiguriert ist"""
+    global gps_reader, detection_writer
+    with gps_log_lock:
+        if not PR_GPS_CONFIG['source'] or gps_reader is not None:
+            return
+        log(f"Starte GPS-Logging im Backend (Quelle: {PR_GPS_CONFIG['source']})")
+        detection_writer = BatchedDetectionWriter(
+            get_detection_store(),
+            batch_size=PR_GPS_CONFIG['writer_batch_size'],
+            flush_interval=PR_GPS_CONFIG['writer_flush_interval']
         )
+        detection_writer.start()
+        gps_reader = GpsReader(PR_GPS_CONFIG['source'])
+        gps_reader.start()
+
+def start_headless_logging():
+    """Mit Backend-GPS: Kamera, YOLO und GPS-Logging schon beim Serverstart (ohne Browser)"""
+    global yolo_enabled
+    if not PR_GPS_CONFIG['source']:
+        return
+    log("Backend-GPS konfiguriert - Detections werden auch ohne geöffnetes Dashboard gespeichert")
+    yolo_enabled = True
+    model_loader.start()
+    start_gps_logging()
+    # Dauerhafter Nutzer (wird nie freigegeben) - die Kamera bleibt offen, auch wenn
+    # Browser kommen und gehen
+    camera_usage.acquire()
+
+def log_detections_with_gps(detections):
+    """Speichert neue Detections mit aktueller GPS-Position (ohne Browser, ohne Disk-I/O im Frame-Loop)"""
+    if gps_reader is None or detection_writer is None:
+        return
+    count = len(detections)
+    now = time.time()
+    with gps_log_lock:
+        previous = gps_log_state['count']
+        gps_log_state['count'] = count
+        # Wie im Browser: nur bei neuen Detections und höchstens alle min_log_interval Sekunden
+        if count <= previous or now - gps_log_state['time'] < PR_GPS_CONFIG['min_log_interval']:
+            return
+        fix = gps_reader.latest(max_age=PR_GPS_CONFIG['max_fix_age'])
+        if fix is None:
+            return
+        gps_log_state['time'] = now
+    
+    confidences = detections.confidence if detections.confidence is not None else []
+    confidence = float(sum(confidences)) / len(confidences) * 100 if len(confidences) else 0
+    detection_writer.submit(fix['latitude'], fix['longitude'], round(confidence, 1), count - previous)
+
+def current_gps_fix():
+    """Aktueller Backend-GPS-Fix (oder None) - wird pro Track beim besten Frame gemerkt"""
+    if gps_reader is None:
+        return None
+    return gps_reader.latest(max_age=PR_GPS_CONFIG['max_fix_age'])
+
+def handle_track_end(event):
+    """Ein Schlagloch hat das Bild verlassen: einmal speichern und als 'pothole'-Event verteilen"""
+    crop = event.pop('crop')
+    fix = event.pop('context')
+    if crop is not None:
+        if crop_writer is not None:
+            # Speichern im Hintergrund - handle_track_end läuft im Inferenz-Thread
+            filename = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(event['last_seen']))}_track{event['track_id']}.jpg"
+            event['crop_file'] = crop_writer.submit(filename, crop)
+        # Eigenes resize/imencode: der Stream-Encoder ist nicht thread-sicher und
+        # würde pro Crop-Größe einen Puffer behalten
+        thumbnail = encode_thumbnail(crop, PR_TRACKING_CONFIG['thumbnail_width'])
+        event['thumbnail'] = base64.b64encode(thumbnail).decode('ascii')
+    
+    if fix is not None:
+        event['latitude'], event['longitude'] = fix['latitude'], fix['longitude']
+        if detection_writer is not None:
+            detection_writer.submit(fix['latitude'], fix['longitude'], round(event['confidence'] * 100, 1), 1)
+    
+    log(f"🎯 Schlagloch #{event['track_id']}: Confidence {event['confidence']:.2f}, "
+        f"{event['hits']} Treffer in {event['duration']}s")
+    detection_events.publish(dict(event, event='pothole', source=camera_index, timestamp=time.time()))
+
+crop_writer = None  # Speichert die Schlagloch-Crops im Hintergrund, startet mit dem ersten Crop (siehe tracking.py)
+if PR_TRACKING_CONFIG['enabled'] and PR_TRACKING_CONFIG['crop_dir']:
+    crop_writer = CropWriter(PR_TRACKING_CONFIG['crop_dir'])
+
+pothole_tracker = PotholeTracker(  # Stabile Track-IDs, ein Event pro Schlagloch (siehe tracking.py)
+    on_track_end=handle_track_end,
+    track_thresh=PR_TRACKING_CONFIG['track_thresh'],
+    lost_track_buffer=PR_TRACKING_CONFIG['lost_track_buffer'],
+    min_hits=PR_TRACKING_CONFIG['min_hits']
+) if PR_TRACKING_CONFIG['enabled'] else None
+
+class LiveVisualizer(PyResearchVisualizer):
+    """Live-Stream: Detection mit Scheduler und Tracking, dazu Events, Zähler und GPS-Logging"""
+    
+    def __init__(self):
+        # observe_stage erst beim Aufruf nachschlagen (benchmark.py ersetzt es)
+        super().__init__(observer=lambda stage, seconds: observe_stage(stage, seconds))
+    
+    def process_frame(self, frame, scheduler=None, tracker=None):
+        """PyResearch Standard Processing Pipeline
         
-    def process_frame(self, frame):
-        """PyResearch Standard Processing Pipeline"""
+        Mit scheduler läuft YOLO nur, wenn der InferenceScheduler es verlangt -
+        sonst werden die letzten Detections weiterverwendet. Mit tracker bekommt
+        jedes Schlagloch eine stabile Track-ID.
+        """
         global detection_count
-        results = self.model(frame)[0]
-        detections = sv.Detections.from_ultralytics(results)
+        inferred = True
+        if scheduler is None or scheduler.should_infer(frame):
+            detections, cpu_seconds = measure_cpu(self.detect, frame)
+            if tracker is not None:
+                # Nur echte Inferenzen tracken - übernommene Detections behalten ihre Track-IDs
+                detections = tracker.update(frame, detections, context=current_gps_fix())
+            if scheduler is not None:
+                scheduler.record(frame, detections, cpu_seconds)
+        else:
+            detections = scheduler.carry_forward(frame)
+            inferred = False
         
         # Update detection count
         detection_count = len(detections)  # Count the number of detections in the current frame
+        publish_detection_event(detections, source=camera_index, inferred=inferred, tracked=tracker is not None)
+        if tracker is None:
+            log_detections_with_gps(detections)  # Mit Tracking speichert handle_track_end()
         
         # Apply PyResearch Visualization Standards
-        annotated_frame = self.box_annotator.annotate(
-            scene=frame,
-            detections=detections
-        )
-        annotated_frame = self.label_annotator.annotate(
-            scene=annotated_frame,
-            detections=detections
-        )
-        
+        start = time.perf_counter()
+        annotated_frame = self.annotate(frame, detections)
+        observe_stage('annotate', time.perf_counter() - start)
         return annotated_frame
 
-def generate_frames():
-    """Generiert Live-Kamera-Frames für den Stream"""
-    global camera_index, visualizer_instance, camera_capture, camera_lock, yolo_enabled, yolo_error_logged
+def open_camera(index):
+    """Öffnet eine Kamera mit HD-Einstellungen (DirectShow bevorzugt)"""
+    # Windows-spezifisch: Verwende DirectShow (CAP_DSHOW) für bessere Kompatibilität
+    log(f">>> Öffne Kamera {index} für Video-Stream...")
+    capture = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+    log(f"VideoCapture erstellt, isOpened={capture.isOpened()}")
+    
+    # Falls DirectShow nicht funktioniert, versuche Standard
+    if not capture.isOpened():
+        log("DirectShow fehlgeschlagen, versuche Standard-Backend...")
+        capture = cv2.VideoCapture(index)
+        log(f"Standard-Backend versucht, isOpened={capture.isOpened()}")
     
-    log(f"generate_frames() gestartet - camera_index={camera_index}, YOLO={yolo_enabled}")
+    # Setze Kamera-Auflösung für gute Qualität
+    capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  # Hohe Qualität
+    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)   # 720p HD
+    capture.set(cv2.CAP_PROP_FPS, 30)              # 30 FPS
+    capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     
-    # Thread-Safe Kamera-Öffnung
-    log("Versuche Camera-Lock zu erwerben...")
+    # Verbessere Bildqualität
+    capture.set(cv2.CAP_PROP_AUTO_EXPOSURE, 1)    # Auto-Exposure an
+    capture.set(cv2.CAP_PROP_AUTOFOCUS, 1)         # Autofocus an
+    capture.set(cv2.CAP_PROP_BRIGHTNESS, 128)      # Helligkeit (0-255)
+    capture.set(cv2.CAP_PROP_CONTRAST, 128)        # Kontrast
+    capture.set(cv2.CAP_PROP_SATURATION, 128)      # Sättigung
+    capture.set(cv2.CAP_PROP_SHARPNESS, 128)       # Schärfe
+    
+    log("Kamera-Eigenschaften gesetzt (HD-Qualität)")
+    return capture
+
+def make_error_frame(*lines):
+    """Erzeugt ein schwarzes Bild mit roter Fehlermeldung"""
+    error_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    for i, text in enumerate(lines):
+        cv2.putText(error_frame, text, 
+                   (50, 220 + i * 40), cv2.FONT_HERSHEY_SIMPLEX, 0.7 if i == 0 else 0.6, (0, 0, 255), 2)
+    return error_frame
+
+def make_video_source(spec):
+    """Quelle für Index/Pfad/URL mit automatischem Neuverbinden (siehe sources.py)"""
+    source = create_source(
+        spec, open_camera,
+        realtime=PR_SOURCE_CONFIG['realtime'],
+        loop=PR_SOURCE_CONFIG['loop'],
+        replay_fps=PR_SOURCE_CONFIG['replay_fps']
+    )
+    return ReconnectingSource(source, PR_SOURCE_CONFIG['min_backoff'], PR_SOURCE_CONFIG['max_backoff'])
+
+def read_camera_frame():
+    """Capture-Stufe: Liest einen Frame der aktuellen Quelle (läuft im Capture-Thread)"""
+    global video_source
+    
+    # Thread-Safe Kamera-Zugriff
     with camera_lock:
-        log("Camera-Lock erworben!")
-        # Öffne Kamera (falls noch nicht geöffnet)
-        # Windows-spezifisch: Verwende DirectShow (CAP_DSHOW) für bessere Kompatibilität
-        if camera_capture is None or not camera_capture.isOpened():
-            log(f">>> Öffne Kamera {camera_index} für Video-Stream...")
-            # Versuche mit DirectShow Backend (besser für Windows)
-            camera_capture = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
-            log(f"VideoCapture erstellt, isOpened={camera_capture.isOpened()}")
-            
-            # Falls DirectShow nicht funktioniert, versuche Standard
-            if not camera_capture.isOpened():
-                log("DirectShow fehlgeschlagen, versuche Standard-Backend...")
-                camera_capture = cv2.VideoCapture(camera_index)
-                log(f"Standard-Backend versucht, isOpened={camera_capture.isOpened()}")
-            
-            # Setze Kamera-Auflösung für gute Qualität
-            camera_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  # Hohe Qualität
-            camera_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)   # 720p HD
-            camera_capture.set(cv2.CAP_PROP_FPS, 30)              # 30 FPS
-            camera_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            
-            # Verbessere Bildqualität
-            camera_capture.set(cv2.CAP_PROP_AUTO_EXPOSURE, 1)    # Auto-Exposure an
-            camera_capture.set(cv2.CAP_PROP_AUTOFOCUS, 1)         # Autofocus an
-            camera_capture.set(cv2.CAP_PROP_BRIGHTNESS, 128)      # Helligkeit (0-255)
-            camera_capture.set(cv2.CAP_PROP_CONTRAST, 128)        # Kontrast
-            camera_capture.set(cv2.CAP_PROP_SATURATION, 128)      # Sättigung
-            camera_capture.set(cv2.CAP_PROP_SHARPNESS, 128)       # Schärfe
-            
-            log("Kamera-Eigenschaften gesetzt (HD-Qualität)")
-        else:
-            log(f"Kamera {camera_index} ist bereits geöffnet")
-        
-        # Prüfe ob Kamera geöffnet werden konnte
-        if not camera_capture.isOpened():
-            log(f"✗✗✗ FEHLER: Kamera {camera_index} konnte nicht geöffnet werden!")
-            error_frame = cv2.zeros((480, 640, 3), dtype=cv2.uint8)
-            cv2.putText(error_frame, "Kamera konnte nicht geoffnet werden!", 
-                       (50, 220), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            cv2.putText(error_frame, f"Versuche Kamera-Index: {camera_index}", 
-                       (50, 260), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-            _, buffer = cv2.imencode('.jpg', error_frame)
-            frame_bytes = buffer.tobytes()
-            while True:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                time.sleep(1)
-            return
-        
-        log(f"✓✓✓ Kamera {camera_index} erfolgreich geöffnet! Starte Video-Stream...")
+        if video_source is None:
+            video_source = make_video_source(camera_index)
+        # Öffnen, Spiegeln (Kameras) und Neuverbinden mit Backoff übernimmt die Quelle
+        success, frame = video_source.read()
+        if success:
+            return True, frame
+        state = video_source.state
+        retry_in = video_source.get_stats()['retry_in']
+    
+    if state == 'lost':
+        return False, make_error_frame("Kamera-Verbindung verloren!", f"Quelle: {camera_index}")
+    if state == 'ended':
+        return False, make_error_frame("Video zu Ende", f"Quelle: {camera_index} (loop aus)")
+    return False, make_error_frame("Kamera konnte nicht geoffnet werden!",
+                                   f"Quelle: {camera_index} - neuer Versuch in {retry_in:.0f}s")
+
+def warmup_visualizer(visualizer):
+    """Warm-up nach dem Laden (läuft im Loader-Thread)"""
+    return visualizer.warmup(PR_WARMUP_CONFIG['warmup_runs'], PR_WARMUP_CONFIG['warmup_frame_size'])
+
+model_loader = ModelLoader(LiveVisualizer, warmup=warmup_visualizer)
+visualizer_lock = threading.Lock()  # Live-Stream und Multi-Kamera fragen gleichzeitig nach dem Modell
+
+def ensure_visualizer():
+    """Gibt den YOLO Visualizer zurück, sobald er geladen und aufgewärmt ist (sonst None)
     
-    log("Camera-Lock freigegeben, starte Frame-Loop...")
+    Laden und Warm-up laufen im Hintergrund - solange zeigt der Stream das Rohbild.
+    """
+    global visualizer_instance, yolo_enabled
     
-    # Lese kontinuierlich Frames von der Kamera
-    while True:
-        success, frame = camera_capture.read()
-        
-        if not success:
-            # Fehler beim Lesen - versuche Kamera neu zu öffnen
-            log("⚠ Fehler beim Lesen der Kamera. Versuche erneut...")
-            camera_capture.release()
-            time.sleep(0.5)
-            camera_capture = cv2.VideoCapture(camera_index)
-            if not camera_capture.isOpened():
-                error_frame = cv2.zeros((480, 640, 3), dtype=cv2.uint8)
-                cv2.putText(error_frame, "Kamera-Verbindung verloren!", 
-                           (50, 240), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                _, buffer = cv2.imencode('.jpg', error_frame)
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            continue
+    with visualizer_lock:
+        if visualizer_instance is None:
+            visualizer_instance = model_loader.get()
+            if visualizer_instance is None:
+                if model_loader.state == 'error':
+                    log(f"✗ FEHLER beim Laden des YOLO Modells: {model_loader.error}")
+                    yolo_enabled = False  # Deaktiviere YOLO wieder
+                elif model_loader.state == 'idle':
+                    log("YOLO wurde aktiviert - Lade Modell im Hintergrund...")
+                    model_loader.start()  # Idempotent - es wird nie ein zweites Modell gebaut
+        return visualizer_instance
+
+def annotate_frame(frame):
+    """Inferenz-Stufe: YOLO Detection + Annotation (läuft im Inferenz-Worker)"""
+    global yolo_error_logged
+    
+    # Verarbeite Frame mit YOLO nur wenn aktiviert
+    if yolo_enabled:
+        # YOLO ist aktiviert - versuche Detection
+        visualizer = ensure_visualizer()
         
-        try:
-            # Spiegele Frame horizontal für bessere UX (wie bei Webcam-Ansicht)
-            frame = cv2.flip(frame, 1)
-            
-            # Verarbeite Frame mit YOLO nur wenn aktiviert
-            if yolo_enabled:
-                # YOLO ist aktiviert - versuche Detection
-                if visualizer_instance is None:
-                    # YOLO wurde aktiviert, aber noch nicht initialisiert
-                    log("YOLO wurde aktiviert - Initialisiere Visualizer...")
-                    try:
-                        visualizer_instance = PyResearchVisualizer()
-                        log("✓ YOLO Visualizer erfolgreich initialisiert!")
-                    except Exception as e:
-                        log(f"✗ FEHLER beim Laden des YOLO Modells: {str(e)}")
-                        yolo_enabled = False  # Deaktiviere YOLO wieder
-                        visualizer_instance = None
-                
-                if visualizer_instance is not None:
-                    try:
-                        output_frame = visualizer_instance.process_frame(frame)
-                    except Exception as yolo_error:
-                        # YOLO Fehler - zeige unverarbeitetes Bild als Fallback
-                        if not yolo_error_logged:
-                            log(f"⚠⚠⚠ YOLO Modell-Fehler: {str(yolo_error)}")
-                            log("→ Fallback: Zeige Kamera-Rohbild ohne Pothole-Detection")
-                            yolo_error_logged = True
-                        output_frame = frame
-                        # Füge Warnung zum Bild hinzu
-                        cv2.putText(output_frame, "WARNUNG: YOLO Fehler - Rohbild", 
-                                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-                else:
-                    output_frame = frame
-            else:
-                # YOLO ist deaktiviert - zeige nur Rohbild
-                output_frame = frame
-                # Zeige Status
-                cv2.putText(output_frame, "Live Camera (YOLO deaktiviert)", 
-                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            # Encode Frame als JPEG mit hoher Qualität
-            _, buffer = cv2.imencode('.jpg', output_frame, [cv2.IMWRITE_JPEG_QUALITY, 95])  # Erhöht von 85 auf 95
-            frame_bytes = buffer.tobytes()
+        if visualizer is not None:
+            try:
+                return visualizer.process_frame(frame, scheduler=inference_scheduler, tracker=pothole_tracker)
+            except Exception as yolo_error:
+                # YOLO Fehler - zeige unverarbeitetes Bild als Fallback
+                if not yolo_error_logged:
+                    log(f"⚠⚠⚠ YOLO Modell-Fehler: {str(yolo_error)}")
+                    log("→ Fallback: Zeige Kamera-Rohbild ohne Pothole-Detection")
+                    yolo_error_logged = True
+                # Füge Warnung zum Bild hinzu
+                cv2.putText(frame, "WARNUNG: YOLO Fehler - Rohbild", 
+                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        elif yolo_enabled:
+            # Modell wird noch geladen/aufgewärmt - Rohbild weiter streamen
+            cv2.putText(frame, "YOLO wird geladen...", 
+                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
+        return frame
+    
+    # YOLO ist deaktiviert - zeige nur Rohbild mit Status
+    cv2.putText(frame, "Live Camera (YOLO deaktiviert)", 
+               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    return frame
+
+def encode_jpeg(frame):
+    """Encoder-Stufe: JPEG mit hoher Qualität (Multi-Kamera-Modus)"""
+    return stream_hub.encoder.encode(frame, PR_STREAM_CONFIG['jpeg_quality'])
+
+def get_frame_pipeline():
+    """Gibt die globale Frame-Pipeline zurück und startet sie bei Bedarf"""
+    global frame_pipeline
+    with pipeline_lock:
+        if frame_pipeline is None:
+            log(f"Starte Frame-Pipeline - camera_index={camera_index}, YOLO={yolo_enabled}")
+            frame_pipeline = FramePipeline(
+                read_frame=read_camera_frame,
+                process_frame=annotate_frame,
+                encode_frame=stream_hub.publish,  # Kodiert pro aktivem Profil und verteilt selbst
+                queue_size=PR_STREAM_CONFIG['queue_size'],
+                observer=observe_stage
+            )
+        frame_pipeline.start()
+    start_gps_logging()
+    return frame_pipeline
+
+def generate_frames(subscriber):
+    """Generiert Live-Kamera-Frames für einen Client (aus dem gemeinsamen Broadcaster)"""
+    report_sent = getattr(subscriber, 'report_sent', None)  # Nur StreamClient (adaptive Profile)
+    try:
+        while not subscriber.closed and not shutdown_event.is_set():
+            item = subscriber.next_frame(timeout=1.0)
+            if item is None:
+                continue
+            _, frame_bytes = item
             
+            # Sendezeit messen: yield kehrt erst zurück, wenn der Server die Bytes geschrieben hat
+            start = time.perf_counter()
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        except Exception as e:
-            log(f"⚠ Kritischer Fehler bei Frame-Verarbeitung: {str(e)}")
-            continue
+            if report_sent is not None:
+                report_sent(len(frame_bytes), time.perf_counter() - start)
+    finally:
+        # Client hat die Verbindung getrennt
+        subscriber.close()
+
+def stream_response(body, subscriber, on_close=None, **kwargs):
+    """Response für einen Stream-Client, der beim Schließen der Verbindung sicher abgemeldet wird
+
+    Das finally im Generator läuft nicht, wenn der Client vor dem ersten Frame
+    trennt (der Generator wurde nie gestartet). call_on_close läuft dagegen immer,
+    sobald der Server die Antwort schließt.
+    """
+    response = Response(body, **kwargs)
+
+    def cleanup():
+        subscriber.close()
+        if on_close is not None:
+            on_close()
+
+    response.call_on_close(cleanup)
+    return response
+
+def stop_camera():
+    """Stoppt die Pipeline und gibt die Kamera frei (letzter Zuschauer weg bzw. Server-Ende)"""
+    if frame_pipeline is not None:
+        frame_pipeline.stop()
+    with camera_lock:
+        if video_source is not None:
+            video_source.release()
+    if pothole_tracker is not None:
+        pothole_tracker.flush()  # Offene Tracks abschließen
+    log(f"Kamera {camera_index} geschlossen (keine Zuschauer)")
+
+# Die Kamera läuft nur, solange jemand zuschaut. Mit Backend-GPS hält
+# start_headless_logging() einen dauerhaften Nutzer, damit Detections auch ohne
+# Browser gespeichert werden.
+camera_usage = SharedResource(get_frame_pipeline, stop_camera,
+                              idle_timeout=PR_SERVER_CONFIG['camera_idle_timeout'])
+
+def infer_multicam_batch(frames):
+    """Batch-Inferenz für den Multi-Kamera-Modus (ein Modell-Aufruf für alle Kameras)"""
+    visualizer = ensure_visualizer()
+    if visualizer is None:
+        raise RuntimeError("YOLO Modell ist nicht geladen")
+    return visualizer.detect_batch(frames, PR_MULTICAM_CONFIG['max_batch_size'])
+
+def annotate_multicam_frame(stream, frame):
+    """Inferenz-Stufe einer Kamera im Multi-Kamera-Modus"""
+    visualizer = ensure_visualizer() if yolo_enabled else None
+    if visualizer is None:
+        stream.detection_count = 0
+        cv2.putText(frame, f"Kamera {stream.camera_id} (YOLO deaktiviert)", 
+                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        return frame
+    
+    # Frame in den gemeinsamen Batch einreihen und auf die eigenen Detections warten
+    detections = multicam_manager.engine.infer(frame)
+    stream.detection_count = len(detections)
+    publish_detection_event(detections, source=f'multi:{stream.camera_id}')
+    log_detections_with_gps(detections)
+    return visualizer.annotate(frame, detections)
+
+def get_multicam_manager():
+    """Gibt den Multi-Kamera-Manager zurück (wird beim ersten Aufruf erstellt)"""
+    global multicam_manager
+    with pipeline_lock:
+        if multicam_manager is None:
+            multicam_manager = MultiCameraManager(
+                infer_batch=infer_multicam_batch,
+                open_camera=open_camera,
+                process_frame=annotate_multicam_frame,
+                encode_frame=encode_jpeg,
+                max_batch_size=PR_MULTICAM_CONFIG['max_batch_size'],
+                max_wait=PR_MULTICAM_CONFIG['max_wait_ms'] / 1000.0,
+                max_clients=PR_MULTICAM_CONFIG['max_clients'],
+                buffer_size=PR_STREAM_CONFIG['client_buffer_size'],
+                source_options={key: PR_SOURCE_CONFIG[key] for key in
+                                ('realtime', 'loop', 'replay_fps', 'min_backoff', 'max_backoff')}
+            )
+        return multicam_manager
 
 @app.route('/')
 def index():
-    log("========== INDEX SEITE WURDE GELADEN ==========")
+    log("========== INDEX SEITE WURDE GELADEN ==========", level=logging.DEBUG)
     return render_template('index.html')
 
 @app.route('/test')
@@ -268,55 +634,206 @@ def test():
 
 @app.route('/video_feed')
 def video_feed():
-    log("========== VIDEO_FEED WURDE AUFGERUFEN ==========")
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    """MJPEG-Stream, optional mit Profil: ?profile=low|medium|high oder ?width=&quality=&fps=&adaptive=0"""
+    log("========== VIDEO_FEED WURDE AUFGERUFEN ==========", level=logging.DEBUG)
+    try:
+        profile = parse_profile(request.args, stream_hub.default_profile)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    adaptive = request.args.get('adaptive', '1' if PR_STREAM_CONFIG['adaptive'] else '0') != '0'
+    
+    if shutdown_event.is_set():
+        return jsonify({'error': 'Server wird beendet'}), 503
+    try:
+        subscriber = stream_hub.subscribe(profile, adaptive=adaptive)
+    except TooManyClientsError as e:
+        log(f"⚠ Video-Stream abgelehnt: {str(e)}")
+        return jsonify({'error': str(e)}), 503
+    camera_usage.acquire()  # Öffnet die Kamera beim ersten Zuschauer
+    log(f"Stream-Client {subscriber.client_id} verbunden: {profile.key}, adaptive={adaptive} "
+        f"({stream_hub.client_count()} aktiv)")
+    return stream_response(generate_frames(subscriber), subscriber, on_close=camera_usage.release,
+                           mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    """Gibt FPS und Latenz pro Pipeline-Stufe zurück (Bottleneck-Analyse)"""
+    if frame_pipeline is None:
+        return jsonify({'running': False, 'stages': {}, 'queues': {}})
+    stats = frame_pipeline.get_stats()
+    stats['scheduler'] = inference_scheduler.get_stats() if inference_scheduler is not None else None
+    stats['model'] = model_loader.get_stats()
+    stats['broadcast'] = stream_hub.get_stats()  # Clients und Encoding pro Profil
+    stats['camera'] = camera_usage.get_stats()
+    stats['tracking'] = pothole_tracker.get_stats() if pothole_tracker is not None else None
+    stats['crop_writer'] = crop_writer.get_stats() if crop_writer is not None else None
+    return jsonify(stats)
+
+def collect_metrics():
+    """Gauges für /metrics aus den vorhandenen Statistiken (wird bei jedem Abruf gelesen)"""
+    metrics = []
+    if frame_pipeline is not None:
+        stats = frame_pipeline.get_stats()
+        metrics.append(gauge('stage_fps', 'Frames pro Sekunde pro Pipeline-Stufe',
+                             [({'stage': name}, stage['fps']) for name, stage in stats['stages'].items()]))
+        metrics.append(gauge('stage_errors_total', 'Fehler pro Pipeline-Stufe',
+                             [({'stage': name}, stage['errors']) for name, stage in stats['stages'].items()], 'counter'))
+        metrics.append(gauge('queue_depth', 'Frames in den Pipeline-Queues',
+                             [({'queue': name}, queue['depth']) for name, queue in stats['queues'].items()]))
+        metrics.append(gauge('queue_dropped_frames_total', 'Verworfene Frames (Latest-Frame-Wins)',
+                             [({'queue': name}, queue['dropped']) for name, queue in stats['queues'].items()], 'counter'))
+    
+    streams = stream_hub.get_stats()
+    metrics.append(gauge('stream_clients', 'Verbundene /video_feed Clients', [({}, streams['clients'])]))
+    metrics.append(gauge('stream_profile_fps', 'Kodierte Frames pro Sekunde pro Stream-Profil',
+                         [({'profile': key}, profile['fps']) for key, profile in streams['profiles'].items()]))
+    clients = streams['subscribers']
+    metrics.append(gauge('stream_client_fps', 'Gesendete Frames pro Sekunde pro Client',
+                         [({'client': c['client_id'], 'profile': c['profile']}, c['fps']) for c in clients]))
+    metrics.append(gauge('stream_client_throughput_kbps', 'Gemessener Durchsatz pro Client',
+                         [({'client': c['client_id']}, c['throughput_kbps']) for c in clients]))
+    metrics.append(gauge('stream_client_skipped_frames_total', 'Übersprungene Frames pro Client (zu langsam)',
+                         [({'client': c['client_id']}, c['skipped']) for c in clients], 'counter'))
+    metrics.append(gauge('event_clients', 'Verbundene /detection_events Clients',
+                         [({}, detection_events.client_count())]))
+    metrics.append(gauge('camera_active', 'Kamera geöffnet (1/0)', [({}, 1 if camera_usage.active else 0)]))
+    
+    model = model_loader.get_stats()
+    metrics.append(gauge('model_ready', 'Modell geladen und aufgewärmt (1/0)', [({}, 1 if model['state'] == 'ready' else 0)]))
+    metrics.append(gauge('model_load_seconds', 'Ladezeit des Modells', [({}, model['load_seconds'])]))
+    metrics.append(gauge('model_warmup_seconds', 'Warm-up-Zeit des Modells', [({}, model['warmup_seconds'])]))
+    metrics.append(gauge('detections_current', 'Detections im letzten Frame', [({}, detection_count)]))
+    if pothole_tracker is not None:
+        tracking = pothole_tracker.get_stats()
+        metrics.append(gauge('tracks_active', 'Aktuell verfolgte Schlaglöcher', [({}, tracking['active_tracks'])]))
+        metrics.append(gauge('potholes_unique_total', 'Eindeutige Schlaglöcher (beendete Tracks)',
+                             [({}, tracking['unique_total'])], 'counter'))
+    if inference_scheduler is not None:
+        scheduler = inference_scheduler.get_stats()
+        metrics.append(gauge('scheduler_interval', 'Inferenz jeden N-ten Frame', [({}, scheduler['interval'])]))
+        metrics.append(gauge('scheduler_cpu_usage', 'CPU-Anteil der Inferenz (1.0 = ein Kern)', [({}, scheduler['cpu_usage'])]))
+    if detection_writer is not None:
+        writer = detection_writer.get_stats()
+        metrics.append(gauge('db_writer_pending', 'Noch nicht geschriebene Detections', [({}, writer['pending'])]))
+        metrics.append(gauge('db_writer_written_total', 'Vom Batch-Writer geschriebene Detections',
+                             [({}, writer['written'])], 'counter'))
+    return metrics
+
+metrics_registry.add_collector(collect_metrics)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus-Metriken (Histogramme für Latenzen, Gauges für Clients/Queues/Modell)"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/detection_count')
 def get_detection_count():
-    return jsonify({'detections': detection_count})
+    return jsonify({
+        'detections': detection_count,
+        'unique_potholes': pothole_tracker.unique_total if pothole_tracker is not None else None
+    })
 
-@app.route('/camera_info')
-def get_camera_info():
-    """Gibt Informationen über die verfügbare Kamera zurück"""
-    global camera_index, camera_capture
+@app.route('/detection_events')
+def detection_events_stream():
+    """Server-Sent Events: ein Event pro verarbeitetem Frame (statt Polling)
     
-    # Versuche die bereits geöffnete Kamera zu verwenden
-    if camera_capture is not None and camera_capture.isOpened():
-        width = int(camera_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(camera_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = camera_capture.get(cv2.CAP_PROP_FPS)
-        return jsonify({
+    event: detections  -> count, boxes, confidences, class_ids, track_ids
+    event: pothole     -> ein Schlagloch pro beendetem Track (beste Confidence, Vorschaubild)
+    event: camera      -> Kamera-Status (alle camera_event_interval Sekunden)
+    """
+    try:
+        subscriber = detection_events.subscribe()
+    except TooManyClientsError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    def generate():
+        last_camera_event = 0.0
+        try:
+            while not subscriber.closed and not shutdown_event.is_set():
+                item = subscriber.next_frame(timeout=1.0)
+                if item is not None:
+                    event_id, event = item
+                    yield f"id: {event_id}\nevent: {event.get('event', 'detections')}\ndata: {json.dumps(event)}\n\n"
+                
+                # Kamera-Status dient gleichzeitig als Keep-Alive
+                now = time.time()
+                if now - last_camera_event >= PR_STREAM_CONFIG['camera_event_interval']:
+                    last_camera_event = now
+                    yield f"event: camera\ndata: {json.dumps(camera_info_payload())}\n\n"
+                    yield f"event: gps\ndata: {json.dumps(gps_status_payload())}\n\n"
+        finally:
+            subscriber.close()
+    
+    return stream_response(stream_with_context(generate()), subscriber, mimetype='text/event-stream',
+                           headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def gps_status_payload():
+    """Status des Backend-GPS (für /gps_status und GPS-Events)"""
+    return {
+        'server_logging': gps_reader is not None,
+        'gps': gps_reader.get_stats() if gps_reader is not None else None,
+        'writer': detection_writer.get_stats() if detection_writer is not None else None
+    }
+
+@app.route('/gps_status')
+def gps_status():
+    """Gibt zurück, ob das Backend selbst GPS-Detections speichert"""
+    return jsonify(gps_status_payload())
+
+def camera_info_payload():
+    """Informationen über die aktuelle Kamera (für /camera_info und Kamera-Events)"""
+    source = video_source
+    stats = source.get_stats() if source is not None else {}
+    if stats.get('opened'):
+        return {
             'available': True,
             'index': camera_index,
-            'width': width,
-            'height': height,
-            'fps': fps
-        })
+            'kind': stats['kind'],
+            'width': stats.get('width'),
+            'height': stats.get('height'),
+            'fps': stats.get('fps'),
+            'source': stats
+        }
     else:
         # Kamera ist noch nicht geöffnet oder nicht verfügbar
-        return jsonify({
+        return {
             'available': False,
             'index': camera_index,
-            'message': 'Kamera wird gestartet oder ist nicht verfügbar'
-        })
+            'message': 'Kamera wird gestartet oder ist nicht verfügbar',
+            'source': stats or None
+        }
+
+@app.route('/camera_info')
+def get_camera_info():
+    """Gibt Informationen über die verfügbare Kamera zurück"""
+    return jsonify(camera_info_payload())
+
+def probe_camera(index):
+    """Prüft, ob eine Kamera geöffnet werden kann und Frames liefert (läuft im Discovery-Thread)"""
+    cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+    try:
+        # Versuche einen Frame zu lesen um sicherzustellen, dass die Kamera funktioniert
+        return cap.isOpened() and cap.read()[0]
+    finally:
+        cap.release()
+
+camera_discovery = CameraDiscovery(  # Kamera-Suche im Hintergrund, Ergebnis gecached
+    probe_camera,
+    max_index=PR_SOURCE_CONFIG['discovery_max_index'],
+    ttl=PR_SOURCE_CONFIG['discovery_ttl']
+)
 
 @app.route('/available_cameras')
 def available_cameras():
-    """Findet alle verfügbaren Kameras"""
-    cameras = []
-    # Teste die ersten 5 Kamera-Indizes
-    for i in range(5):
-        cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-        if cap.isOpened():
-            # Versuche einen Frame zu lesen um sicherzustellen, dass die Kamera funktioniert
-            success, _ = cap.read()
-            if success:
-                cameras.append({
-                    'index': i,
-                    'name': f'Kamera {i}'
-                })
-            cap.release()
-    return jsonify({'cameras': cameras})
+    """Findet alle verfügbaren Kameras (antwortet sofort, ?refresh=1 startet eine neue Suche)"""
+    # Die laufende Kamera nicht erneut öffnen - sie ist verfügbar
+    busy = (camera_index,) if isinstance(camera_index, int) else ()
+    if request.args.get('refresh') == '1':
+        camera_discovery.refresh(busy)
+    result = camera_discovery.get(busy)
+    result['cameras'] = [{'index': i, 'name': f'Kamera {i}'} for i in result['cameras']]
+    result['current'] = camera_index
+    return jsonify(result)
 
 @app.route('/toggle_yolo')
 def toggle_yolo():
@@ -324,6 +841,10 @@ def toggle_yolo():
     global yolo_enabled
     
     yolo_enabled = not yolo_enabled
+    if yolo_enabled:
+        model_loader.start()  # Kein Blockieren - Laden läuft im Hintergrund
+    if inference_scheduler is not None:
+        inference_scheduler.reset()
     status = "aktiviert" if yolo_enabled else "deaktiviert"
     log(f"========== YOLO {status.upper()} ==========")
     
@@ -338,60 +859,151 @@ def yolo_status():
     """Gibt den aktuellen YOLO-Status zurück"""
     global yolo_enabled
     return jsonify({
-        'yolo_enabled': yolo_enabled
+        'yolo_enabled': yolo_enabled,
+        'model_state': model_loader.state,
+        'backend': visualizer_instance.backend_info if visualizer_instance is not None else None,
+        'inference': visualizer_instance.get_inference_stats() if visualizer_instance is not None else None
     })
 
+@app.route('/model_status')
+def model_status():
+    """Lade-Zustand des Modells (idle/loading/warming/ready/error) und Warm-up-Zeiten"""
+    status = model_loader.get_stats()
+    instance = model_loader.get()
+    status['backend'] = instance.backend_info if instance is not None else None
+    return jsonify(status)
+
+def install_video_source(new_source, spec):
+    """Setzt die aktuelle Quelle -> (alte Quelle, alter Index); nur unter camera_lock aufrufen"""
+    global camera_index, video_source
+    old = (video_source, camera_index)
+    video_source, camera_index = new_source, spec
+    # Alte Detections gehören zur alten Kamera
+    if inference_scheduler is not None:
+        inference_scheduler.reset()
+    return old
+
+def switch_video_source(spec):
+    """Öffnet die neue Quelle und ersetzt die aktuelle erst, wenn sie funktioniert -> (success, message)"""
+    spec = parse_source(spec)
+    if spec == camera_index and video_source is not None and video_source.state == 'open':
+        return True, f'Quelle {spec} ist bereits aktiv'
+    
+    try:
+        new_source = make_video_source(spec)
+    except ValueError as e:
+        return False, str(e)
+    
+    log(f"Teste Quelle {spec}...")
+    same_device = isinstance(spec, int) and spec == camera_index
+    if same_device:
+        # Lokale Kameras lassen sich unter Windows oft nur einmal öffnen - alte freigeben
+        # und neue öffnen, ohne den Lock dazwischen abzugeben: sonst öffnet der
+        # Capture-Thread die alte Quelle sofort wieder
+        with camera_lock:
+            if video_source is not None:
+                video_source.release()
+            if not new_source.open():
+                return False, f'Quelle {spec} konnte nicht geöffnet werden'
+            old_source, old_index = install_video_source(new_source, spec)
+    else:
+        # Neue Quelle außerhalb des Locks öffnen, der Stream läuft solange weiter
+        if not new_source.open():
+            return False, f'Quelle {spec} konnte nicht geöffnet werden'
+        with camera_lock:
+            old_source, old_index = install_video_source(new_source, spec)
+    if old_source is not None and not same_device:
+        old_source.release()
+    if not camera_usage.active:
+        # Niemand schaut zu - die Kamera erst mit dem nächsten Zuschauer öffnen
+        new_source.release()
+    if pothole_tracker is not None:
+        pothole_tracker.flush()  # Tracks der alten Quelle abschließen
+    log(f"Quelle geändert von {old_index} zu {camera_index}")
+    return True, f'Quelle {spec} ausgewählt'
+
 @app.route('/switch_camera/<int:index>')
 def switch_camera(index):
     """Wechselt zu einer anderen Kamera"""
-    global camera_index, camera_capture, camera_lock
-    
     log(f"========== WECHSLE ZU KAMERA {index} ==========")
+    success, message = switch_video_source(index)
+    log(f"{'✓' if success else '✗'} {message}")
+    return jsonify({
+        'success': success,
+        'message': message.replace('Quelle', 'Kamera', 1),
+        'index': camera_index
+    })
+
+@app.route('/switch_source', methods=['GET', 'POST'])
+def switch_source():
+    """Wechselt die Video-Quelle: Kamera-Index, Datei, rtsp://-URL oder Bildfolge (?source=...)"""
+    if request.method == 'POST' and request.is_json:
+        spec = request.json.get('source', '')
+    else:
+        spec = request.args.get('source', '')
+    if str(spec).strip() == '':
+        return jsonify({'success': False, 'message': 'Keine Quelle angegeben'}), 400
     
-    # Thread-Safe Kamera-Wechsel
-    with camera_lock:
-        # Schließe die aktuelle Kamera
-        if camera_capture is not None:
-            log(f"Schließe alte Kamera {camera_index}...")
-            camera_capture.release()
-            camera_capture = None
-            time.sleep(0.5)  # Kurze Pause damit Windows die Kamera freigeben kann
-        
-        # Setze neuen Index
-        old_index = camera_index
-        camera_index = index
-        log(f"Kamera-Index geändert von {old_index} zu {camera_index}")
-    
-    # Teste die neue Kamera (außerhalb des Locks)
-    log(f"Teste Kamera {camera_index}...")
-    test_cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
-    if test_cap.isOpened():
-        # Teste ob wir einen Frame lesen können
-        success, _ = test_cap.read()
-        test_cap.release()
-        time.sleep(0.2)  # Kleine Pause
-        
-        if success:
-            log(f"✓ Kamera {index} erfolgreich getestet!")
-            return jsonify({
-                'success': True,
-                'message': f'Kamera {index} ausgewählt',
-                'index': index
-            })
-        else:
-            log(f"✗ Kamera {index} konnte keinen Frame lesen!")
-            return jsonify({
-                'success': False,
-                'message': f'Kamera {index} kann keine Frames lesen',
-                'index': camera_index
-            })
+    log(f"========== WECHSLE ZU QUELLE {spec} ==========")
+    success, message = switch_video_source(spec)
+    log(f"{'✓' if success else '✗'} {message}")
+    return jsonify({
+        'success': success,
+        'message': message,
+        'source': camera_index
+    })
+
+@app.route('/multi_camera/start', methods=['GET', 'POST'])
+def multi_camera_start():
+    """Startet den Multi-Kamera-Modus (z.B. ?sources=0,1,fahrt.mp4)"""
+    if request.method == 'POST' and request.is_json:
+        raw_sources = request.json.get('sources', [])
     else:
-        log(f"✗ Kamera {index} konnte nicht geöffnet werden!")
-        return jsonify({
-            'success': False,
-            'message': f'Kamera {index} konnte nicht geöffnet werden',
-            'index': camera_index
-        })
+        raw_sources = request.args.get('sources', '').split(',')
+    sources = [parse_source(s) for s in raw_sources if str(s).strip() != '']
+    
+    if not sources:
+        return jsonify({'success': False, 'message': 'Keine Quellen angegeben'}), 400
+    
+    log(f"========== MULTI-KAMERA-MODUS: {sources} ==========")
+    manager = get_multicam_manager()
+    try:
+        manager.start(sources)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'message': f'{len(sources)} Quellen gestartet',
+        'cameras': [{'camera_id': i, 'source': s} for i, s in enumerate(sources)]
+    })
+
+@app.route('/multi_camera/stop')
+def multi_camera_stop():
+    """Beendet den Multi-Kamera-Modus und gibt alle Quellen frei"""
+    if multicam_manager is not None:
+        multicam_manager.stop()
+    log("========== MULTI-KAMERA-MODUS BEENDET ==========")
+    return jsonify({'success': True, 'message': 'Multi-Kamera-Modus beendet'})
+
+@app.route('/multi_camera/status')
+def multi_camera_status():
+    """Status aller Quellen und der Batch-Inferenz"""
+    if multicam_manager is None:
+        return jsonify({'active': False, 'cameras': []})
+    return jsonify(multicam_manager.get_stats())
+
+@app.route('/multi_video_feed/<int:camera_id>')
+def multi_video_feed(camera_id):
+    """MJPEG-Stream einer einzelnen Kamera im Multi-Kamera-Modus"""
+    try:
+        subscriber = multicam_manager.subscribe(camera_id) if multicam_manager is not None else None
+    except TooManyClientsError as e:
+        return jsonify({'error': str(e)}), 503
+    if subscriber is None:
+        return jsonify({'error': f'Kamera {camera_id} ist nicht aktiv'}), 404
+    return stream_response(generate_frames(subscriber), subscriber,
+                           mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/map')
 def map_page():
@@ -401,43 +1013,85 @@ def map_page():
 
 @app.route('/get_detections')
 def get_detections():
-    """Liest alle Detections aus der CSV und gibt sie als JSON zurück"""
-    log("Detections werden geladen...")
+    """Gibt Detections als JSON zurück
     
-    detections = []
-    
-    # Prüfe ob CSV existiert
-    if not os.path.exists(CSV_FILE_PATH):
-        log("Keine CSV-Datei gefunden - erstelle neue")
-        # Erstelle CSV mit Header
-        with open(CSV_FILE_PATH, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['timestamp', 'latitude', 'longitude', 'confidence', 'pothole_count'])
-        return jsonify({'detections': []})
+    Optional: bbox=west,south,east,north, zoom, since, until (YYYY-MM-DD[ HH:MM:SS]).
+    Bei kleinem Zoom oder zu vielen Treffern werden serverseitige Cluster geliefert.
+    """
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+        zoom = request.args.get('zoom', type=int)
+        since, until = parse_time_range(request.args.get('since'), request.args.get('until'))
+    except ValueError as e:
+        return jsonify({'detections': [], 'error': str(e)}), 400
     
-    # Lese CSV
     try:
-        with open(CSV_FILE_PATH, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                detections.append({
-                    'timestamp': row['timestamp'],
-                    'latitude': float(row['latitude']),
-                    'longitude': float(row['longitude']),
-                    'confidence': float(row['confidence']),
-                    'pothole_count': int(row['pothole_count'])
-                })
+        store = get_detection_store()
+        
+        # Ohne Parameter: alle Detections (kompatibel zu älteren Clients)
+        if bbox is None and zoom is None and since is None and until is None:
+            detections = list(export_rows(store, detection_archive))
+            log(f"✓ {len(detections)} Detections geladen")
+            return jsonify({'detections': detections})
         
-        log(f"✓ {len(detections)} Detections geladen")
-        return jsonify({'detections': detections})
+        # Reicht der Bereich ins Archiv, werden Archiv und Datenbank gemeinsam ausgewertet
+        columns = None
+        if detection_archive is not None and detection_archive.partitions_for(bbox, since, until):
+            columns = combined_columns(store, detection_archive, bbox, since, until)
+        summary = summarize_range(columns) if columns is not None else store.summarize(bbox, since, until)
+        
+        if zoom is not None and (zoom < PR_MAP_CONFIG['cluster_max_zoom']
+                                 or summary['count'] > PR_MAP_CONFIG['max_markers']):
+            cell_size = 360.0 / (2 ** max(zoom, 0)) / PR_MAP_CONFIG['cluster_cells_per_tile']
+            if columns is not None:
+                clusters = cluster_columns(columns, cell_size)
+            else:
+                clusters = store.cluster_detections(cell_size, bbox, since, until)
+            return jsonify({'mode': 'clusters', 'clusters': clusters, 'detections': [], 'summary': summary})
+        
+        if columns is not None:
+            detections = newest_rows(columns, PR_MAP_CONFIG['max_markers'])
+        else:
+            detections = store.query_detections(bbox, since, until, limit=PR_MAP_CONFIG['max_markers'])
+        return jsonify({'mode': 'detections', 'detections': detections, 'clusters': [], 'summary': summary})
     
     except Exception as e:
-        log(f"✗ Fehler beim Lesen der CSV: {str(e)}")
+        log(f"✗ Fehler beim Lesen der Datenbank: {str(e)}")
         return jsonify({'detections': [], 'error': str(e)})
 
+@app.route('/get_potholes')
+def get_potholes():
+    """Gibt eindeutige (deduplizierte) Schlaglöcher als JSON zurück
+    
+    Gleiche Parameter wie /get_detections (bbox, zoom, since, until).
+    """
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+        zoom = request.args.get('zoom', type=int)
+        since, until = parse_time_range(request.args.get('since'), request.args.get('until'))
+    except ValueError as e:
+        return jsonify({'potholes': [], 'error': str(e)}), 400
+    
+    try:
+        store = get_detection_store()
+        summary = store.summarize_potholes(bbox, since, until)
+        
+        if zoom is not None and (zoom < PR_MAP_CONFIG['cluster_max_zoom']
+                                 or summary['count'] > PR_MAP_CONFIG['max_markers']):
+            cell_size = 360.0 / (2 ** max(zoom, 0)) / PR_MAP_CONFIG['cluster_cells_per_tile']
+            clusters = store.cluster_potholes(cell_size, bbox, since, until)
+            return jsonify({'mode': 'clusters', 'clusters': clusters, 'potholes': [], 'summary': summary})
+        
+        potholes = store.query_potholes(bbox, since, until, limit=PR_MAP_CONFIG['max_markers'])
+        return jsonify({'mode': 'potholes', 'potholes': potholes, 'clusters': [], 'summary': summary})
+    
+    except Exception as e:
+        log(f"✗ Fehler beim Lesen der Schlaglöcher: {str(e)}")
+        return jsonify({'potholes': [], 'error': str(e)})
+
 @app.route('/save_detection', methods=['POST'])
 def save_detection():
-    """Speichert eine neue Detection in die CSV"""
+    """Speichert eine neue Detection in der Datenbank"""
     try:
         data = request.json
         
@@ -451,29 +1105,20 @@ def save_detection():
             log("⚠ Fehler: GPS-Koordinaten fehlen")
             return jsonify({'success': False, 'error': 'GPS-Koordinaten fehlen'}), 400
         
-        # Erstelle CSV wenn nicht vorhanden
-        file_exists = os.path.exists(CSV_FILE_PATH)
+        # Speichere in Datenbank und ordne einem bekannten Schlagloch im Umkreis zu
+        result = get_detection_store().add_detection(latitude, longitude, confidence, pothole_count)
         
-        # Speichere in CSV
-        with open(CSV_FILE_PATH, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            
-            # Header schreiben wenn Datei neu
-            if not file_exists:
-                writer.writerow(['timestamp', 'latitude', 'longitude', 'confidence', 'pothole_count'])
-            
-            # Timestamp
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Daten schreiben
-            writer.writerow([timestamp, latitude, longitude, confidence, pothole_count])
-        
-        log(f"✓ Detection gespeichert: GPS({latitude}, {longitude}), Confidence: {confidence}%, Count: {pothole_count}")
+        status = "neues Schlagloch" if result['new_pothole'] else f"bekanntes Schlagloch, {result['hits']}. Treffer"
+        log(f"✓ Detection gespeichert: GPS({latitude}, {longitude}), Confidence: {confidence}%, "
+            f"Count: {pothole_count} ({status} #{result['pothole_id']})")
         
         return jsonify({
             'success': True,
             'message': 'Detection gespeichert',
-            'timestamp': timestamp
+            'timestamp': result['timestamp'],
+            'pothole_id': result['pothole_id'],
+            'new_pothole': result['new_pothole'],
+            'hits': result['hits']
         })
     
     except Exception as e:
@@ -482,17 +1127,121 @@ def save_detection():
 
 @app.route('/download_csv')
 def download_csv():
-    """Download der CSV-Datei"""
-    log("CSV-Download angefordert")
+    """Download der Detections, gestreamt aus Archiv und Datenbank
+    
+    Optional: format=csv|geojson|parquet, since, until (reines Datum = ganzer Tag), bbox.
+    Aus dem Archiv werden nur die Partitionen gelesen, die den Bereich überschneiden.
+    """
+    fmt = request.args.get('format', 'csv')
+    # Alles vor dem Streamen prüfen - mitten im Stream gibt es keinen 400 mehr
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+        since, until = parse_time_range(request.args.get('since'), request.args.get('until'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unbekanntes Export-Format '{fmt}' (erlaubt: {', '.join(EXPORT_FORMATS)})"}), 400
+    log(f"Download angefordert: format={fmt}, since={since}, until={until}, bbox={bbox}")
     
-    if not os.path.exists(CSV_FILE_PATH):
-        log("Keine CSV-Datei vorhanden")
+    store = get_detection_store()
+    archived = detection_archive.count() if detection_archive is not None else 0
+    if store.count() == 0 and archived == 0:
+        log("Keine Detections vorhanden")
         return jsonify({'error': 'Keine Daten vorhanden'}), 404
     
-    return send_file(CSV_FILE_PATH, 
-                     mimetype='text/csv',
-                     as_attachment=True,
-                     download_name='pothole_detections.csv')
+    rows = export_rows(store, detection_archive, bbox, since, until)
+    try:
+        chunks = iter_export(rows, fmt)
+    except (ValueError, RuntimeError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    suffix = ''.join(f"_{value[:10]}" for value in (since, until) if value)
+    return Response(stream_with_context(chunks),
+                    mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=pothole_detections{suffix}.{extension}'})
+
+@app.route('/archive/status')
+def archive_status():
+    """Partitionen des Archivs mit Statistik (optional nur die für since/until/bbox nötigen)"""
+    if detection_archive is None:
+        return jsonify({'enabled': False})
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+        since, until = parse_time_range(request.args.get('since'), request.args.get('until'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    stats = detection_archive.get_stats(bbox, since, until)
+    stats['enabled'] = True
+    return jsonify(stats)
+
+@app.route('/archive/roll', methods=['GET', 'POST'])
+def archive_roll():
+    """Verschiebt abgeschlossene Zeiträume sofort ins Archiv"""
+    if detection_archive is None:
+        return jsonify({'success': False, 'message': 'Archiv ist deaktiviert'}), 400
+    try:
+        rolled = detection_archive.roll(get_detection_store())
+    except Exception as e:
+        log(f"✗ Archivieren fehlgeschlagen: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+    return jsonify({
+        'success': True,
+        'message': f'{len(rolled)} Partitionen archiviert',
+        'partitions': rolled,
+        'archived_until': detection_archive.archived_until
+    })
+
+def shutdown():
+    """Beendet den Server geordnet: Streams, Kamera, Multi-Kamera, Writer, GPS und Modell"""
+    global visualizer_instance
+    if shutdown_event.is_set():
+        return
+    shutdown_event.set()
+    log("========== SERVER WIRD BEENDET ==========")
+    camera_usage.close_now()
+    if multicam_manager is not None:
+        multicam_manager.stop()
+    if gps_reader is not None:
+        gps_reader.stop()
+    if detection_writer is not None:
+        detection_writer.stop()  # Schreibt noch ausstehende Detections
+    if crop_writer is not None:
+        crop_writer.stop()  # Nach close_now(): flush() der Tracks hat die letzten Crops eingereiht
+    with visualizer_lock:
+        visualizer_instance = None
+    model_loader.release()
+    log("✓ Kamera und Modell freigegeben")
+
+# Läuft vor dem Stoppen der Log-Queue (atexit arbeitet rückwärts)
+atexit.register(shutdown)
+
+def run_production_server():
+    """Produktionsbetrieb mit waitress: feste Worker-Anzahl, Streams belegen nie die JSON-Worker"""
+    try:
+        from waitress import serve
+    except ImportError:
+        log("⚠ waitress nicht installiert (pip install waitress) - verwende Flask-Server ohne Reloader",
+            level=logging.WARNING)
+        app.run(debug=False, threaded=True, host=PR_SERVER_CONFIG['host'], port=PR_SERVER_CONFIG['port'])
+        return
+    
+    # Jeder /video_feed, /multi_video_feed und /detection_events Client hält einen Thread -
+    # alle sind begrenzt, zusätzlich bleiben api_threads Worker für die JSON-Endpunkte frei
+    threads = (PR_SERVER_CONFIG['api_threads'] + PR_STREAM_CONFIG['max_clients']
+               + PR_MULTICAM_CONFIG['max_clients'] + PR_STREAM_CONFIG['max_event_clients'])
+    # SIGTERM (z.B. systemd, docker stop) wie Strg+C behandeln -> atexit/shutdown() läuft
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    log(f"Starte waitress auf {PR_SERVER_CONFIG['host']}:{PR_SERVER_CONFIG['port']} mit {threads} Threads")
+    serve(
+        app,
+        host=PR_SERVER_CONFIG['host'],
+        port=PR_SERVER_CONFIG['port'],
+        threads=threads,
+        connection_limit=PR_SERVER_CONFIG['connection_limit'],
+        channel_timeout=PR_SERVER_CONFIG['channel_timeout'],
+        ident='pothole-detection'
+    )
 
 if __name__ == "__main__":
     try:
@@ -502,4 +1251,17 @@ if __name__ == "__main__":
         print(f"WARNUNG: {str(e)}")
         print("Die Anwendung kann ohne Modell-Datei nicht funktionieren.")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    production = PR_SERVER_CONFIG['mode'] == 'production'
+    # Mit debug=True läuft der Server im Reloader-Kindprozess - Kamera und Modell nur dort starten
+    serving = production or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    
+    # Modell im Hintergrund laden, damit der erste YOLO-Frame nicht wartet
+    if PR_WARMUP_CONFIG['preload_on_start'] and serving:
+        model_loader.start()
+    if serving:
+        start_headless_logging()
+    
+    if production:
+        run_production_server()
+    else:
+        app.run(debug=True, host=PR_SERVER_CONFIG['host'], port=PR_SERVER_CONFIG['port'])
\ No newline at end of file
@@ -0,0 +1,586 @@
+"""
+PyResearch Detection-Archiv
+
+Verschiebt abgeschlossene Zeiträume (Monat oder Tag) aus der SQLite-Datenbank
+in komprimierte, spaltenorientierte Dateien:
+
+    archive/detections_2025-03_1234.npz       NumPy (Standard, keine Zusatz-Abhängigkeit)
+    archive/detections_2025-03_1234.parquet   Parquet (fmt='parquet', braucht pyarrow)
+    archive/manifest.json                     Statistik pro Partition (Anzahl, Zeitraum, Bounding-Box, ...)
+
+Die Zahl im Dateinamen ist die höchste archivierte Datenbank-ID der Partition
+(max_id im Manifest). roll() überspringt Zeilen bis zu dieser ID und löscht nur
+bis zur höchsten gelesenen ID - ein Abbruch zwischen Schreiben und Löschen
+erzeugt so keine Duplikate, und währenddessen eingefügte Zeilen gehen nicht
+verloren.
+
+Abfragen öffnen nur Partitionen, deren Zeitraum und Bounding-Box laut Manifest
+passen. Die Datenbank enthält danach nur noch den laufenden Zeitraum (die
+Tabelle "potholes" bleibt vollständig) - export_rows() setzt Archiv und
+Datenbank wieder zusammen.
+
+    python archive.py roll                                  # Abgeschlossene Monate archivieren
+    python archive.py stats --since 2025-01-01
+    python archive.py export --format geojson --since 2025-03-01 --until 2025-03-31 -o maerz.geojson
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from storage import CSV_COLUMNS, DetectionStore, iter_csv_rows, parse_bbox, parse_time, parse_time_range
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+PARTITIONS = {'month': 7, 'day': 10}  # Länge des Partitions-Schlüssels ('2025-03' bzw. '2025-03-14')
+FORMATS = ('npz', 'parquet')
+EXPORT_FORMATS = {
+    # format -> (Mimetype, Dateiendung)
+    'csv': ('text/csv', 'csv'),
+    'geojson': ('application/geo+json', 'geojson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+COLUMN_DTYPES = {
+    'latitude': np.float64,
+    'longitude': np.float64,
+    'confidence': np.float32,
+    'pothole_count': np.int32
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet braucht pyarrow (pip install pyarrow)")
+    return pa, pq
+
+
+def _datetime64(value):
+    return np.datetime64(value.replace(' ', 'T'), 's')
+
+
+def _normalize_timestamp(value):
+    """Zeitstempel im Format der Datenbank oder None, wenn er ungültig ist"""
+    try:
+        return parse_time(value)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def rows_to_columns(rows):
+    """Detection-Dicts -> ein NumPy-Array pro Spalte (Zeitstempel als datetime64[s])
+
+    Zeilen mit ungültigem Zeitstempel werden ausgelassen.
+    """
+    rows = list(rows)
+    try:
+        timestamps = np.array([row['timestamp'].replace(' ', 'T') for row in rows], dtype='datetime64[s]')
+    except (AttributeError, ValueError):
+        # Einzelne defekte Zeitstempel (z.B. aus einem alten CSV-Import) auslassen statt alles abzubrechen
+        rows = [dict(row, timestamp=timestamp) for timestamp, row in
+                ((_normalize_timestamp(row['timestamp']), row) for row in rows) if timestamp]
+        timestamps = np.array([row['timestamp'].replace(' ', 'T') for row in rows], dtype='datetime64[s]')
+    columns = {
+        name: np.array([row[name] for row in rows], dtype=dtype) for name, dtype in COLUMN_DTYPES.items()
+    }
+    columns['timestamp'] = timestamps
+    return columns
+
+
+def columns_to_rows(columns):
+    """Umkehrung von rows_to_columns() - liefert Detection-Dicts wie DetectionStore.iter_detections()"""
+    timestamps = np.datetime_as_string(columns['timestamp'], unit='s')
+    latitudes = columns['latitude'].tolist()
+    longitudes = columns['longitude'].tolist()
+    confidences = columns['confidence'].tolist()
+    counts = columns['pothole_count'].tolist()
+    for i, timestamp in enumerate(timestamps):
+        yield {
+            'timestamp': str(timestamp).replace('T', ' '),
+            'latitude': latitudes[i],
+            'longitude': longitudes[i],
+            'confidence': round(confidences[i], 2),
+            'pothole_count': counts[i]
+        }
+
+
+def empty_columns():
+    columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+    columns['timestamp'] = np.empty(0, dtype='datetime64[s]')
+    return columns
+
+
+def summarize_columns(columns):
+    """Kleine Statistik einer Partition (landet im Manifest)"""
+    timestamps = columns['timestamp']
+    return {
+        'count': int(len(timestamps)),
+        'first': str(np.datetime_as_string(timestamps.min(), unit='s')).replace('T', ' '),
+        'last': str(np.datetime_as_string(timestamps.max(), unit='s')).replace('T', ' '),
+        # west, south, east, north wie parse_bbox()
+        'bbox': [float(columns['longitude'].min()), float(columns['latitude'].min()),
+                 float(columns['longitude'].max()), float(columns['latitude'].max())],
+        'avg_confidence': round(float(columns['confidence'].mean()), 1),
+        'max_confidence': round(float(columns['confidence'].max()), 1),
+        'pothole_count': int(columns['pothole_count'].sum())
+    }
+
+
+def _arrow_table(columns):
+    pa, _ = _require_pyarrow()
+    schema = pa.schema([
+        ('timestamp', pa.timestamp('s')),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('confidence', pa.float32()),
+        ('pothole_count', pa.int32())
+    ])
+    return pa.Table.from_arrays([pa.array(columns[name], type=schema.field(name).type) for name in CSV_COLUMNS],
+                                schema=schema)
+
+
+def write_partition(path, columns, fmt='npz'):
+    """Schreibt eine Partition atomar (erst .tmp, dann umbenennen)"""
+    tmp_path = path + '.tmp'
+    if fmt == 'parquet':
+        _, pq = _require_pyarrow()
+        pq.write_table(_arrow_table(columns), tmp_path, compression='zstd')
+    else:
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **{name: columns[name] for name in CSV_COLUMNS})
+    os.replace(tmp_path, path)
+
+
+def read_partition(path, fmt='npz'):
+    if fmt == 'parquet':
+        _, pq = _require_pyarrow()
+        table = pq.read_table(path, columns=CSV_COLUMNS)
+        return {name: table.column(name).to_numpy() for name in CSV_COLUMNS}
+    with np.load(path) as data:
+        return {name: data[name] for name in CSV_COLUMNS}
+
+
+class DetectionArchive:
+    """Zeit-partitioniertes, komprimiertes Archiv mit Manifest (thread-sicher)"""
+
+    def __init__(self, directory='archive', partition='month', fmt='npz'):
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unbekannte Partitionierung '{partition}' (erlaubt: {', '.join(PARTITIONS)})")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unbekanntes Archiv-Format '{fmt}' (erlaubt: {', '.join(FORMATS)})")
+        self.directory = directory
+        self.partition = partition
+        self.format = fmt
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        return {'archived_until': None, 'partitions': {}}
+
+    def _save_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _key(self, timestamp):
+        return timestamp[:PARTITIONS[self.partition]]
+
+    def _period_start(self, key):
+        return key + ('-01 00:00:00' if self.partition == 'month' else ' 00:00:00')
+
+    @property
+    def archived_until(self):
+        return self.manifest['archived_until']
+
+    # ---------- Schreiben ----------
+
+    def _archived_id(self, key):
+        """Höchste bereits archivierte Datenbank-ID der Partition (0 = noch nichts)"""
+        stats = self.manifest['partitions'].get(key)
+        return stats.get('max_id', 0) if stats is not None else 0
+
+    def roll(self, store, now=None):
+        """Verschiebt alle abgeschlossenen Zeiträume aus der Datenbank ins Archiv -> geänderte Partitionen
+
+        Nachzügler (z.B. ein späterer CSV-Import alter Fahrten) werden an die
+        bestehende Partition angehängt. Zeilen, die schon im Archiv stehen (Abbruch
+        nach dem Schreiben, vor dem Löschen), werden übersprungen und nur gelöscht.
+        Zeilen mit ungültigem Zeitstempel bleiben in der Datenbank, statt den
+        ganzen Zeitraum scheitern zu lassen.
+        """
+        now = now or datetime.now()
+        cutoff = self._period_start(self._key(now.strftime(TIMESTAMP_FORMAT)))
+        last_second = (datetime.strptime(cutoff, TIMESTAMP_FORMAT) - timedelta(seconds=1)).strftime(TIMESTAMP_FORMAT)
+        with self._lock:
+            rolled = []
+            key, rows = None, []
+            max_id = 0  # Höchste gelesene ID - nur bis dahin wird gelöscht
+            bad_ids = []
+            # iter_detections ist nach Zeit sortiert - eine Partition nach der anderen
+            for row in store.iter_detections(until=last_second, with_ids=True):
+                max_id = max(max_id, row['id'])
+                timestamp = _normalize_timestamp(row['timestamp'])
+                if timestamp is None:
+                    bad_ids.append(row['id'])
+                    continue
+                row['timestamp'] = timestamp
+                row_key = self._key(row['timestamp'])
+                if row_key != key and rows:
+                    rolled.append(self._append(key, rows))
+                    rows = []
+                key = row_key
+                if row['id'] > self._archived_id(row_key):
+                    rows.append(row)
+            if rows:
+                rolled.append(self._append(key, rows))
+
+            if self.manifest['archived_until'] is None or cutoff > self.manifest['archived_until']:
+                self.manifest['archived_until'] = cutoff
+            self._save_manifest()
+            deleted = store.delete_detections_before(cutoff, max_id, bad_ids) if max_id else 0
+        if bad_ids:
+            logger.warning(f"Archiv: {len(bad_ids)} Detections mit ungültigem Zeitstempel bleiben in der "
+                           f"Datenbank (IDs {', '.join(map(str, bad_ids[:10]))}{' ...' if len(bad_ids) > 10 else ''})")
+        if rolled or deleted:
+            logger.info(f"Archiv: {deleted} Detections in {len(rolled)} Partitionen verschoben ({', '.join(rolled)})")
+        return rolled
+
+    def _append(self, key, rows):
+        max_id = max(row['id'] for row in rows)
+        columns = rows_to_columns(rows)
+        existing = self.manifest['partitions'].get(key)
+        if existing is not None:
+            max_id = max(max_id, existing.get('max_id', 0))
+            old = read_partition(os.path.join(self.directory, existing['file']), existing['format'])
+            columns = {name: np.concatenate([old[name], columns[name]]) for name in CSV_COLUMNS}
+        order = np.argsort(columns['timestamp'], kind='stable')
+        columns = {name: values[order] for name, values in columns.items()}
+
+        # Neue Datei neben der alten - bis das Manifest gespeichert ist, gilt die alte
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f'detections_{key}_{max_id}.{self.format}'
+        write_partition(os.path.join(self.directory, filename), columns, self.format)
+
+        stats = summarize_columns(columns)
+        stats.update({
+            'file': filename,
+            'format': self.format,
+            'max_id': max_id,
+            'bytes': os.path.getsize(os.path.join(self.directory, filename)),
+            'archived_at': time.strftime(TIMESTAMP_FORMAT)
+        })
+        self.manifest['partitions'][key] = stats
+        self._save_manifest()
+        if existing is not None and existing['file'] != filename:
+            os.remove(os.path.join(self.directory, existing['file']))
+        return key
+
+    # ---------- Lesen ----------
+    # since/until wie von parse_time_range() geliefert (until schon bis Tagesende)
+
+    def partitions_for(self, bbox=None, since=None, until=None):
+        """Partitionen, die den Bereich laut Manifest überschneiden können (ohne Dateien zu öffnen)"""
+        with self._lock:
+            partitions = sorted(self.manifest['partitions'].items())
+        selected = []
+        for key, stats in partitions:
+            if since and stats['last'] < since:
+                continue
+            if until and stats['first'] > until:
+                continue
+            if bbox is not None:
+                west, south, east, north = bbox
+                p_west, p_south, p_east, p_north = stats['bbox']
+                if p_east < west or p_west > east or p_north < south or p_south > north:
+                    continue
+            selected.append(key)
+        return selected
+
+    def _read_filtered(self, key, bbox=None, since=None, until=None):
+        stats = self.manifest['partitions'][key]
+        columns = read_partition(os.path.join(self.directory, stats['file']), stats['format'])
+        mask = np.ones(len(columns['timestamp']), dtype=bool)
+        if since:
+            mask &= columns['timestamp'] >= _datetime64(since)
+        if until:
+            mask &= columns['timestamp'] <= _datetime64(until)
+        if bbox is not None:
+            west, south, east, north = bbox
+            mask &= (columns['latitude'] >= south) & (columns['latitude'] <= north)
+            mask &= (columns['longitude'] >= west) & (columns['longitude'] <= east)
+        if mask.all():
+            return columns
+        return {name: values[mask] for name, values in columns.items()}
+
+    def load(self, bbox=None, since=None, until=None):
+        """Alle passenden Zeilen als NumPy-Spalten - für Auswertungen über lange Zeiträume"""
+        parts = [self._read_filtered(key, bbox, since, until) for key in self.partitions_for(bbox, since, until)]
+        parts = [part for part in parts if len(part['timestamp'])]
+        if not parts:
+            return empty_columns()
+        return {name: np.concatenate([part[name] for part in parts]) for name in CSV_COLUMNS}
+
+    def iter_rows(self, bbox=None, since=None, until=None):
+        """Detection-Dicts partitionsweise (nie mehr als eine Partition im Speicher)"""
+        for key in self.partitions_for(bbox, since, until):
+            yield from columns_to_rows(self._read_filtered(key, bbox, since, until))
+
+    def count(self):
+        return sum(stats['count'] for stats in self.manifest['partitions'].values())
+
+    def get_stats(self, bbox=None, since=None, until=None):
+        """Manifest-Übersicht; mit Bereich nur die Partitionen, die gelesen werden müssten"""
+        keys = self.partitions_for(bbox, since, until)
+        partitions = {key: self.manifest['partitions'][key] for key in keys}
+        return {
+            'directory': self.directory,
+            'partition': self.partition,
+            'format': self.format,
+            'archived_until': self.archived_until,
+            'partitions': partitions,
+            'count': sum(stats['count'] for stats in partitions.values()),
+            'bytes': sum(stats['bytes'] for stats in partitions.values())
+        }
+
+
+# ---------- Abfragen über Archiv und Datenbank ----------
+
+def combined_columns(store, archive, bbox=None, since=None, until=None):
+    """Archiv (nur passende Partitionen) und Datenbank als gemeinsame NumPy-Spalten, nach Zeit sortiert"""
+    parts = [archive.load(bbox, since, until)] if archive is not None else []
+    parts.append(rows_to_columns(store.iter_detections(bbox=bbox, since=since, until=until)))
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in CSV_COLUMNS}
+    order = np.argsort(columns['timestamp'], kind='stable')
+    return {name: values[order] for name, values in columns.items()}
+
+
+def _timestamp_text(value):
+    return str(np.datetime_as_string(value, unit='s')).replace('T', ' ')
+
+
+def summarize_range(columns):
+    """Wie DetectionStore.summarize(), aber auf combined_columns()"""
+    if not len(columns['timestamp']):
+        return {'count': 0, 'avg_confidence': 0, 'pothole_count': 0, 'first_seen': None, 'last_seen': None}
+    return {
+        'count': int(len(columns['timestamp'])),
+        'avg_confidence': round(float(columns['confidence'].mean()), 1),
+        'pothole_count': int(columns['pothole_count'].sum()),
+        'first_seen': _timestamp_text(columns['timestamp'][0]),
+        'last_seen': _timestamp_text(columns['timestamp'][-1])
+    }
+
+
+def cluster_columns(columns, cell_size):
+    """Wie DetectionStore.cluster_detections(), aber auf combined_columns()"""
+    if not len(columns['timestamp']):
+        return []
+    rows = ((columns['latitude'] + 90.0) // cell_size).astype(np.int64)
+    cols = ((columns['longitude'] + 180.0) // cell_size).astype(np.int64)
+    cells, inverse = np.unique(np.stack([rows, cols], axis=1), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    counts = np.bincount(inverse, minlength=len(cells))
+    latitudes = np.bincount(inverse, weights=columns['latitude'], minlength=len(cells)) / counts
+    longitudes = np.bincount(inverse, weights=columns['longitude'], minlength=len(cells)) / counts
+    potholes = np.bincount(inverse, weights=columns['pothole_count'], minlength=len(cells))
+    max_confidence = np.full(len(cells), -np.inf)
+    np.maximum.at(max_confidence, inverse, columns['confidence'].astype(np.float64))
+    # Spalten sind nach Zeit sortiert - der letzte Index pro Zelle ist die neueste Detection
+    last_index = np.zeros(len(cells), dtype=np.int64)
+    np.maximum.at(last_index, inverse, np.arange(len(inverse)))
+    last_seen = np.datetime_as_string(columns['timestamp'][last_index], unit='s')
+    return [
+        {
+            'count': int(counts[i]),
+            'latitude': float(latitudes[i]),
+            'longitude': float(longitudes[i]),
+            'max_confidence': round(float(max_confidence[i]), 2),
+            'pothole_count': int(potholes[i]),
+            'last_seen': str(last_seen[i]).replace('T', ' ')
+        }
+        for i in range(len(cells))
+    ]
+
+
+def newest_rows(columns, limit=None):
+    """Wie DetectionStore.query_detections(): die neuesten limit Detections, aufsteigend nach Zeit"""
+    if limit:
+        columns = {name: values[-int(limit):] for name, values in columns.items()}
+    return list(columns_to_rows(columns))
+
+
+# ---------- Export ----------
+
+def export_rows(store, archive=None, bbox=None, since=None, until=None, batch_size=1000):
+    """Alle Detections im Bereich: erst das Archiv (nur passende Partitionen), dann die Datenbank"""
+    if archive is not None:
+        yield from archive.iter_rows(bbox, since, until)
+    yield from store.iter_detections(batch_size, bbox, since, until)
+
+
+def iter_geojson(rows, batch_size=1000):
+    """Streamt Detections als GeoJSON-FeatureCollection (ein Point-Feature pro Detection)"""
+    chunk = ['{"type": "FeatureCollection", "features": [']
+    for i, row in enumerate(rows):
+        feature = {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [row['longitude'], row['latitude']]},
+            'properties': {
+                'timestamp': row['timestamp'],
+                'confidence': row['confidence'],
+                'pothole_count': row['pothole_count']
+            }
+        }
+        chunk.append((',' if i else '') + json.dumps(feature))
+        if len(chunk) >= batch_size:
+            yield '\n'.join(chunk)
+            chunk = ['']
+    chunk.append(']}\n')
+    yield '\n'.join(chunk)
+
+
+class _ChunkSink:
+    """Schreibziel für pyarrow, aus dem die geschriebenen Bytes blockweise abgeholt werden"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def readable(self):
+        return False
+
+    def seekable(self):
+        return False
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet(rows, batch_size=50000):
+    """Streamt Detections als Parquet - eine Row-Group pro batch_size Zeilen"""
+    pa, pq = _require_pyarrow()
+    sink = _ChunkSink()
+    writer = None
+    batch = []
+
+    def write_batch():
+        nonlocal writer
+        table = _arrow_table(rows_to_columns(batch))
+        if writer is None:
+            writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), table.schema, compression='zstd')
+        writer.write_table(table)
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            write_batch()
+            batch = []
+            yield sink.drain()
+    if batch or writer is None:
+        write_batch()
+    writer.close()
+    yield sink.drain()
+
+
+def iter_export(rows, fmt='csv', batch_size=1000):
+    """Export im gewünschten Format (ValueError bei unbekanntem Format)"""
+    if fmt == 'csv':
+        return iter_csv_rows(rows, batch_size)
+    if fmt == 'geojson':
+        return iter_geojson(rows, batch_size)
+    if fmt == 'parquet':
+        _require_pyarrow()  # Fehler sofort statt mitten im Stream
+        return iter_parquet(rows)
+    raise ValueError(f"Unbekanntes Export-Format '{fmt}' (erlaubt: {', '.join(EXPORT_FORMATS)})")
+
+
+def parse_args(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db', default='detections.db', help="SQLite-Datenbank (Standard: detections.db)")
+    common.add_argument('--archive', default='archive', help="Archiv-Verzeichnis (Standard: archive)")
+    common.add_argument('--partition', choices=list(PARTITIONS), default='month')
+    common.add_argument('--archive-format', choices=FORMATS, default='npz')
+
+    ranged = argparse.ArgumentParser(add_help=False)
+    ranged.add_argument('--since', help="Ab Datum/Zeit (z.B. 2025-03-01)")
+    ranged.add_argument('--until', help="Bis Datum/Zeit (reines Datum = ganzer Tag)")
+    ranged.add_argument('--bbox', help="west,south,east,north")
+
+    parser = argparse.ArgumentParser(description="Detection-Archiv: Partitionen rollen, Statistik, Export")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('roll', parents=[common], help="Abgeschlossene Zeiträume ins Archiv verschieben")
+    commands.add_parser('stats', parents=[common, ranged], help="Partitionen und Statistik (nur Manifest)")
+    export = commands.add_parser('export', parents=[common, ranged], help="Bereich aus Archiv + Datenbank exportieren")
+    export.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    export.add_argument('-o', '--output', required=True, help="Ausgabe-Datei")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    bbox, since, until = None, None, None
+    if args.command != 'roll':
+        try:
+            bbox = parse_bbox(args.bbox)
+            since, until = parse_time_range(args.since, args.until)
+        except ValueError as e:
+            logger.error(f"✗ {e}")
+            return 2
+    archive = DetectionArchive(args.archive, args.partition, args.archive_format)
+    if args.command == 'stats':
+        print(json.dumps(archive.get_stats(bbox, since, until), indent=2))
+        return 0
+
+    store = DetectionStore(args.db)
+    if args.command == 'roll':
+        print(json.dumps(archive.roll(store)))
+        return 0
+
+    rows = export_rows(store, archive, bbox, since, until)
+    with open(args.output, 'wb') as f:
+        for chunk in iter_export(rows, args.format):
+            f.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    print(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(main())
@@ -0,0 +1,464 @@
+"""
+PyResearch Inferenz-Backends
+
+Exportiert best.pt einmalig nach ONNX (ONNX Runtime) oder OpenVINO und legt
+das Ergebnis neben best.pt ab. Ultralytics lädt die exportierten Modelle über
+denselben YOLO(...)-Aufruf, die Ausgabe (Results -> sv.Detections) bleibt also
+identisch - nur der Modell-Aufruf läuft ohne PyTorch-Eager-Modus.
+
+Optional wird eine INT8-Variante aus Kalibrierungs-Frames erzeugt
+(Bild-Verzeichnis oder Video), z.B. Aufnahmen aus dem Fahrzeug:
+
+    best.pt -> best.onnx / best_int8.onnx
+            -> best_openvino_model/ / best_int8_openvino_model/
+
+Vorab exportieren (z.B. beim Deployment):
+    python backends.py --backend openvino --int8 --calibration kalibrierung/
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+
+
+@contextlib.contextmanager
+def _torch_weights_only_disabled():
+    """PyTorch 2.6 Fix: weights_only=False für unser eigenes, vertrauenswürdiges Modell"""
+    import torch
+    original_load = torch.load
+
+    def patched_load(*args, **kwargs):
+        kwargs['weights_only'] = False
+        return original_load(*args, **kwargs)
+
+    torch.load = patched_load
+    try:
+        yield
+    finally:
+        torch.load = original_load
+
+
+def _load_pytorch(model_path):
+    from ultralytics import YOLO
+    with _torch_weights_only_disabled():
+        return YOLO(model_path)
+
+
+# ---------- Cache ----------
+
+def artifact_path(model_path, backend, int8=False):
+    """Pfad des exportierten Modells neben best.pt"""
+    stem = os.path.splitext(model_path)[0] + ('_int8' if int8 else '')
+    if backend == 'onnx':
+        return stem + '.onnx'
+    if backend == 'openvino':
+        return stem + '_openvino_model'
+    return model_path
+
+
+def _stamp_path(artifact):
+    return artifact.rstrip('/\\') + '.json'
+
+
+def _is_fresh(artifact, model_path, imgsz):
+    """Export ist aktuell, wenn best.pt und Bildgröße unverändert sind"""
+    if not os.path.exists(artifact) or not os.path.exists(_stamp_path(artifact)):
+        return False
+    try:
+        with open(_stamp_path(artifact), 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return stamp.get('source_mtime') == os.path.getmtime(model_path) and stamp.get('imgsz') == imgsz
+
+
+def _write_stamp(artifact, model_path, imgsz, **extra):
+    stamp = {'source': os.path.basename(model_path), 'source_mtime': os.path.getmtime(model_path), 'imgsz': imgsz}
+    stamp.update(extra)
+    with open(_stamp_path(artifact), 'w', encoding='utf-8') as f:
+        json.dump(stamp, f, indent=2)
+
+
+# ---------- Kalibrierung ----------
+
+def load_calibration_frames(source, limit=200):
+    """Liest bis zu limit Frames aus einem Bild-Verzeichnis oder Video (gleichmäßig verteilt)"""
+    if not source or not os.path.exists(source):
+        return []
+    frames = []
+    if os.path.isdir(source):
+        images = sorted(
+            os.path.join(root, name)
+            for root, _, files in os.walk(source)
+            for name in files
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+        )
+        step = max(1, len(images) // limit)
+        for path in images[::step][:limit]:
+            frame = cv2.imread(path)
+            if frame is not None:
+                frames.append(frame)
+    else:
+        capture = cv2.VideoCapture(source)
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        step = max(1, frame_count // limit) if frame_count else 1
+        index = 0
+        while len(frames) < limit:
+            success, frame = capture.read()
+            if not success:
+                break
+            if index % step == 0:
+                frames.append(frame)
+            index += 1
+        capture.release()
+    return frames
+
+
+def preprocess(frame, imgsz):
+    """Letterbox wie Ultralytics: BGR-Frame -> float32 NCHW (1, 3, imgsz, imgsz), 0..1"""
+    height, width = frame.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    resized = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    blob = canvas[:, :, ::-1].transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.0
+    return np.ascontiguousarray(blob)
+
+
+# ---------- Inferenz-Vorverarbeitung ----------
+
+class LetterboxBuffer:
+    """ROI-Ausschnitt -> verkleinern -> Letterbox -> NCHW float32 in wiederverwendeten Puffern
+
+    roi ist (x1, y1, x2, y2) relativ zur Frame-Größe, z.B. (0, 0.4, 1, 1) für die
+    untere Bildhälfte (Straße). Die Puffer werden nur bei geänderter Frame-Größe
+    neu angelegt. remap() rechnet Boxen zurück in Koordinaten des vollen Frames.
+    """
+
+    def __init__(self, width=640, roi=None, stride=32, max_batch=1):
+        self.width = width
+        self.roi = roi or (0.0, 0.0, 1.0, 1.0)
+        self.stride = stride
+        self.max_batch = max(1, int(max_batch))
+        self.frame_shape = None
+
+    def _layout(self, frame_shape):
+        """Berechnet ROI, Skalierung und Padding für eine Frame-Größe und legt die Puffer an"""
+        if frame_shape == self.frame_shape:
+            return
+        import torch
+
+        height, width = frame_shape[:2]
+        x1, y1 = int(self.roi[0] * width), int(self.roi[1] * height)
+        x2, y2 = int(self.roi[2] * width), int(self.roi[3] * height)
+        roi_width, roi_height = max(1, x2 - x1), max(1, y2 - y1)
+
+        # Nie hochskalieren - kleine Quellen bleiben in Originalgröße
+        self.scale = min(1.0, self.width / roi_width)
+        resized_width = max(1, round(roi_width * self.scale))
+        resized_height = max(1, round(roi_height * self.scale))
+        canvas_width = -(-resized_width // self.stride) * self.stride
+        canvas_height = -(-resized_height // self.stride) * self.stride
+
+        self.roi_box = (x1, y1, x2, y2)
+        self.resized_size = (resized_width, resized_height)
+        self.pad = ((canvas_width - resized_width) // 2, (canvas_height - resized_height) // 2)
+        self.input_shape = (canvas_height, canvas_width)
+
+        self._resized = np.empty((resized_height, resized_width, 3), dtype=np.uint8)
+        self._canvas = np.full((canvas_height, canvas_width, 3), 114, dtype=np.uint8)
+        self._blob = np.empty((self.max_batch, 3, canvas_height, canvas_width), dtype=np.float32)
+        self._tensor = torch.from_numpy(self._blob)  # Teilt den Speicher mit _blob
+        self.frame_shape = frame_shape
+
+    def prepare(self, frames):
+        """Füllt den Eingabe-Tensor (teilt den Speicher mit dem Puffer) für 1..max_batch Frames"""
+        self._layout(frames[0].shape)
+        x1, y1, x2, y2 = self.roi_box
+        left, top = self.pad
+        resized_width, resized_height = self.resized_size
+        for i, frame in enumerate(frames):
+            cv2.resize(frame[y1:y2, x1:x2], self.resized_size, dst=self._resized, interpolation=cv2.INTER_AREA)
+            self._canvas[top:top + resized_height, left:left + resized_width] = self._resized
+            # BGR -> RGB, HWC -> CHW, 0..255 -> 0..1 direkt in den Batch-Puffer
+            np.multiply(self._canvas[:, :, ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=self._blob[i])
+        return self._tensor[:len(frames)]
+
+    def remap(self, xyxy):
+        """Boxen aus Eingabe-Koordinaten zurück in den vollen Frame"""
+        if len(xyxy) == 0:
+            return xyxy
+        x1, y1, x2, y2 = self.roi_box
+        left, top = self.pad
+        boxes = (xyxy - np.array([left, top, left, top], dtype=np.float32)) / self.scale
+        boxes += np.array([x1, y1, x1, y1], dtype=np.float32)
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], x1, x2 - 1)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], y1, y2 - 1)
+        return boxes
+
+    def get_stats(self):
+        if self.frame_shape is None:
+            return None
+        height, width = self.frame_shape[:2]
+        return {
+            'frame': [width, height],
+            'roi': list(self.roi_box),
+            'input': [self.input_shape[1], self.input_shape[0]],
+            'pixel_ratio': round(self.input_shape[0] * self.input_shape[1] / float(width * height), 3)
+        }
+
+
+# ---------- Export ----------
+
+def _export_fp32(model_path, backend, imgsz):
+    """Exportiert best.pt über Ultralytics (dynamische Batch-Größe für detect_batch)"""
+    target = artifact_path(model_path, backend)
+    if _is_fresh(target, model_path, imgsz):
+        return target
+
+    logger.info(f"Exportiere {model_path} nach {backend} (imgsz={imgsz})...")
+    model = _load_pytorch(model_path)
+    exported = model.export(format=backend, imgsz=imgsz, dynamic=True, half=False, int8=False)
+    exported = str(exported)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        shutil.move(exported, target)
+    _write_stamp(target, model_path, imgsz, backend=backend, int8=False)
+    logger.info(f"✓ Export gespeichert: {target}")
+    return target
+
+
+def _quantize_onnx(fp32_path, target, frames, imgsz):
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.input_name = input_name
+            self.frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            return None if frame is None else {self.input_name: preprocess(frame, imgsz)}
+
+    input_name = onnx.load(fp32_path, load_external_data=False).graph.input[0].name
+    quantize_static(
+        fp32_path, target, FrameReader(input_name),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+
+    # Ultralytics liest Klassennamen/imgsz aus den ONNX-Metadaten - vom FP32-Modell übernehmen
+    source = onnx.load(fp32_path)
+    quantized = onnx.load(target)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, target)
+
+
+def _quantize_openvino(fp32_dir, target, frames, imgsz):
+    import nncf
+    import openvino as ov
+
+    xml_path = next(
+        os.path.join(fp32_dir, name) for name in os.listdir(fp32_dir) if name.endswith('.xml')
+    )
+    ov_model = ov.Core().read_model(xml_path)
+    quantized = nncf.quantize(
+        ov_model,
+        nncf.Dataset(frames, lambda frame: preprocess(frame, imgsz)),
+        preset=nncf.QuantizationPreset.MIXED,
+        subset_size=len(frames),
+        # Box-Dekodierung im Detect-Head in voller Genauigkeit lassen
+        ignored_scope=nncf.IgnoredScope(types=['Sigmoid'])
+    )
+
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.makedirs(target)
+    ov.save_model(quantized, os.path.join(target, os.path.basename(xml_path)))
+    metadata = os.path.join(fp32_dir, 'metadata.yaml')
+    if os.path.exists(metadata):
+        shutil.copy(metadata, os.path.join(target, 'metadata.yaml'))
+
+
+def export_model(model_path, backend, imgsz=640, int8=False, calibration_source=None, calibration_frames=200):
+    """Liefert den Pfad des (gecachten) exportierten Modells, exportiert bei Bedarf
+
+    Für int8 werden Kalibrierungs-Frames benötigt. Fehlen sie, wird die
+    FP32-Variante verwendet.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unbekanntes Backend '{backend}' (erlaubt: {', '.join(BACKENDS)})")
+    if backend == 'pytorch':
+        return model_path
+
+    fp32_path = _export_fp32(model_path, backend, imgsz)
+    if not int8:
+        return fp32_path
+
+    target = artifact_path(model_path, backend, int8=True)
+    if _is_fresh(target, model_path, imgsz):
+        return target
+
+    frames = load_calibration_frames(calibration_source, calibration_frames)
+    if not frames:
+        logger.warning(f"⚠ Keine Kalibrierungs-Frames in '{calibration_source}' - verwende FP32-Modell")
+        return fp32_path
+
+    logger.info(f"Erzeuge INT8-Modell ({backend}) aus {len(frames)} Kalibrierungs-Frames...")
+    if backend == 'onnx':
+        _quantize_onnx(fp32_path, target, frames, imgsz)
+    else:
+        _quantize_openvino(fp32_path, target, frames, imgsz)
+    _write_stamp(target, model_path, imgsz, backend=backend, int8=True, calibration_frames=len(frames))
+    logger.info(f"✓ INT8-Modell gespeichert: {target}")
+    return target
+
+
+def load_model(model_path, backend='pytorch', imgsz=640, int8=False, calibration_source=None,
+               calibration_frames=200, fallback=True):
+    """Lädt das Modell mit dem gewünschten Backend -> (YOLO-Modell, Info-dict)
+
+    Mit fallback=True wird bei Export-/Ladefehlern auf PyTorch zurückgegriffen.
+    """
+    if backend != 'pytorch':
+        try:
+            path = export_model(model_path, backend, imgsz, int8, calibration_source, calibration_frames)
+            from ultralytics import YOLO
+            model = YOLO(path, task='detect')
+            return model, {
+                'backend': backend,
+                'path': path,
+                'int8': path == artifact_path(model_path, backend, int8=True),
+                'imgsz': imgsz
+            }
+        except Exception as e:
+            if not fallback:
+                raise
+            logger.warning(f"⚠ Backend '{backend}' nicht verfügbar ({e}) - verwende PyTorch")
+
+    return _load_pytorch(model_path), {'backend': 'pytorch', 'path': model_path, 'int8': False, 'imgsz': imgsz}
+
+
+class ModelLoader:
+    """Lädt und wärmt das Modell in einem Hintergrund-Thread auf
+
+    Zustände: idle -> loading -> warming -> ready (bzw. error). get() blockiert
+    nie - bis das Modell bereit ist, liefert es None und der Stream läuft
+    ohne YOLO weiter.
+    """
+
+    def __init__(self, factory, warmup=None):
+        self.factory = factory
+        self.warmup = warmup
+        self.state = 'idle'
+        self.error = None
+        self._instance = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.warmup_runs_ms = []
+        self.ready_at = None
+
+    def start(self):
+        """Startet Laden + Warm-up (no-op wenn bereits geladen oder am Laden)"""
+        with self._lock:
+            if self.state in ('loading', 'warming', 'ready'):
+                return
+            self.state = 'loading'
+            self.error = None
+            self._thread = threading.Thread(target=self._run, name='model-loader', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            start = time.perf_counter()
+            instance = self.factory()
+            self.load_seconds = round(time.perf_counter() - start, 2)
+
+            self.state = 'warming'
+            start = time.perf_counter()
+            if self.warmup is not None:
+                self.warmup_runs_ms = [round(seconds * 1000, 1) for seconds in self.warmup(instance)]
+            self.warmup_seconds = round(time.perf_counter() - start, 2)
+
+            with self._lock:
+                self._instance = instance
+                self.state = 'ready'
+                self.ready_at = time.time()
+            self._ready.set()
+            logger.info(f"✓ Modell bereit (Laden {self.load_seconds}s, Warm-up {self.warmup_seconds}s)")
+        except Exception as e:
+            with self._lock:
+                self.state = 'error'
+                self.error = str(e)
+            logger.error(f"✗ Modell konnte nicht geladen werden: {e}")
+
+    def get(self):
+        """Geladenes Modell oder None (blockiert nicht)"""
+        return self._instance
+
+    def wait(self, timeout=None):
+        """Wartet bis das Modell bereit ist (z.B. für Offline-Skripte)"""
+        self.start()
+        self._ready.wait(timeout)
+        return self._instance
+
+    def release(self):
+        """Gibt das geladene Modell frei (z.B. beim Beenden) - start() lädt es erneut"""
+        with self._lock:
+            instance, self._instance = self._instance, None
+            if self.state == 'ready':
+                self.state = 'idle'
+            self._ready.clear()
+        return instance
+
+    def get_stats(self):
+        return {
+            'state': self.state,
+            'error': self.error,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'warmup_runs_ms': self.warmup_runs_ms,
+            'ready_at': self.ready_at
+        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exportiert best.pt nach ONNX/OpenVINO (optional INT8)")
+    parser.add_argument('--model', default='best.pt', help="PyTorch-Modell (Standard: best.pt)")
+    parser.add_argument('--backend', choices=BACKENDS[1:], default='onnx')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--int8', action='store_true', help="Zusätzlich INT8-quantisiertes Modell erzeugen")
+    parser.add_argument('--calibration', default='calibration',
+                        help="Bild-Verzeichnis oder Video mit Kalibrierungs-Frames")
+    parser.add_argument('--calibration-frames', type=int, default=200)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    args = parse_args()
+    print(export_model(args.model, args.backend, args.imgsz, args.int8, args.calibration, args.calibration_frames))
@@ -0,0 +1,352 @@
+"""
+PyResearch Batch-Verarbeitung (offline)
+
+Wertet Video-Dateien oder Bild-Verzeichnisse ohne Flask-Server aus, z.B.
+stundenlange Dashcam-Aufnahmen. Die Arbeit wird in Shards (ganze Datei, ein
+Frame-Bereich oder eine Gruppe von Bildern) aufgeteilt und auf einen
+Prozess-Pool verteilt - jeder Worker lädt das YOLO Modell genau einmal.
+
+Ergebnisse werden als JSON-Lines pro Shard laufend auf die Platte geschrieben.
+Abgeschlossene Shards werden bei einem erneuten Aufruf übersprungen, ein
+abgebrochener Lauf kann also einfach fortgesetzt werden.
+
+Beispiele:
+    python batch_process.py aufnahmen/ --output batch_results --workers 4
+    python batch_process.py fahrt.mp4 --chunk-frames 3000 --annotate
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.m4v', '.mpg', '.mpeg', '.wmv'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+
+# Ein Visualizer pro Worker-Prozess (wird im Pool-Initializer geladen)
+_visualizer = None
+
+# Thread-Pools von OpenMP/MKL/OpenBLAS - werden beim Import von torch gelesen
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+def log(message):
+    """Sofortige Konsolen-Ausgabe (auch aus Worker-Prozessen)"""
+    print(f"[BATCH] {message}", flush=True)
+
+
+# ---------- Shards ----------
+
+def _shard_id(path, start, end):
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_{digest}_{start:08d}-{end:08d}"
+
+
+def collect_inputs(inputs):
+    """Sammelt Video-Dateien und Bild-Verzeichnisse aus den Eingaben"""
+    videos, image_dirs = [], {}
+    for entry in inputs:
+        if os.path.isdir(entry):
+            for root, _, files in os.walk(entry):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    ext = os.path.splitext(name)[1].lower()
+                    if ext in VIDEO_EXTENSIONS:
+                        videos.append(path)
+                    elif ext in IMAGE_EXTENSIONS:
+                        image_dirs.setdefault(root, []).append(path)
+        elif os.path.isfile(entry):
+            ext = os.path.splitext(entry)[1].lower()
+            if ext in VIDEO_EXTENSIONS:
+                videos.append(entry)
+            elif ext in IMAGE_EXTENSIONS:
+                image_dirs.setdefault(os.path.dirname(entry) or '.', []).append(entry)
+        else:
+            log(f"⚠ Eingabe nicht gefunden: {entry}")
+    return videos, image_dirs
+
+
+def plan_shards(inputs, chunk_frames=0, images_per_shard=200):
+    """Teilt die Eingaben in Shards auf (pro Datei oder pro Frame-Bereich)"""
+    videos, image_dirs = collect_inputs(inputs)
+    shards = []
+
+    for path in videos:
+        capture = cv2.VideoCapture(path)
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        capture.release()
+        if frame_count <= 0:
+            log(f"⚠ Frame-Anzahl unbekannt, verarbeite als Ganzes: {path}")
+            frame_count = 0
+        if chunk_frames and frame_count > chunk_frames:
+            ranges = [(start, min(start + chunk_frames, frame_count))
+                      for start in range(0, frame_count, chunk_frames)]
+        else:
+            ranges = [(0, frame_count)]
+        for start, end in ranges:
+            shards.append({
+                'id': _shard_id(path, start, end),
+                'type': 'video',
+                'source': path,
+                'start': start,
+                'end': end
+            })
+
+    for directory, images in sorted(image_dirs.items()):
+        images = sorted(images)
+        for start in range(0, len(images), images_per_shard):
+            end = min(start + images_per_shard, len(images))
+            shards.append({
+                'id': _shard_id(directory, start, end),
+                'type': 'images',
+                'source': directory,
+                'files': images[start:end],
+                'start': start,
+                'end': end
+            })
+
+    return shards
+
+
+# ---------- Worker ----------
+
+def worker_threads(workers):
+    """Rechen-Threads pro Worker, damit alle Worker zusammen die Kerne nicht überbuchen"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def limit_threads(threads):
+    """Begrenzt die Intra-Op-Threads dieses Prozesses (torch, OpenMP/MKL, OpenCV)"""
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    cv2.setNumThreads(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _init_worker(threads):
+    """Pool-Initializer: begrenzt die Threads und lädt das Modell einmal pro Worker-Prozess"""
+    global _visualizer
+    # Ohne Begrenzung rechnet jeder Worker auf allen Kernen - N Worker überbuchen die Maschine
+    limit_threads(threads)
+    # visualizer.py statt app.py: keine Flask-App, Log-Datei oder Hintergrund-Threads pro Worker
+    from visualizer import PyResearchVisualizer
+    _visualizer = PyResearchVisualizer()
+    log(f"Worker {os.getpid()} bereit ({threads} Threads)")
+
+
+def _detections_to_json(detections):
+    return [
+        {
+            'bbox': [round(float(v), 1) for v in box],
+            'confidence': round(float(conf), 4) if conf is not None else None,
+            'class_id': int(cls) if cls is not None else None
+        }
+        for box, conf, cls in zip(
+            detections.xyxy,
+            detections.confidence if detections.confidence is not None else [None] * len(detections),
+            detections.class_id if detections.class_id is not None else [None] * len(detections)
+        )
+    ]
+
+
+def _process_video(shard, out, annotate_dir):
+    capture = cv2.VideoCapture(shard['source'])
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    if shard['start']:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, shard['start'])
+
+    writer = None
+    writer_path = None
+    frame_index = shard['start']
+    frames = detections_total = 0
+    try:
+        while shard['end'] == 0 or frame_index < shard['end']:
+            success, frame = capture.read()
+            if not success:
+                break
+            detections = _visualizer.detect(frame)
+
+            if len(detections):
+                detections_total += len(detections)
+                out.write(json.dumps({
+                    'source': shard['source'],
+                    'frame': frame_index,
+                    'time_s': round(frame_index / fps, 3),
+                    'detections': _detections_to_json(detections)
+                }) + '\n')
+
+            if annotate_dir is not None:
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer_path = os.path.join(annotate_dir, shard['id'] + '.part.mp4')
+                    writer = cv2.VideoWriter(writer_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+                writer.write(_visualizer.annotate(frame, detections))
+
+            frame_index += 1
+            frames += 1
+            if frames % 100 == 0:
+                out.flush()
+    finally:
+        capture.release()
+        if writer is not None:
+            writer.release()
+    if writer is not None:
+        # Nur ein vollständiges Video bekommt den endgültigen Namen (sonst bleibt .part.mp4 liegen)
+        os.replace(writer_path, os.path.join(annotate_dir, shard['id'] + '.mp4'))
+    return frames, detections_total
+
+
+def _process_images(shard, out, annotate_dir):
+    frames = detections_total = 0
+    for path in shard['files']:
+        frame = cv2.imread(path)
+        if frame is None:
+            log(f"⚠ Bild konnte nicht gelesen werden: {path}")
+            continue
+        detections = _visualizer.detect(frame)
+        frames += 1
+
+        if len(detections):
+            detections_total += len(detections)
+            out.write(json.dumps({
+                'source': path,
+                'frame': 0,
+                'detections': _detections_to_json(detections)
+            }) + '\n')
+
+        if annotate_dir is not None:
+            cv2.imwrite(os.path.join(annotate_dir, f"{shard['id']}_{os.path.basename(path)}"),
+                        _visualizer.annotate(frame, detections))
+    return frames, detections_total
+
+
+def process_shard(task):
+    """Verarbeitet einen Shard und schreibt die Ergebnisse laufend in <id>.jsonl"""
+    shard, output_dir, annotate = task
+    result_path = os.path.join(output_dir, 'detections', shard['id'] + '.jsonl')
+    part_path = result_path + '.part'
+
+    annotate_dir = None
+    if annotate:
+        annotate_dir = os.path.join(output_dir, 'annotated')
+        os.makedirs(annotate_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with open(part_path, 'w', encoding='utf-8') as out:
+        if shard['type'] == 'video':
+            frames, detections = _process_video(shard, out, annotate_dir)
+        else:
+            frames, detections = _process_images(shard, out, annotate_dir)
+
+    # Erst nach vollständiger Verarbeitung umbenennen - Grundlage für --resume
+    os.replace(part_path, result_path)
+    elapsed = time.perf_counter() - start
+    return {
+        'id': shard['id'],
+        'frames': frames,
+        'detections': detections,
+        'seconds': round(elapsed, 2),
+        'fps': round(frames / elapsed, 2) if elapsed > 0 else 0
+    }
+
+
+def run_shard(task):
+    """Worker-Funktion: wie process_shard, aber ein defekter Shard liefert ein Fehler-Ergebnis
+
+    So bricht z.B. ein kaputtes Video nicht den ganzen Lauf ab - der Shard hat
+    kein fertiges .jsonl und wird beim nächsten Aufruf wiederholt.
+    """
+    shard = task[0]
+    try:
+        return process_shard(task)
+    except Exception as e:
+        return {'id': shard['id'], 'source': shard['source'], 'error': f"{type(e).__name__}: {e}"}
+
+
+# ---------- CLI ----------
+
+def run(args):
+    os.makedirs(os.path.join(args.output, 'detections'), exist_ok=True)
+
+    shards = plan_shards(args.inputs, args.chunk_frames, args.images_per_shard)
+    if not shards:
+        log("Keine Video-Dateien oder Bilder gefunden.")
+        return 1
+
+    done = set()
+    if not args.no_resume:
+        done = {
+            name[:-len('.jsonl')]
+            for name in os.listdir(os.path.join(args.output, 'detections'))
+            if name.endswith('.jsonl')
+        }
+    pending = [shard for shard in shards if shard['id'] not in done]
+    log(f"{len(shards)} Shards geplant, {len(shards) - len(pending)} bereits erledigt, "
+        f"{len(pending)} offen ({args.workers} Worker)")
+    if not pending:
+        return 0
+
+    tasks = [(shard, args.output, args.annotate) for shard in pending]
+    total_frames = total_detections = 0
+    failed = []
+    start = time.perf_counter()
+
+    with multiprocessing.Pool(args.workers, initializer=_init_worker,
+                              initargs=(worker_threads(args.workers),)) as pool:
+        for i, result in enumerate(pool.imap_unordered(run_shard, tasks), 1):
+            if 'error' in result:
+                failed.append(result)
+                log(f"✗ [{i}/{len(tasks)}] {result['id']} ({result['source']}): {result['error']}")
+                continue
+            total_frames += result['frames']
+            total_detections += result['detections']
+            log(f"✓ [{i}/{len(tasks)}] {result['id']}: {result['frames']} Frames, "
+                f"{result['detections']} Detections, {result['fps']} FPS")
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        'shards': len(shards),
+        'processed_shards': len(tasks) - len(failed),
+        'failed_shards': failed,
+        'frames': total_frames,
+        'detections': total_detections,
+        'seconds': round(elapsed, 2),
+        'fps': round(total_frames / elapsed, 2) if elapsed > 0 else 0,
+        'workers': args.workers,
+        'annotate': args.annotate
+    }
+    with open(os.path.join(args.output, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    log(f"Fertig: {total_frames} Frames, {total_detections} Detections in {elapsed:.1f}s "
+        f"({summary['fps']} FPS gesamt)")
+    if failed:
+        log(f"⚠ {len(failed)} Shards fehlgeschlagen - werden beim nächsten Aufruf wiederholt")
+        return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pothole-Detection über Video-Dateien und Bild-Verzeichnisse")
+    parser.add_argument('inputs', nargs='+', help="Video-Dateien, Bilder oder Verzeichnisse")
+    parser.add_argument('--output', default='batch_results', help="Ausgabe-Verzeichnis (Standard: batch_results)")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Anzahl Worker-Prozesse (je ein Modell)")
+    parser.add_argument('--chunk-frames', type=int, default=0,
+                        help="Videos in Frame-Bereiche dieser Größe aufteilen (0 = pro Datei)")
+    parser.add_argument('--images-per-shard', type=int, default=200,
+                        help="Anzahl Bilder pro Shard bei Bild-Verzeichnissen")
+    parser.add_argument('--annotate', action='store_true',
+                        help="Annotierte Videos/Bilder schreiben (kostet Rendering + Encoding)")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="Bereits abgeschlossene Shards erneut verarbeiten")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
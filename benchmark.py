@@ -0,0 +1,489 @@
+"""
+PyResearch Benchmark
+
+Misst Detection- und Streaming-Pfad reproduzierbar ohne Kamera und speichert
+die Ergebnisse als JSON, damit Läufe verglichen werden können.
+
+pipeline: Spielt ein Video (oder synthetische Frames) durch FramePipeline,
+          process_frame und den StreamHub mit N Clients (generate_frames).
+          Pro Konfiguration (Backend x Breite x Batch-Größe x Clients):
+          FPS, p50/p95/p99 pro Stufe, Peak-RSS und CPU-Auslastung.
+loadtest: Viele gleichzeitige /video_feed und /get_detections Clients gegen
+          einen laufenden Server.
+
+Beispiele:
+    python benchmark.py pipeline --source fahrt.mp4 --backend pytorch onnx --width 640 480 --clients 1 5
+    python benchmark.py pipeline --source synthetic --backend none --clients 1 10   # nur Streaming
+    python benchmark.py pipeline --source fahrt.mp4 --batch 1 4 --compare benchmarks/vorher.json
+    python benchmark.py loadtest --url http://localhost:5000 --video-clients 10 --api-clients 20
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import cv2
+import numpy as np
+import psutil
+
+
+def log(message):
+    """Sofortige Konsolen-Ausgabe"""
+    print(f"[BENCH] {message}", flush=True)
+
+
+def percentiles(values):
+    """p50/p95/p99 (nearest rank) und Mittelwert in Millisekunden"""
+    if not values:
+        return {'count': 0, 'mean_ms': None, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    ordered = sorted(values)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))]
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': round(rank(50) * 1000, 3),
+        'p95_ms': round(rank(95) * 1000, 3),
+        'p99_ms': round(rank(99) * 1000, 3)
+    }
+
+
+class ResourceMonitor:
+    """Misst Peak-RSS (Sampling) und CPU-Auslastung (CPU-Zeit / Wall-Zeit) des Prozesses"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.process = psutil.Process()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.peak_rss = 0
+
+    def __enter__(self):
+        self.peak_rss = self.process.memory_info().rss
+        self._cpu_start = self.process.cpu_times()
+        self._wall_start = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop_event.set()
+        self._thread.join()
+        cpu_end = self.process.cpu_times()
+        wall = time.perf_counter() - self._wall_start
+        cpu = (cpu_end.user - self._cpu_start.user) + (cpu_end.system - self._cpu_start.system)
+        self.cpu_percent = round(cpu / wall * 100, 1) if wall > 0 else 0.0
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+    def result(self):
+        return {
+            'peak_rss_mb': round(self.peak_rss / 1024 / 1024, 1),
+            'cpu_percent': self.cpu_percent,  # 100 = ein voller Kern
+            'cpu_count': psutil.cpu_count()
+        }
+
+
+# ---------- Frame-Quellen ----------
+
+def synthetic_frames(count=120, size=(720, 1280), seed=0):
+    """Deterministische Straßen-ähnliche Frames mit dunklen Flecken (immer gleich für gleichen seed)"""
+    rng = np.random.default_rng(seed)
+    height, width = size
+    base = rng.normal(110, 18, size=(height, width, 1)).clip(0, 255).astype(np.uint8).repeat(3, axis=2)
+    frames = []
+    for i in range(count):
+        frame = np.roll(base, shift=i * 8, axis=0).copy()  # Fahrt simulieren
+        for _ in range(3):
+            center = (int(rng.integers(0, width)), int(rng.integers(height // 2, height)))
+            axes = (int(rng.integers(20, 80)), int(rng.integers(10, 40)))
+            cv2.ellipse(frame, center, axes, 0, 0, 360, (35, 35, 35), -1)
+        frames.append(frame)
+    return frames
+
+
+def load_frames(source, max_frames=300, size=(720, 1280)):
+    """Lädt die Frames vorab in den Speicher - Dekodieren zählt nicht zur Messung"""
+    if source == 'synthetic':
+        return synthetic_frames(min(max_frames, 120), size)
+    capture = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < max_frames:
+        success, frame = capture.read()
+        if not success:
+            break
+        frames.append(frame)
+    capture.release()
+    if not frames:
+        raise ValueError(f"Keine Frames aus '{source}' gelesen")
+    return frames
+
+
+class ReplaySource:
+    """Capture-Ersatz: liefert die vorab geladenen Frames in Schleife, optional im Kamera-Takt"""
+
+    def __init__(self, frames, fps=30.0):
+        self.frames = frames
+        self.interval = 1.0 / fps if fps else 0.0
+        self._index = 0
+        self._next_time = time.perf_counter()
+
+    def read_frame(self):
+        if self.interval:
+            delay = self._next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_time = max(self._next_time + self.interval, time.perf_counter())
+        frame = self.frames[self._index % len(self.frames)]
+        self._index += 1
+        return True, frame.copy()  # Annotation zeichnet in den Frame
+
+
+# ---------- Pipeline-Benchmark ----------
+
+_visualizers = {}
+
+
+def get_visualizer(app_module, backend, width):
+    """Ein Visualizer pro Backend (Modell wird nur einmal geladen), Breite wird umgestellt"""
+    app_module.PR_BACKEND_CONFIG['backend'] = backend
+    app_module.PR_INFERENCE_CONFIG['width'] = width
+    visualizer = _visualizers.get(backend)
+    if visualizer is None:
+        start = time.perf_counter()
+        visualizer = _visualizers[backend] = app_module.LiveVisualizer()
+        log(f"Modell geladen ({visualizer.backend_info['backend']}) in {time.perf_counter() - start:.1f}s")
+    visualizer.letterboxes.clear()  # Puffer mit neuer Breite anlegen
+    visualizer.warmup(runs=3)
+    return visualizer
+
+
+def run_stream_clients(app_module, hub, count, stop_event):
+    """Startet count Clients, die generate_frames() wie ein Browser konsumieren"""
+    results = []
+
+    def consume(client):
+        frames = 0
+        size = 0
+        start = time.perf_counter()
+        # Endet, sobald der Client geschlossen wird (nach dem Lauf)
+        for chunk in app_module.generate_frames(client):
+            if not stop_event.is_set():
+                frames += 1
+                size += len(chunk)
+        elapsed = time.perf_counter() - start
+        snapshot = client.snapshot()
+        results.append({
+            'client_id': client.client_id,
+            'frames': frames,
+            'fps': round(frames / elapsed, 2) if elapsed > 0 else 0,
+            'kbps': round(size * 8 / 1024 / elapsed, 1) if elapsed > 0 else 0,
+            'skipped': snapshot['skipped'],
+            'profile': snapshot['profile']
+        })
+
+    threads, clients = [], []
+    for _ in range(count):
+        client = hub.subscribe(adaptive=False)
+        thread = threading.Thread(target=consume, args=(client,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        clients.append(client)
+    return threads, clients, results
+
+
+def bench_pipeline(app_module, frames, backend, width, clients, duration, fps):
+    from pipeline import FramePipeline
+    from streaming import StreamHub
+
+    samples = {}
+    lock = threading.Lock()
+
+    def observe(stage, seconds):
+        with lock:
+            samples.setdefault(stage, []).append(seconds)
+
+    if backend == 'none':
+        def process_frame(frame):
+            return frame
+    else:
+        visualizer = get_visualizer(app_module, backend, width)
+
+        def process_frame(frame):
+            return visualizer.process_frame(frame)
+
+    app_module.observe_stage = observe  # yolo/annotate-Zeiten aus LiveVisualizer
+    hub = StreamHub(
+        app_module.stream_hub.default_profile,
+        max_clients=0,
+        buffer_size=app_module.PR_STREAM_CONFIG['client_buffer_size']
+    )
+    source = ReplaySource(frames, fps)
+    pipeline = FramePipeline(source.read_frame, process_frame, hub.publish, observer=observe)
+
+    stop_event = threading.Event()
+    with ResourceMonitor() as monitor:
+        threads, stream_clients, client_results = run_stream_clients(app_module, hub, clients, stop_event)
+        pipeline.start()
+        time.sleep(duration)
+        stats = pipeline.get_stats()
+        stop_event.set()
+        pipeline.stop()
+        for client in stream_clients:
+            client.close()
+        for thread in threads:
+            thread.join(2.0)
+
+    result = {
+        'mode': 'pipeline',
+        'fps': round(stats['stages']['end_to_end']['frames'] / duration, 2),
+        'dropped': {name: queue['dropped'] for name, queue in stats['queues'].items()},
+        'stages': {stage: percentiles(values) for stage, values in sorted(samples.items())},
+        'clients': sorted(client_results, key=lambda c: c['client_id'])
+    }
+    result.update(monitor.result())
+    return result
+
+
+def bench_batch(app_module, frames, backend, width, batch, duration):
+    """Reine Modell-Messung für detect_batch (Multi-Kamera-Pfad)"""
+    visualizer = get_visualizer(app_module, backend, width)
+    latencies = []
+    processed = 0
+    with ResourceMonitor() as monitor:
+        start = time.perf_counter()
+        for i in itertools.count():
+            if time.perf_counter() - start >= duration:
+                break
+            batch_frames = [frames[(i * batch + j) % len(frames)] for j in range(batch)]
+            batch_start = time.perf_counter()
+            visualizer.detect_batch(batch_frames, batch)
+            latencies.append(time.perf_counter() - batch_start)
+            processed += batch
+        elapsed = time.perf_counter() - start
+    result = {
+        'mode': 'batch',
+        'fps': round(processed / elapsed, 2),
+        'stages': {'detect_batch': percentiles(latencies)}
+    }
+    result.update(monitor.result())
+    return result
+
+
+def run_key(config):
+    return f"{config['backend']}|w{config['width']}|b{config['batch']}|c{config['clients']}"
+
+
+def compare_runs(current, previous_path, tolerance):
+    """Vergleicht mit einem früheren Lauf -> Liste der Regressionen"""
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = {run_key(run['config']): run for run in json.load(f)['runs']}
+    regressions = []
+    for run in current:
+        key = run_key(run['config'])
+        old = previous.get(key)
+        if old is None:
+            continue
+        fps_change = (run['fps'] - old['fps']) / old['fps'] if old['fps'] else 0.0
+        stage = 'end_to_end' if 'end_to_end' in run['stages'] else 'detect_batch'
+        old_p95 = old['stages'].get(stage, {}).get('p95_ms')
+        new_p95 = run['stages'].get(stage, {}).get('p95_ms')
+        p95_change = (new_p95 - old_p95) / old_p95 if old_p95 and new_p95 is not None else 0.0
+        log(f"  {key}: FPS {old['fps']} -> {run['fps']} ({fps_change:+.1%}), "
+            f"p95 {stage} {old_p95} -> {new_p95} ms ({p95_change:+.1%})")
+        if fps_change < -tolerance or p95_change > tolerance:
+            regressions.append(key)
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_pipeline(args):
+    import app as app_module
+
+    frames = load_frames(args.source, args.max_frames)
+    log(f"{len(frames)} Frames geladen ({args.source}, {frames[0].shape[1]}x{frames[0].shape[0]})")
+
+    runs = []
+    for backend, width, batch, clients in itertools.product(args.backend, args.width, args.batch, args.clients):
+        config = {'backend': backend, 'width': width, 'batch': batch, 'clients': clients}
+        if batch > 1 and (backend == 'none' or clients != args.clients[0]):
+            continue  # Batch-Messung ist unabhängig von Stream-Clients
+        log(f"Lauf: {run_key(config)} ({args.duration}s)")
+        if batch > 1:
+            result = bench_batch(app_module, frames, backend, width, batch, args.duration)
+        else:
+            result = bench_pipeline(app_module, frames, backend, width, clients, args.duration, args.fps)
+        result['config'] = config
+        runs.append(result)
+        log(f"  → {result['fps']} FPS, CPU {result['cpu_percent']}%, Peak-RSS {result['peak_rss_mb']} MB")
+    return runs
+
+
+# ---------- Lasttest ----------
+
+def _video_client(url, stop_event, results):
+    frames = 0
+    size = 0
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            while not stop_event.is_set():
+                chunk = response.read(65536)
+                if not chunk:
+                    break
+                size += len(chunk)
+                frames += chunk.count(b'--frame')
+        error = None
+    except urllib.error.HTTPError as e:
+        error = f"HTTP {e.code}"
+    except Exception as e:
+        error = str(e)
+    elapsed = time.perf_counter() - start
+    results.append({
+        'fps': round(frames / elapsed, 2) if elapsed > 0 else 0,
+        'kbps': round(size * 8 / 1024 / elapsed, 1) if elapsed > 0 else 0,
+        'error': error
+    })
+
+
+def _api_client(url, stop_event, latencies, errors):
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                response.read()
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(str(e))
+            stop_event.wait(0.5)
+
+
+def run_loadtest(args):
+    base = args.url.rstrip('/')
+    video_url = f"{base}/video_feed" + (f"?profile={args.profile}" if args.profile else '')
+    api_url = f"{base}/get_detections?bbox={args.bbox}&zoom={args.zoom}"
+
+    stop_event = threading.Event()
+    video_results, latencies, errors = [], [], []
+    threads = [
+        threading.Thread(target=_video_client, args=(video_url, stop_event, video_results), daemon=True)
+        for _ in range(args.video_clients)
+    ] + [
+        threading.Thread(target=_api_client, args=(api_url, stop_event, latencies, errors), daemon=True)
+        for _ in range(args.api_clients)
+    ]
+    log(f"Lasttest: {args.video_clients} Video- und {args.api_clients} API-Clients gegen {base} ({args.duration}s)")
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop_event.set()
+    for thread in threads:
+        thread.join(12)
+
+    streaming = [r for r in video_results if r['error'] is None]
+    result = {
+        'mode': 'loadtest',
+        'config': {'url': base, 'video_clients': args.video_clients, 'api_clients': args.api_clients,
+                   'profile': args.profile, 'duration': args.duration},
+        'video': {
+            'connected': len(streaming),
+            'rejected': [r['error'] for r in video_results if r['error'] is not None],
+            'fps_min': min((r['fps'] for r in streaming), default=None),
+            'fps_avg': round(sum(r['fps'] for r in streaming) / len(streaming), 2) if streaming else None,
+            'kbps_total': round(sum(r['kbps'] for r in streaming), 1)
+        },
+        'api': dict(percentiles(latencies), errors=len(errors),
+                    requests_per_second=round(len(latencies) / args.duration, 1))
+    }
+    log(f"  Video: {result['video']['connected']} verbunden, Ø {result['video']['fps_avg']} FPS; "
+        f"API: {result['api']['requests_per_second']} req/s, p95 {result['api']['p95_ms']} ms, "
+        f"{len(errors)} Fehler")
+    return [result]
+
+
+# ---------- CLI ----------
+
+def parse_args(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--output', default='benchmarks', help="Verzeichnis für JSON-Ergebnisse")
+    common.add_argument('--duration', type=float, default=20.0, help="Sekunden pro Lauf")
+    common.add_argument('--compare', help="Früheres Ergebnis (JSON) zum Vergleich")
+    common.add_argument('--tolerance', type=float, default=0.1,
+                        help="Erlaubte Verschlechterung beim Vergleich (0.1 = 10%%)")
+
+    parser = argparse.ArgumentParser(description="Benchmark für Detection- und Streaming-Pfad")
+    modes = parser.add_subparsers(dest='mode', required=True)
+
+    pipeline = modes.add_parser('pipeline', parents=[common],
+                                help="Pipeline mit Video-Replay oder synthetischen Frames")
+    pipeline.add_argument('--source', default='synthetic', help="Video-Datei oder 'synthetic'")
+    pipeline.add_argument('--max-frames', type=int, default=300, help="Frames, die vorab geladen werden")
+    pipeline.add_argument('--fps', type=float, default=30.0, help="Kamera-Takt (0 = so schnell wie möglich)")
+    pipeline.add_argument('--backend', nargs='+', default=['pytorch'],
+                          help="pytorch, onnx, openvino oder none (ohne YOLO)")
+    pipeline.add_argument('--width', nargs='+', type=int, default=[640], help="Inferenz-Breiten")
+    pipeline.add_argument('--batch', nargs='+', type=int, default=[1], help="Batch-Größen (>1 = detect_batch)")
+    pipeline.add_argument('--clients', nargs='+', type=int, default=[1], help="Anzahl Stream-Clients")
+
+    loadtest = modes.add_parser('loadtest', parents=[common], help="Lasttest gegen einen laufenden Server")
+    loadtest.add_argument('--url', default='http://localhost:5000')
+    loadtest.add_argument('--video-clients', type=int, default=5)
+    loadtest.add_argument('--api-clients', type=int, default=10)
+    loadtest.add_argument('--profile', help="Stream-Profil der Video-Clients (low/medium/high)")
+    loadtest.add_argument('--bbox', default='5.8,47.2,15.1,55.1', help="Kartenausschnitt für /get_detections")
+    loadtest.add_argument('--zoom', type=int, default=12)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    runs = run_pipeline(args) if args.mode == 'pipeline' else run_loadtest(args)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'args': {k: v for k, v in vars(args).items()}
+        },
+        'runs': runs
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{args.mode}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    log(f"Ergebnis gespeichert: {path}")
+
+    if args.compare and args.mode == 'pipeline':
+        log(f"Vergleich mit {args.compare}:")
+        regressions = compare_runs(runs, args.compare, args.tolerance)
+        if regressions:
+            log(f"✗ Regression in {len(regressions)} Konfiguration(en): {', '.join(regressions)}")
+            return 1
+        log("✓ Keine Regression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
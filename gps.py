@@ -0,0 +1,242 @@
+"""
+PyResearch GPS-Anbindung
+
+Liest Positionen direkt im Backend, damit Detections auch ohne geöffneten
+Browser mit GPS-Koordinaten gespeichert werden. Unterstützte Quellen:
+
+    serial:/dev/ttyUSB0@9600   NMEA von einem seriellen GPS-Empfänger (pyserial)
+    gpsd://localhost:2947      gpsd (JSON-Protokoll)
+    file:fahrt.nmea            NMEA-Datei abspielen (Echtzeit, in Schleife)
+    fixed:51.1657,10.4515      Feste Position (Tests / stationäre Kamera)
+"""
+import json
+import logging
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- NMEA ----------
+
+def _checksum_ok(sentence):
+    if '*' not in sentence:
+        return True  # Ohne Prüfsumme akzeptieren (manche Logger lassen sie weg)
+    body, checksum = sentence[1:].split('*', 1)
+    calculated = 0
+    for char in body:
+        calculated ^= ord(char)
+    try:
+        return calculated == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+def _parse_coordinate(value, hemisphere):
+    """NMEA ddmm.mmmm / dddmm.mmmm -> Dezimalgrad"""
+    if not value:
+        return None
+    raw = float(value)
+    degrees = int(raw / 100)
+    decimal = degrees + (raw - degrees * 100) / 60.0
+    return -decimal if hemisphere in ('S', 'W') else decimal
+
+
+def _parse_time(value):
+    """hhmmss(.ss) -> Sekunden seit Mitternacht (für die Replay-Taktung)"""
+    if not value or len(value) < 6:
+        return None
+    return int(value[0:2]) * 3600 + int(value[2:4]) * 60 + float(value[4:])
+
+
+def parse_nmea(sentence):
+    """Parst GGA- und RMC-Sätze -> dict mit latitude/longitude (None ohne gültigen Fix)"""
+    sentence = sentence.strip()
+    if not sentence.startswith('$') or not _checksum_ok(sentence):
+        return None
+    fields = sentence.split('*', 1)[0].split(',')
+    kind = fields[0][3:]
+
+    try:
+        if kind == 'GGA' and len(fields) > 9:
+            if fields[6] in ('', '0'):
+                return None  # Kein Fix
+            latitude = _parse_coordinate(fields[2], fields[3])
+            longitude = _parse_coordinate(fields[4], fields[5])
+            if latitude is None or longitude is None:
+                return None
+            return {
+                'latitude': latitude,
+                'longitude': longitude,
+                'satellites': int(fields[7]) if fields[7] else None,
+                'altitude': float(fields[9]) if fields[9] else None,
+                'nmea_time': _parse_time(fields[1])
+            }
+        if kind == 'RMC' and len(fields) > 8:
+            if fields[2] != 'A':
+                return None  # V = ungültig
+            latitude = _parse_coordinate(fields[3], fields[4])
+            longitude = _parse_coordinate(fields[5], fields[6])
+            if latitude is None or longitude is None:
+                return None
+            return {
+                'latitude': latitude,
+                'longitude': longitude,
+                'speed_kmh': float(fields[7]) * 1.852 if fields[7] else None,
+                'course': float(fields[8]) if fields[8] else None,
+                'nmea_time': _parse_time(fields[1])
+            }
+    except ValueError:
+        return None
+    return None
+
+
+# ---------- Reader ----------
+
+class GpsReader:
+    """Liest eine GPS-Quelle im Hintergrund und hält den letzten Fix bereit
+
+    Bei Verbindungsabbruch wird mit exponentiellem Backoff neu verbunden.
+    """
+
+    def __init__(self, source, realtime=True, max_backoff=30.0):
+        self.source = source
+        self.realtime = realtime
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._fix = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.fixes = 0
+        self.errors = 0
+        self.last_error = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='gps-reader', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def latest(self, max_age=None):
+        """Letzter Fix als dict (None wenn keiner oder älter als max_age Sekunden)"""
+        with self._lock:
+            fix = self._fix
+        if fix is None:
+            return None
+        if max_age is not None and time.time() - fix['received_at'] > max_age:
+            return None
+        return dict(fix)
+
+    def _update(self, fix):
+        fix['received_at'] = time.time()
+        with self._lock:
+            # GGA und RMC ergänzen sich (Höhe/Satelliten bzw. Geschwindigkeit/Kurs)
+            merged = dict(self._fix or {})
+            merged.update({k: v for k, v in fix.items() if v is not None})
+            self._fix = merged
+            self.fixes += 1
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            try:
+                self._read_source()
+                backoff = 1.0
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.warning(f"GPS-Quelle '{self.source}' fehlgeschlagen: {e} - neuer Versuch in {backoff:.0f}s")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _read_source(self):
+        if self.source.startswith('serial:'):
+            self._read_serial(self.source[len('serial:'):])
+        elif self.source.startswith('gpsd://'):
+            self._read_gpsd(self.source[len('gpsd://'):])
+        elif self.source.startswith('fixed:'):
+            latitude, longitude = (float(v) for v in self.source[len('fixed:'):].split(','))
+            while not self._stop_event.is_set():
+                self._update({'latitude': latitude, 'longitude': longitude})
+                self._stop_event.wait(1.0)
+        else:
+            path = self.source[len('file:'):] if self.source.startswith('file:') else self.source
+            self._replay_file(path)
+
+    def _read_serial(self, spec):
+        try:
+            import serial
+        except ImportError:
+            raise RuntimeError("pyserial ist nicht installiert (pip install pyserial)")
+        port, _, baud = spec.partition('@')
+        with serial.Serial(port, int(baud or 9600), timeout=1) as device:
+            while not self._stop_event.is_set():
+                line = device.readline().decode('ascii', errors='ignore')
+                if line:
+                    fix = parse_nmea(line)
+                    if fix is not None:
+                        self._update(fix)
+
+    def _read_gpsd(self, address):
+        host, _, port = address.partition(':')
+        with socket.create_connection((host or 'localhost', int(port or 2947)), timeout=10) as sock:
+            sock.sendall(b'?WATCH={"enable":true,"json":true}\n')
+            stream = sock.makefile('r', encoding='utf-8', errors='ignore')
+            while not self._stop_event.is_set():
+                line = stream.readline()
+                if not line:
+                    raise ConnectionError("gpsd hat die Verbindung geschlossen")
+                report = json.loads(line)
+                if report.get('class') == 'TPV' and report.get('mode', 0) >= 2 and 'lat' in report:
+                    self._update({
+                        'latitude': report['lat'],
+                        'longitude': report['lon'],
+                        'altitude': report.get('alt'),
+                        'speed_kmh': report['speed'] * 3.6 if report.get('speed') is not None else None,
+                        'course': report.get('track')
+                    })
+
+    def _replay_file(self, path):
+        """Spielt eine NMEA-Datei im Takt der enthaltenen Zeitstempel ab (in Schleife)"""
+        while not self._stop_event.is_set():
+            previous_time = None
+            with open(path, 'r', encoding='ascii', errors='ignore') as f:
+                for line in f:
+                    if self._stop_event.is_set():
+                        return
+                    fix = parse_nmea(line)
+                    if fix is None:
+                        continue
+                    current_time = fix.get('nmea_time')
+                    if self.realtime and previous_time is not None and current_time is not None:
+                        delay = current_time - previous_time
+                        if 0 < delay <= 5:
+                            self._stop_event.wait(delay)
+                    if current_time is not None:
+                        previous_time = current_time
+                    self._update(fix)
+            if not self.realtime:
+                # Einmal durchspielen, letzte Position halten
+                self._stop_event.wait()
+            # Kurze Pause vor dem nächsten Durchlauf (verhindert Leerlauf-Schleife bei kurzen Dateien)
+            self._stop_event.wait(1.0)
+
+    def get_stats(self):
+        fix = self.latest()
+        return {
+            'source': self.source,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'fix': fix,
+            'fix_age': round(time.time() - fix['received_at'], 1) if fix else None,
+            'fixes': self.fixes,
+            'errors': self.errors,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,130 @@
+"""
+PyResearch Metriken (Prometheus-Textformat)
+
+Kleine, abhängigkeitsfreie Umsetzung von Histogrammen und Gauges für /metrics.
+Histogramme werden im Frame-Loop befüllt (observe() ist nur ein paar Additionen
+unter einem Lock), Gauges werden erst beim Abruf über Collector-Funktionen aus
+den vorhandenen get_stats()-Werten gelesen.
+
+    registry = MetricsRegistry()
+    latency = registry.histogram('stage_latency_seconds', 'Latenz pro Stufe', labelnames=('stage',))
+    latency.observe(0.012, 'inference')
+    registry.add_collector(lambda: [gauge('clients', 'Verbundene Clients', [({}, 3)])])
+"""
+import bisect
+import logging
+import logging.handlers
+import queue
+import threading
+
+# Sekunden - von JPEG-Encoding (ms) bis Modell-Laden (s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Histogram:
+    """Prometheus-Histogramm mit festen Buckets und optionalen Labels"""
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        for labelvalues, (counts, total, count) in sorted(series.items()):
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(dict(labels, le=_format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(dict(labels, le='+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+def gauge(name, documentation, samples, kind='gauge'):
+    """Metrik für einen Collector: samples = [(labels-dict, wert), ...]"""
+    return name, kind, documentation, samples
+
+
+class MetricsRegistry:
+    """Sammelt Histogramme und Collector-Funktionen und rendert das Textformat"""
+
+    def __init__(self, prefix='pothole_'):
+        self.prefix = prefix
+        self._histograms = []
+        self._collectors = []
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS, labelnames=()):
+        histogram = Histogram(self.prefix + name, documentation, buckets, labelnames)
+        self._histograms.append(histogram)
+        return histogram
+
+    def add_collector(self, collector):
+        """collector() -> Liste von gauge(...)-Tupeln, wird bei jedem Abruf aufgerufen"""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        for collector in self._collectors:
+            try:
+                metrics = collector()
+            except Exception as e:
+                lines.append(f"# Collector-Fehler: {e}")
+                continue
+            for name, kind, documentation, samples in metrics:
+                name = self.prefix + name
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def start_queue_logging(logger, handlers):
+    """Hängt die Handler hinter eine Queue: log() legt nur in die Queue, ein Thread schreibt
+
+    Gibt den QueueListener zurück (listener.stop() leert die Queue beim Beenden).
+    """
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,244 @@
+"""
+PyResearch Multi-Kamera-Modus
+
+Öffnet mehrere Quellen (Kameras, Video-Dateien, Streams, Bildfolgen - siehe
+sources.py) gleichzeitig. Jede Quelle bekommt eine eigene FramePipeline
+(Capture/Encoder/Broadcaster), die YOLO-Inferenz
+läuft aber gesammelt über die BatchInferenceEngine: Frames aller Kameras werden
+zu einem einzigen self.model([...]) Aufruf zusammengefasst und die Detections
+an die jeweilige Kamera zurückgegeben.
+"""
+import queue
+import threading
+import time
+
+from pipeline import FrameBroadcaster, FramePipeline, StageStats, TooManyClientsError
+from sources import ReconnectingSource, create_source
+
+
+class _BatchRequest:
+    def __init__(self, frame):
+        self.frame = frame
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchInferenceEngine:
+    """Sammelt Frames mehrerer Kameras zu Batches für einen Modell-Aufruf
+
+    Ein Batch wird ausgeführt, sobald max_batch_size Frames vorliegen oder das
+    Wartefenster max_wait (Sekunden) nach dem ersten Frame abgelaufen ist.
+    """
+
+    def __init__(self, infer_batch, max_batch_size=4, max_wait=0.02):
+        self.infer_batch = infer_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait
+        self._requests = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.stats = StageStats('batch_inference')
+        self.batches = 0
+        self.batched_frames = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='batch-inference', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        # Wartende Aufrufer nicht hängen lassen
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            request.error = RuntimeError("Batch-Inferenz wurde gestoppt")
+            request.done.set()
+
+    def infer(self, frame, timeout=10.0):
+        """Reiht einen Frame ein und wartet auf dessen Detections"""
+        request = _BatchRequest(frame)
+        self._requests.put(request)
+        if not request.done.wait(timeout):
+            raise TimeoutError("Batch-Inferenz hat nicht rechtzeitig geantwortet")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect_batch(self):
+        try:
+            first = self._requests.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                results = self.infer_batch([request.frame for request in batch])
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as e:
+                self.stats.error()
+                for request in batch:
+                    request.error = e
+            self.stats.record(time.perf_counter() - start)
+            self.batches += 1
+            self.batched_frames += len(batch)
+            for request in batch:
+                request.done.set()
+
+    def get_stats(self):
+        stats = self.stats.snapshot()
+        stats.update({
+            'batches': self.batches,
+            'avg_batch_size': round(self.batched_frames / self.batches, 2) if self.batches else 0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'pending': self._requests.qsize()
+        })
+        return stats
+
+
+class CameraStream:
+    """Eine Quelle (Kamera, Video-Datei, Stream oder Bildfolge) mit eigener Pipeline"""
+
+    def __init__(self, camera_id, source, open_camera, process_frame, encode_frame,
+                 max_clients=5, buffer_size=2, source_options=None):
+        self.camera_id = camera_id
+        self.source = source
+        options = dict(source_options or {})
+        backoff = (options.pop('min_backoff', 0.5), options.pop('max_backoff', 10.0))
+        self.video_source = ReconnectingSource(create_source(source, open_camera, **options), *backoff)
+        self.detection_count = 0
+        self.pipeline = FramePipeline(
+            read_frame=self.read_frame,
+            process_frame=lambda frame: process_frame(self, frame),
+            encode_frame=encode_frame,
+            broadcaster=FrameBroadcaster(max_clients=max_clients, buffer_size=buffer_size)
+        )
+
+    def read_frame(self):
+        """Capture-Stufe dieser Quelle (Takt, Spiegeln und Neuverbinden übernimmt die Quelle)"""
+        return self.video_source.read()
+
+    def start(self):
+        self.pipeline.start()
+
+    def stop(self):
+        self.pipeline.stop()
+        self.video_source.release()
+
+    def info(self):
+        return {
+            'camera_id': self.camera_id,
+            'source': self.source,
+            'opened': self.video_source.source.opened,
+            'capture': self.video_source.get_stats(),
+            'detections': self.detection_count,
+            'pipeline': self.pipeline.get_stats()
+        }
+
+
+class MultiCameraManager:
+    """Verwaltet alle Quellen des Multi-Kamera-Modus und die gemeinsame Batch-Engine
+
+    max_clients begrenzt die Stream-Clients über alle Kameras zusammen (jeder
+    hält einen Server-Thread), nicht pro Kamera.
+    """
+
+    def __init__(self, infer_batch, open_camera, process_frame, encode_frame,
+                 max_batch_size=4, max_wait=0.02, max_clients=5, buffer_size=2, source_options=None):
+        self.engine = BatchInferenceEngine(infer_batch, max_batch_size, max_wait)
+        self.open_camera = open_camera
+        self.process_frame = process_frame
+        self.encode_frame = encode_frame
+        self.max_clients = max_clients
+        self.buffer_size = buffer_size
+        self.source_options = source_options
+        self.streams = {}
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return bool(self.streams)
+
+    def start(self, sources):
+        """Startet alle Quellen (laufende Quellen werden vorher gestoppt)"""
+        self.stop()
+        with self._lock:
+            for camera_id, source in enumerate(sources):
+                stream = CameraStream(
+                    camera_id, source, self.open_camera, self.process_frame, self.encode_frame,
+                    max_clients=0, buffer_size=self.buffer_size,
+                    source_options=self.source_options
+                )
+                self.streams[camera_id] = stream
+            self.engine.start()
+            for stream in self.streams.values():
+                stream.start()
+
+    def stop(self):
+        with self._lock:
+            for stream in self.streams.values():
+                stream.stop()
+            self.streams = {}
+            self.engine.stop()
+
+    def get_stream(self, camera_id):
+        with self._lock:
+            return self.streams.get(camera_id)
+
+    def _client_count(self):
+        return sum(stream.pipeline.broadcaster.client_count() for stream in self.streams.values())
+
+    def subscribe(self, camera_id):
+        """Neuer Stream-Client für eine Kamera (None wenn nicht aktiv, TooManyClientsError wenn voll)"""
+        with self._lock:
+            stream = self.streams.get(camera_id)
+            if stream is None:
+                return None
+            # Zählen und Eintragen unter demselben Lock - sonst überholen sich zwei Clients
+            if self.max_clients and self._client_count() >= self.max_clients:
+                raise TooManyClientsError(
+                    f"Maximal {self.max_clients} gleichzeitige Multi-Kamera-Clients erlaubt"
+                )
+            return stream.pipeline.broadcaster.subscribe()
+
+    def get_stats(self):
+        with self._lock:
+            streams = list(self.streams.values())
+            clients = self._client_count()
+        return {
+            'active': bool(streams),
+            'clients': clients,
+            'max_clients': self.max_clients,
+            'engine': self.engine.get_stats(),
+            'cameras': [stream.info() for stream in streams]
+        }
@@ -0,0 +1,446 @@
+"""
+PyResearch Frame-Pipeline
+
+Entkoppelt Kamera-Capture, YOLO-Inferenz und JPEG-Encoding in eigene Threads.
+Die Stufen sind über begrenzte "Latest-Frame-Wins"-Queues verbunden: ist eine
+Stufe zu langsam, werden veraltete Frames verworfen statt aufgestaut.
+
+Jeder kodierte Frame wird genau einmal erzeugt und über den FrameBroadcaster
+an alle verbundenen /video_feed Clients verteilt (ein Ringpuffer pro Client).
+
+SharedResource zählt die Zuschauer: die Pipeline (und damit die Kamera) startet
+mit dem ersten Client und stoppt nach einer Leerlaufzeit ohne Clients.
+"""
+import threading
+import time
+from collections import deque
+
+
+class LatestFrameQueue:
+    """Begrenzte Queue - bei Überlauf wird der älteste Frame verworfen"""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = max(1, int(maxsize))
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """Legt einen Frame ab und verdrängt ggf. veraltete Frames"""
+        with self._cond:
+            while len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Holt den ältesten noch gültigen Frame (None bei Timeout)"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) > 0, timeout):
+                return None
+            return self._items.popleft()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+
+class StageStats:
+    """FPS- und Latenz-Statistik einer Pipeline-Stufe"""
+
+    def __init__(self, name, window=2.0, observer=None):
+        self.name = name
+        self.window = window
+        self.observer = observer  # observer(name, latenz) z.B. für /metrics-Histogramme
+        self._lock = threading.Lock()
+        self._timestamps = deque()
+        self.count = 0
+        self.errors = 0
+        self.last_latency = 0.0
+        self.avg_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency):
+        """Registriert einen verarbeiteten Frame mit seiner Latenz (Sekunden)"""
+        now = time.monotonic()
+        with self._lock:
+            self._timestamps.append(now)
+            self._trim(now)
+            self.count += 1
+            self.last_latency = latency
+            # Exponentiell geglätteter Mittelwert - robust gegen einzelne Ausreißer
+            if self.count == 1:
+                self.avg_latency = latency
+            else:
+                self.avg_latency = 0.9 * self.avg_latency + 0.1 * latency
+            self.max_latency = max(self.max_latency, latency)
+        if self.observer is not None:
+            self.observer(self.name, latency)
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def _trim(self, now):
+        while self._timestamps and now - self._timestamps[0] > self.window:
+            self._timestamps.popleft()
+
+    def fps(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            return len(self._timestamps) / self.window
+
+    def snapshot(self):
+        """Gibt die aktuellen Werte als Dictionary zurück (für JSON)"""
+        fps = self.fps()
+        with self._lock:
+            return {
+                'fps': round(fps, 2),
+                'latency_ms': round(self.avg_latency * 1000, 2),
+                'last_latency_ms': round(self.last_latency * 1000, 2),
+                'max_latency_ms': round(self.max_latency * 1000, 2),
+                'frames': self.count,
+                'errors': self.errors
+            }
+
+
+class TooManyClientsError(RuntimeError):
+    """Maximale Anzahl gleichzeitiger Stream-Clients erreicht"""
+
+
+class FrameSubscriber:
+    """Ein Stream-Client mit eigenem Ringpuffer
+
+    Ist der Puffer voll, wird der älteste Frame überschrieben - ein langsamer
+    Client überspringt also Frames, statt den Producer zu blockieren.
+    """
+
+    def __init__(self, broadcaster, client_id, buffer_size=2):
+        self.broadcaster = broadcaster
+        self.client_id = client_id
+        self._buffer = deque(maxlen=max(1, int(buffer_size)))
+        self._cond = threading.Condition()
+        self._closed = False
+        self.connected_at = time.time()
+        self.received = 0
+        self.sent = 0
+        self.skipped = 0
+
+    def push(self, frame_id, frame_bytes):
+        """Wird vom Producer aufgerufen - niemals blockierend"""
+        with self._cond:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.skipped += 1
+            self._buffer.append((frame_id, frame_bytes))
+            self.received += 1
+            self._cond.notify()
+
+    def next_frame(self, timeout=1.0):
+        """Wartet auf den nächsten Frame -> (frame_id, bytes) oder None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._buffer or self._closed, timeout):
+                return None
+            if not self._buffer:
+                return None
+            self.sent += 1
+            return self._buffer.popleft()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.broadcaster.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                'client_id': self.client_id,
+                'connected_seconds': round(time.time() - self.connected_at, 1),
+                'received': self.received,
+                'sent': self.sent,
+                'skipped': self.skipped,
+                'buffered': len(self._buffer)
+            }
+
+
+class FrameBroadcaster:
+    """Verteilt jeden kodierten Frame (dieselben Bytes) an N Subscriber
+
+    Die Nutzlast wird nicht angefasst - app.py verwendet dieselbe Klasse auch
+    für die Detection-Events von /detection_events.
+    """
+
+    def __init__(self, max_clients=5, buffer_size=2):
+        self.max_clients = max_clients
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._next_client_id = 0
+        self.frame_id = 0
+        self.latest = None
+
+    def subscribe(self):
+        """Registriert einen neuen Client (TooManyClientsError wenn voll)"""
+        with self._lock:
+            if self.max_clients and len(self._subscribers) >= self.max_clients:
+                raise TooManyClientsError(
+                    f"Maximal {self.max_clients} gleichzeitige Stream-Clients erlaubt"
+                )
+            self._next_client_id += 1
+            subscriber = FrameSubscriber(self, self._next_client_id, self.buffer_size)
+            self._subscribers[subscriber.client_id] = subscriber
+            # Neuer Client bekommt sofort das letzte Bild statt auf den nächsten Frame zu warten
+            if self.latest is not None:
+                subscriber.push(self.frame_id, self.latest)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.pop(subscriber.client_id, None)
+
+    def publish(self, frame_bytes):
+        """Verteilt einen Frame an alle Clients (O(1) pro Client, ohne Kopie)"""
+        with self._lock:
+            self.frame_id += 1
+            frame_id = self.frame_id
+            self.latest = frame_bytes
+            subscribers = list(self._subscribers.values())
+        for subscriber in subscribers:
+            subscriber.push(frame_id, frame_bytes)
+
+    def client_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def get_stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        return {
+            'clients': len(subscribers),
+            'max_clients': self.max_clients,
+            'frames_published': self.frame_id,
+            'subscribers': [s.snapshot() for s in subscribers]
+        }
+
+
+class FramePipeline:
+    """Capture-Thread -> Inferenz-Worker -> Encoder mit Latest-Frame-Wins-Queues
+
+    read_frame()      -> (success, frame)   Kamera lesen (im Capture-Thread)
+    process_frame(f)  -> frame              YOLO + Annotation (im Inferenz-Worker)
+    encode_frame(f)   -> bytes              JPEG-Encoding (im Encoder-Thread)
+
+    Liefert read_frame() bei Misserfolg ein Fehlerbild statt None, wird dieses
+    direkt an den Encoder weitergereicht, damit der Client die Meldung sieht.
+    Fertige Frames landen im FrameBroadcaster (self.broadcaster). Gibt
+    encode_frame() None zurück, verteilt es die Frames selbst (z.B. StreamHub).
+    """
+
+    def __init__(self, read_frame, process_frame, encode_frame, queue_size=1, error_interval=1.0,
+                 broadcaster=None, observer=None):
+        self.read_frame = read_frame
+        self.process_frame = process_frame
+        self.encode_frame = encode_frame
+        self.error_interval = error_interval
+
+        self.capture_queue = LatestFrameQueue(queue_size)
+        self.encode_queue = LatestFrameQueue(queue_size)
+        self.stats = {
+            name: StageStats(name, observer=observer)
+            for name in ('capture', 'inference', 'encode', 'end_to_end')
+        }
+
+        self.broadcaster = broadcaster or FrameBroadcaster()
+
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._sequence = 0
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        """Startet alle Stufen (idempotent)"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name='pipeline-capture', daemon=True),
+            threading.Thread(target=self._inference_loop, name='pipeline-inference', daemon=True),
+            threading.Thread(target=self._encode_loop, name='pipeline-encode', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stoppt alle Stufen und wartet auf die Threads"""
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # ---------- Stufen ----------
+
+    def _capture_loop(self):
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                success, frame = self.read_frame()
+            except Exception:
+                success, frame = False, None
+
+            if not success:
+                self.stats['capture'].error()
+                if frame is not None:
+                    # Fehlerbild ohne Inferenz direkt anzeigen
+                    self.encode_queue.put((self._next_sequence(), time.perf_counter(), frame))
+                self._stop_event.wait(self.error_interval)
+                continue
+
+            captured_at = time.perf_counter()
+            self.stats['capture'].record(captured_at - start)
+            self.capture_queue.put((self._next_sequence(), captured_at, frame))
+
+    def _inference_loop(self):
+        while not self._stop_event.is_set():
+            item = self.capture_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            sequence, captured_at, frame = item
+            start = time.perf_counter()
+            try:
+                output_frame = self.process_frame(frame)
+            except Exception:
+                self.stats['inference'].error()
+                output_frame = frame
+            self.stats['inference'].record(time.perf_counter() - start)
+            self.encode_queue.put((sequence, captured_at, output_frame))
+
+    def _encode_loop(self):
+        while not self._stop_event.is_set():
+            item = self.encode_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            sequence, captured_at, frame = item
+            start = time.perf_counter()
+            try:
+                frame_bytes = self.encode_frame(frame)
+            except Exception:
+                self.stats['encode'].error()
+                continue
+            finished = time.perf_counter()
+            self.stats['encode'].record(finished - start)
+            self.stats['end_to_end'].record(finished - captured_at)
+            if frame_bytes is not None:
+                self.broadcaster.publish(frame_bytes)
+
+    def _next_sequence(self):
+        self._sequence += 1
+        return self._sequence
+
+    def get_stats(self):
+        """Per-Stage FPS/Latenz plus Queue-Tiefen und verworfene Frames"""
+        return {
+            'running': self.running,
+            'stages': {name: stats.snapshot() for name, stats in self.stats.items()},
+            'queues': {
+                'capture': {
+                    'depth': self.capture_queue.qsize(),
+                    'dropped': self.capture_queue.dropped
+                },
+                'encode': {
+                    'depth': self.encode_queue.qsize(),
+                    'dropped': self.encode_queue.dropped
+                }
+            },
+            'broadcast': self.broadcaster.get_stats()
+        }
+
+
+class SharedResource:
+    """Referenzgezählte Ressource: open() beim ersten Nutzer, close() nach idle_timeout ohne Nutzer
+
+    idle_timeout=0 schließt nie automatisch (nur über close_now()).
+    """
+
+    def __init__(self, opener, closer, idle_timeout=30.0):
+        self._open = opener
+        self._close = closer
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._timer = None
+        self.users = 0
+        self.active = False
+        self.opened_count = 0
+        self.closed_count = 0
+
+    def acquire(self):
+        """Neuer Nutzer - öffnet die Ressource falls nötig"""
+        with self._lock:
+            self.users += 1
+            self._cancel_timer()
+            if not self.active:
+                self._open()
+                self.active = True
+                self.opened_count += 1
+
+    def release(self):
+        """Nutzer weg - startet beim letzten Nutzer den Leerlauf-Timer"""
+        with self._lock:
+            self.users = max(0, self.users - 1)
+            if self.users == 0 and self.active and self.idle_timeout > 0:
+                self._cancel_timer()
+                timer = threading.Timer(self.idle_timeout, lambda: self._expire(timer))
+                timer.daemon = True
+                self._timer = timer
+                timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _expire(self, timer):
+        with self._lock:
+            # cancel() wirkt nicht mehr, wenn der Timer schon auf den Lock wartet -
+            # ein inzwischen ersetzter Timer darf die Ressource nicht schließen
+            if self._timer is not timer:
+                return
+            # Inzwischen wieder ein Nutzer da? Dann offen lassen
+            if self.users == 0 and self.active:
+                self._shutdown()
+
+    def _shutdown(self):
+        self._timer = None
+        self._close()
+        self.active = False
+        self.closed_count += 1
+
+    def close_now(self):
+        """Sofort schließen, unabhängig von den Nutzern (z.B. beim Beenden des Servers)"""
+        with self._lock:
+            self._cancel_timer()
+            if self.active:
+                self._shutdown()
+
+    def get_stats(self):
+        return {
+            'active': self.active,
+            'users': self.users,
+            'idle_timeout': self.idle_timeout,
+            'closing': self._timer is not None,
+            'opened': self.opened_count,
+            'closed': self.closed_count
+        }
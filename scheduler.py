@@ -0,0 +1,146 @@
+"""
+PyResearch Inferenz-Scheduler
+
+Entscheidet pro Frame, ob YOLO laufen muss oder die letzten Detections
+weiterverwendet werden können:
+
+- Frame-Skipping: Inferenz nur jeden N-ten Frame
+- Motion-Gating: billiger Frame-Differenz-Score auf einem Mini-Graustufenbild;
+  ohne Bewegung (z.B. Fahrzeug steht) wird die Inferenz übersprungen
+- CPU-Budget: N wird automatisch so angepasst, dass die Inferenz höchstens
+  den konfigurierten Anteil eines CPU-Kerns belegt (z.B. 0.5 = 50%). Gemessen
+  wird CPU-Zeit (measure_cpu), nicht Wall-Time
+
+Zwischen zwei Inferenzen werden die Boxen optional per Phasenkorrelation um die
+globale Bildverschiebung mitbewegt (leichtgewichtiges Tracking).
+"""
+import dataclasses
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+def measure_cpu(func, *args):
+    """func(*args) -> (Ergebnis, CPU-Sekunden des Prozesses währenddessen)
+
+    PyTorch und ONNX Runtime rechnen auf mehreren Intra-Op-Threads - die
+    Wall-Time würde die CPU-Last unterschätzen. Andere Threads des Prozesses
+    (Capture, Encoder) zählen mit, das Budget wird also eher zu streng gehalten.
+    """
+    start = time.process_time()
+    result = func(*args)
+    return result, time.process_time() - start
+
+
+class InferenceScheduler:
+    """Adaptives Frame-Skipping mit Motion-Gate und CPU-Budget"""
+
+    def __init__(self, cpu_budget=0.5, min_interval=1, max_interval=15,
+                 motion_threshold=0.02, track_motion=True, window=2.0, probe_size=(64, 36)):
+        self.cpu_budget = cpu_budget
+        self.min_interval = max(1, int(min_interval))
+        self.max_interval = max(self.min_interval, int(max_interval))
+        self.motion_threshold = motion_threshold
+        self.track_motion = track_motion
+        self.window = window
+        self.probe_size = probe_size
+
+        self.interval = self.min_interval
+        self._lock = threading.Lock()
+        self._frames_since_inference = 0
+        self._reference_probe = None
+        self._last_detections = None
+        self._window_start = time.monotonic()
+        self._window_busy = 0.0
+        self.cpu_usage = 0.0
+        self.last_motion = 0.0
+        self.inferences = 0
+        self.skipped = 0
+
+    def _probe(self, frame):
+        """Mini-Graustufenbild für Bewegungsschätzung (wenige tausend Pixel)"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.probe_size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def should_infer(self, frame):
+        """True wenn für diesen Frame YOLO laufen soll"""
+        with self._lock:
+            self._frames_since_inference += 1
+            if self._last_detections is None or self._reference_probe is None:
+                return True
+            if self._frames_since_inference < self.interval:
+                return False
+            if self._frames_since_inference >= self.max_interval or self.motion_threshold <= 0:
+                return True
+
+            probe = self._probe(frame)
+            self.last_motion = float(np.mean(np.abs(probe - self._reference_probe))) / 255.0
+            return self.last_motion >= self.motion_threshold
+
+    def record(self, frame, detections, cpu_seconds):
+        """Registriert eine Inferenz (CPU-Zeit, siehe measure_cpu) und passt das Intervall an das CPU-Budget an"""
+        with self._lock:
+            self._reference_probe = self._probe(frame)
+            self._last_detections = detections
+            self._frames_since_inference = 0
+            self.inferences += 1
+            self._window_busy += cpu_seconds
+            self._adapt()
+
+    def _adapt(self):
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+        # Anteil eines Kerns: CPU-Zeit der Inferenz pro Sekunde Wall-Time (mehrere Threads -> auch > 1.0)
+        self.cpu_usage = self._window_busy / elapsed
+        if self.cpu_budget:
+            if self.cpu_usage > self.cpu_budget and self.interval < self.max_interval:
+                self.interval += 1
+            elif self.cpu_usage < self.cpu_budget * 0.7 and self.interval > self.min_interval:
+                self.interval -= 1
+        self._window_start = now
+        self._window_busy = 0.0
+
+    def carry_forward(self, frame):
+        """Letzte Detections für einen übersprungenen Frame (ggf. mitbewegt)"""
+        with self._lock:
+            self.skipped += 1
+            detections = self._last_detections
+            if not self.track_motion or detections is None or len(detections) == 0:
+                return detections
+
+            probe = self._probe(frame)
+            (dx, dy), _ = cv2.phaseCorrelate(self._reference_probe, probe)
+            height, width = frame.shape[:2]
+            dx *= width / self.probe_size[0]
+            dy *= height / self.probe_size[1]
+
+        if abs(dx) < 1 and abs(dy) < 1:
+            return detections
+        shift = np.array([dx, dy, dx, dy], dtype=np.float32)
+        xyxy = detections.xyxy + shift
+        xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, width - 1)
+        xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, height - 1)
+        return dataclasses.replace(detections, xyxy=xyxy)
+
+    def reset(self):
+        """Verwirft gespeicherte Detections (z.B. nach Kamera-Wechsel)"""
+        with self._lock:
+            self._last_detections = None
+            self._reference_probe = None
+            self._frames_since_inference = 0
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'interval': self.interval,
+                'cpu_usage': round(self.cpu_usage, 3),
+                'cpu_budget': self.cpu_budget,
+                'motion': round(self.last_motion, 4),
+                'motion_threshold': self.motion_threshold,
+                'inferences': self.inferences,
+                'skipped': self.skipped
+            }
@@ -0,0 +1,433 @@
+"""
+PyResearch Video-Quellen
+
+Einheitliche Schnittstelle für alle Bildquellen der Pipeline:
+
+    0, 1, ...                    Lokale Kamera (Geräte-Index)
+    fahrt.mp4                    Video-Datei (im Originaltakt oder so schnell wie möglich)
+    rtsp://..., http(s)://...    Netzwerk-Stream (IP-Kamera, MJPEG)
+    bilder/ oder bilder/*.jpg    Bildfolge mit virtueller Uhr (replay_fps)
+
+ReconnectingSource öffnet eine verlorene Quelle mit exponentiellem Backoff neu
+(Dateien/Bildfolgen ohne loop enden dagegen endgültig mit EndOfStream),
+CameraDiscovery sucht lokale Kameras im Hintergrund und cached das Ergebnis.
+"""
+import abc
+import glob
+import logging
+import os
+import threading
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+STREAM_PREFIXES = ('rtsp://', 'rtsps://', 'http://', 'https://', 'udp://', 'tcp://')
+
+
+class EndOfStream(Exception):
+    """Datei bzw. Bildfolge ist zu Ende (loop=False) - kein Fehler, nicht neu verbinden"""
+
+
+def parse_source(value):
+    """'0' -> Kamera-Index 0, alles andere -> Datei-Pfad/URL"""
+    value = str(value).strip()
+    return int(value) if value.isdigit() else value
+
+
+class VirtualClock:
+    """Zeitbasis für Replays: realtime=True wartet auf die echte Zeit, sonst springt die Uhr sofort"""
+
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.time = 0.0
+        self._wall_start = None
+
+    def reset(self):
+        self.time = 0.0
+        self._wall_start = None
+
+    def advance_to(self, media_time):
+        """Wartet (nur realtime), bis media_time Sekunden seit Start vergangen sind"""
+        if self._wall_start is None:
+            self._wall_start = time.perf_counter() - media_time
+        if self.realtime:
+            delay = self._wall_start + media_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0:
+                # Zu weit zurück (z.B. nach Pause) - nicht nachholen
+                self._wall_start = time.perf_counter() - media_time
+        self.time = media_time
+
+
+class VideoSource(abc.ABC):
+    """Basisklasse: open() -> bool, read() -> (success, frame), release()
+
+    read() wirft EndOfStream, wenn eine endliche Quelle vollständig gelesen ist.
+    """
+
+    kind = 'source'
+
+    def __init__(self, spec):
+        self.spec = spec
+
+    @property
+    @abc.abstractmethod
+    def opened(self):
+        """True, solange die Quelle geöffnet ist"""
+
+    @abc.abstractmethod
+    def open(self):
+        """Öffnet die Quelle -> bool"""
+
+    @abc.abstractmethod
+    def read(self):
+        """-> (success, frame); wirft EndOfStream am Ende einer endlichen Quelle"""
+
+    def release(self):
+        pass
+
+    def info(self):
+        return {'kind': self.kind, 'source': str(self.spec), 'opened': self.opened}
+
+
+class CaptureSource(VideoSource):
+    """Gemeinsame Logik für alles, was cv2.VideoCapture öffnen kann"""
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.capture = None
+
+    def _create_capture(self):
+        return cv2.VideoCapture(self.spec)
+
+    @property
+    def opened(self):
+        return self.capture is not None and self.capture.isOpened()
+
+    def open(self):
+        self.release()
+        capture = self._create_capture()
+        if not capture.isOpened():
+            capture.release()
+            return False
+        self.capture = capture
+        return True
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        success, frame = self.capture.read()
+        if not success:
+            self.release()
+            return False, None
+        return True, frame
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def info(self):
+        info = super().info()
+        if self.opened:
+            info.update({
+                'width': int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                'fps': self.capture.get(cv2.CAP_PROP_FPS)
+            })
+        return info
+
+
+class DeviceSource(CaptureSource):
+    """Lokale Kamera - open_camera(index) setzt Backend und Auflösung (siehe app.open_camera)"""
+
+    kind = 'device'
+
+    def __init__(self, index, open_camera=None, flip=True):
+        super().__init__(index)
+        self.open_camera = open_camera
+        self.flip = flip
+
+    def _create_capture(self):
+        if self.open_camera is not None:
+            return self.open_camera(self.spec)
+        return cv2.VideoCapture(self.spec)
+
+    def read(self):
+        success, frame = super().read()
+        if success and self.flip:
+            # Spiegeln wie bei einer Webcam-Ansicht
+            frame = cv2.flip(frame, 1)
+        return success, frame
+
+
+class FileSource(CaptureSource):
+    """Video-Datei: im Originaltakt (realtime) oder so schnell wie möglich, optional in Schleife"""
+
+    kind = 'file'
+
+    def __init__(self, path, realtime=True, loop=True):
+        super().__init__(path)
+        self.loop = loop
+        self.clock = VirtualClock(realtime)
+        self._fps = 30.0
+        self._frame_index = 0
+
+    def open(self):
+        if not super().open():
+            return False
+        self._fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self._frame_index = 0
+        self.clock.reset()
+        return True
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        self.clock.advance_to(self._frame_index / self._fps)
+        success, frame = self.capture.read()
+        if not success and not self.loop:
+            self.release()
+            raise EndOfStream(self.spec)
+        if not success:
+            # Dateiende - von vorn beginnen
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self._frame_index = 0
+            self.clock.reset()
+            success, frame = self.capture.read()
+        if not success:
+            self.release()
+            return False, None
+        self._frame_index += 1
+        return True, frame
+
+    def info(self):
+        info = super().info()
+        info.update({'realtime': self.clock.realtime, 'position_s': round(self.clock.time, 2)})
+        return info
+
+
+class StreamSource(CaptureSource):
+    """RTSP/HTTP-Stream (IP-Kamera) über FFmpeg mit minimalem Puffer"""
+
+    kind = 'stream'
+
+    def _create_capture(self):
+        capture = cv2.VideoCapture(self.spec, cv2.CAP_FFMPEG)
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Immer das aktuellste Bild
+        return capture
+
+
+class ImageSequenceSource(VideoSource):
+    """Bildfolge (Verzeichnis oder Glob-Muster) mit virtueller Uhr: Bild i gehört zu i / fps Sekunden"""
+
+    kind = 'images'
+
+    def __init__(self, pattern, fps=10.0, realtime=True, loop=True):
+        super().__init__(pattern)
+        self.fps = fps
+        self.loop = loop
+        self.clock = VirtualClock(realtime)
+        self.files = []
+        self._index = 0
+
+    @property
+    def opened(self):
+        return bool(self.files)
+
+    def open(self):
+        if os.path.isdir(self.spec):
+            candidates = [os.path.join(self.spec, name) for name in os.listdir(self.spec)]
+        else:
+            candidates = glob.glob(self.spec)
+        self.files = sorted(p for p in candidates if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS)
+        self._index = 0
+        self.clock.reset()
+        return bool(self.files)
+
+    def read(self):
+        if not self.files:
+            return False, None
+        for _ in range(len(self.files)):
+            if self._index >= len(self.files):
+                if not self.loop:
+                    raise EndOfStream(self.spec)
+                self._index = 0
+                self.clock.reset()
+            self.clock.advance_to(self._index / self.fps)
+            frame = cv2.imread(self.files[self._index])
+            self._index += 1
+            if frame is not None:
+                return True, frame
+            # Defektes Bild überspringen - ein Fehler würde die Folge von vorn starten
+            logger.warning(f"Bild konnte nicht gelesen werden: {self.files[self._index - 1]}")
+        return False, None
+
+    def release(self):
+        self.files = []
+
+    def info(self):
+        info = super().info()
+        info.update({
+            'frames': len(self.files),
+            'position': self._index,
+            'fps': self.fps,
+            'realtime': self.clock.realtime,
+            'position_s': round(self.clock.time, 2)
+        })
+        return info
+
+
+def create_source(spec, open_camera=None, realtime=True, loop=True, replay_fps=10.0):
+    """Erzeugt die passende Quelle für einen Index, Pfad oder eine URL"""
+    spec = parse_source(spec)
+    if isinstance(spec, int):
+        return DeviceSource(spec, open_camera)
+    if spec.lower().startswith(STREAM_PREFIXES):
+        return StreamSource(spec)
+    if os.path.isdir(spec) or any(char in spec for char in '*?['):
+        return ImageSequenceSource(spec, fps=replay_fps, realtime=realtime, loop=loop)
+    if os.path.splitext(spec)[1].lower() in IMAGE_EXTENSIONS:
+        raise ValueError(f"Einzelbild '{spec}' ist keine Video-Quelle (Verzeichnis oder Muster verwenden)")
+    return FileSource(spec, realtime=realtime, loop=loop)
+
+
+class ReconnectingSource:
+    """Hält eine Quelle offen und öffnet sie bei Fehlern mit exponentiellem Backoff neu
+
+    read() blockiert nie länger als das Lesen selbst: während der Wartezeit
+    liefert es sofort (False, None).
+
+    Zustände: closed -> open -> lost/waiting -> open ... bzw. ended (Datei-Ende
+    ohne loop, wird nicht neu geöffnet). Der Backoff gilt erst als überstanden,
+    wenn nach dem Öffnen ein Bild gelesen wurde - eine Quelle, die sich öffnen
+    lässt, aber keine Bilder liefert, wird also nicht im Takt von min_backoff
+    neu geöffnet.
+    """
+
+    def __init__(self, source, min_backoff=0.5, max_backoff=10.0):
+        self.source = source
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.state = 'closed'
+        self._backoff = min_backoff
+        self._next_attempt = 0.0
+        self._delivered = False  # Seit dem letzten open() mindestens ein Bild gelesen
+        self.reconnects = 0
+        self.failures = 0
+
+    def _retry_later(self, reason):
+        self.failures += 1
+        self.state = 'waiting'
+        self._next_attempt = time.monotonic() + self._backoff
+        logger.warning(f"Quelle '{self.source.spec}' {reason} - neuer Versuch in {self._backoff:.1f}s")
+        self._backoff = min(self._backoff * 2, self.max_backoff)
+
+    def open(self):
+        """Versucht die Quelle sofort zu öffnen -> bool"""
+        if self.source.open():
+            if self.state in ('lost', 'waiting'):
+                self.reconnects += 1
+            self.state = 'open'
+            self._delivered = False
+            logger.info(f"Quelle geöffnet: {self.source.spec}")
+            return True
+        self._retry_later('nicht verfügbar')
+        return False
+
+    def read(self):
+        if self.state == 'ended':
+            return False, None
+        if not self.source.opened:
+            if time.monotonic() < self._next_attempt or not self.open():
+                return False, None
+        try:
+            success, frame = self.source.read()
+        except EndOfStream:
+            self.source.release()
+            self.state = 'ended'
+            logger.info(f"Quelle zu Ende: {self.source.spec}")
+            return False, None
+        if success:
+            if not self._delivered:
+                self._delivered = True
+                self._backoff = self.min_backoff
+            return True, frame
+
+        self.source.release()
+        if self._delivered:
+            # Verbindung verloren - erster Neuversuch sofort, danach mit Backoff
+            self.state = 'lost'
+            self._next_attempt = 0.0
+        else:
+            # Geöffnet, aber kein einziges Bild - wie ein fehlgeschlagenes Öffnen behandeln
+            self._retry_later('liefert keine Bilder')
+        return False, None
+
+    def release(self):
+        self.source.release()
+        self.state = 'closed'
+
+    def get_stats(self):
+        info = self.source.info()
+        info.update({
+            'state': self.state,
+            'reconnects': self.reconnects,
+            'failures': self.failures,
+            'retry_in': round(max(0.0, self._next_attempt - time.monotonic()), 1) if self.state == 'waiting' else 0
+        })
+        return info
+
+
+class CameraDiscovery:
+    """Sucht lokale Kameras im Hintergrund und cached das Ergebnis für ttl Sekunden
+
+    probe(index) -> bool. Belegte Indizes (z.B. die laufende Kamera) werden
+    nicht geöffnet, sondern direkt als verfügbar gemeldet.
+    """
+
+    def __init__(self, probe, max_index=5, ttl=60.0):
+        self.probe = probe
+        self.max_index = max_index
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._thread = None
+        self.cameras = []
+        self.updated_at = None
+
+    @property
+    def scanning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def refresh(self, busy=()):
+        with self._lock:
+            if self.scanning:
+                return
+            self._thread = threading.Thread(target=self._scan, args=(tuple(busy),),
+                                            name='camera-discovery', daemon=True)
+            self._thread.start()
+
+    def _scan(self, busy):
+        cameras = []
+        for index in range(self.max_index):
+            try:
+                if index in busy or self.probe(index):
+                    cameras.append(index)
+            except Exception as e:
+                logger.warning(f"Kamera {index} konnte nicht geprüft werden: {e}")
+        self.cameras = cameras
+        self.updated_at = time.time()
+
+    def get(self, busy=()):
+        """Letztes Ergebnis sofort zurückgeben, bei Bedarf im Hintergrund neu suchen"""
+        if self.updated_at is None or time.time() - self.updated_at > self.ttl:
+            self.refresh(busy)
+        return {
+            'cameras': list(self.cameras),
+            'scanning': self.scanning,
+            'updated_at': self.updated_at
+        }
@@ -0,0 +1,692 @@
+"""
+PyResearch Detection-Speicher
+
+SQLite-Datenbank (WAL-Modus) für Pothole-Detections mit Index auf Zeitstempel
+und GPS-Position. Ersetzt das Einlesen der kompletten detections.csv bei jedem
+Karten-Aufruf. Eine vorhandene CSV wird beim ersten Start einmalig importiert.
+
+Kartenausschnitte (Bounding-Box) werden über einen R-Tree-Index beantwortet,
+bei kleinem Zoom werden Detections serverseitig in Grid-Zellen geclustert.
+
+Jede gespeicherte Meldung wird zusätzlich einem bekannten Schlagloch im Umkreis
+zugeordnet (räumlicher Hash, O(1) Nachbarsuche). Die Tabelle "potholes" enthält
+damit jedes Schlagloch genau einmal mit Trefferzahl, max. Confidence und
+letzter Sichtung - die Karte liest diese kompakte Tabelle statt aller Rohdaten.
+"""
+import contextlib
+import csv
+import io
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+CSV_COLUMNS = ['timestamp', 'latitude', 'longitude', 'confidence', 'pothole_count']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    confidence REAL NOT NULL DEFAULT 0,
+    pothole_count INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON detections (timestamp);
+CREATE INDEX IF NOT EXISTS idx_detections_position ON detections (latitude, longitude);
+CREATE TABLE IF NOT EXISTS potholes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 1,
+    max_confidence REAL NOT NULL DEFAULT 0,
+    max_pothole_count INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_potholes_last_seen ON potholes (last_seen);
+CREATE INDEX IF NOT EXISTS idx_potholes_position ON potholes (latitude, longitude);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Räumlicher Index - wird per Trigger mit der Tabelle synchron gehalten
+RTREE_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS detections_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+CREATE TRIGGER IF NOT EXISTS detections_rtree_insert AFTER INSERT ON detections BEGIN
+    INSERT INTO detections_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+END;
+CREATE TRIGGER IF NOT EXISTS detections_rtree_delete AFTER DELETE ON detections BEGIN
+    DELETE FROM detections_rtree WHERE id = old.id;
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS potholes_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+CREATE TRIGGER IF NOT EXISTS potholes_rtree_insert AFTER INSERT ON potholes BEGIN
+    INSERT INTO potholes_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+END;
+CREATE TRIGGER IF NOT EXISTS potholes_rtree_update AFTER UPDATE OF latitude, longitude ON potholes BEGIN
+    UPDATE potholes_rtree SET min_lat = new.latitude, max_lat = new.latitude,
+        min_lon = new.longitude, max_lon = new.longitude WHERE id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS potholes_rtree_delete AFTER DELETE ON potholes BEGIN
+    DELETE FROM potholes_rtree WHERE id = old.id;
+END;
+"""
+
+DETECTION_COLUMNS = 'd.timestamp, d.latitude, d.longitude, d.confidence, d.pothole_count'
+POTHOLE_COLUMNS = ('d.id, d.latitude, d.longitude, d.first_seen, d.last_seen, d.hits, '
+                   'd.max_confidence, d.max_pothole_count')
+
+# Tabellen, die über Bounding-Box/Zeitraum abgefragt werden können
+QUERY_TABLES = {
+    'detections': {'rtree': 'detections_rtree', 'time': 'timestamp'},
+    'potholes': {'rtree': 'potholes_rtree', 'time': 'last_seen'}
+}
+
+METERS_PER_DEGREE = 111320.0
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Entfernung zweier GPS-Punkte in Metern"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class SpatialHash:
+    """Grid-Hash für O(1) Suche nach dem nächsten Punkt im Umkreis radius_m
+
+    Zellen sind radius_m (in Breitengrad umgerechnet) groß. Da Längengrade zu
+    den Polen hin schrumpfen, werden in Ost-West-Richtung entsprechend mehr
+    Nachbarzellen geprüft - die Anzahl bleibt aber konstant.
+    """
+
+    def __init__(self, radius_m):
+        self.radius_m = radius_m
+        self.cell_deg = radius_m / METERS_PER_DEGREE
+        self._cells = {}
+        self._points = {}
+
+    def _key(self, lat, lon):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def insert(self, item_id, lat, lon):
+        self._points[item_id] = (lat, lon)
+        self._cells.setdefault(self._key(lat, lon), set()).add(item_id)
+
+    def remove(self, item_id):
+        point = self._points.pop(item_id, None)
+        if point is None:
+            return
+        key = self._key(*point)
+        cell = self._cells.get(key)
+        if cell is not None:
+            cell.discard(item_id)
+            if not cell:
+                del self._cells[key]
+
+    def move(self, item_id, lat, lon):
+        self.remove(item_id)
+        self.insert(item_id, lat, lon)
+
+    def nearest(self, lat, lon):
+        """Nächster Punkt im Umkreis -> (item_id, distanz_m) oder (None, None)"""
+        row, col = self._key(lat, lon)
+        lon_span = int(math.ceil(1.0 / max(math.cos(math.radians(lat)), 0.01)))
+        best_id, best_distance = None, None
+        for r in (row - 1, row, row + 1):
+            for c in range(col - lon_span, col + lon_span + 1):
+                for item_id in self._cells.get((r, c), ()):
+                    distance = haversine_m(lat, lon, *self._points[item_id])
+                    if distance <= self.radius_m and (best_distance is None or distance < best_distance):
+                        best_id, best_distance = item_id, distance
+        return best_id, best_distance
+
+    def __len__(self):
+        return len(self._points)
+
+
+def parse_bbox(value):
+    """'west,south,east,north' -> Tuple (None wenn leer, ValueError wenn ungültig)"""
+    if not value:
+        return None
+    parts = [float(v) for v in value.split(',')]
+    if len(parts) != 4 or not all(math.isfinite(v) for v in parts):
+        raise ValueError("bbox muss das Format west,south,east,north haben")
+    west, south, east, north = parts
+    # Leaflet liefert beim Herauszoomen auch Werte außerhalb von ±180/±90
+    west, east = max(-180.0, min(west, east)), min(180.0, max(west, east))
+    south, north = max(-90.0, min(south, north)), min(90.0, max(south, north))
+    return west, south, east, north
+
+
+def parse_time(value, end_of_day=False):
+    """'YYYY-MM-DD[ HH:MM[:SS]]' (auch mit 'T') -> 'YYYY-MM-DD HH:MM:SS' (None wenn leer, ValueError wenn ungültig)
+
+    end_of_day=True: ein reines Datum schließt den ganzen Tag ein (für until).
+    """
+    if not value:
+        return None
+    text = value.strip().replace('T', ' ')
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if fmt == '%Y-%m-%d' and end_of_day:
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+        return parsed.strftime('%Y-%m-%d %H:%M:%S')
+    raise ValueError(f"Ungültiger Zeitpunkt '{value}' (erwartet YYYY-MM-DD oder YYYY-MM-DD HH:MM:SS)")
+
+
+def parse_time_range(since, until):
+    """since/until aus Query-Parametern -> normalisiertes Tupel (ValueError wenn ungültig)"""
+    since, until = parse_time(since), parse_time(until, end_of_day=True)
+    if since and until and since > until:
+        raise ValueError("since liegt nach until")
+    return since, until
+
+
+def iter_csv_rows(detections, batch_size=1000):
+    """Streamt Detection-Dicts als CSV-Text in Blöcken von batch_size Zeilen"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for i, detection in enumerate(detections, 1):
+        writer.writerow([detection[column] for column in CSV_COLUMNS])
+        if i % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _pothole_to_dict(row):
+    return {
+        'id': row[0],
+        'latitude': row[1],
+        'longitude': row[2],
+        'first_seen': row[3],
+        'last_seen': row[4],
+        'hits': row[5],
+        'max_confidence': row[6],
+        'pothole_count': row[7]
+    }
+
+
+def _row_to_dict(row):
+    detection = {
+        'timestamp': row[0],
+        'latitude': row[1],
+        'longitude': row[2],
+        'confidence': row[3],
+        'pothole_count': row[4]
+    }
+    if len(row) > 5:
+        detection['id'] = row[5]
+    return detection
+
+
+class DetectionStore:
+    """Thread-sicherer SQLite-Speicher (eine Verbindung pro Thread, ein Schreib-Lock)"""
+
+    def __init__(self, db_path, dedup_radius_m=8.0, observer=None):
+        self.db_path = db_path
+        self.observer = observer  # observer(operation, sekunden) für Schreib-Latenzen (/metrics)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.has_rtree = False
+        self.pothole_index = SpatialHash(dedup_radius_m)
+        with self._write_lock:
+            conn = self._connection()
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(RTREE_SCHEMA)
+                # Bestehende Zeilen nachindizieren (z.B. Datenbank aus älterer Version)
+                for table in QUERY_TABLES:
+                    conn.execute(
+                        f'INSERT INTO {table}_rtree '
+                        f'SELECT id, latitude, latitude, longitude, longitude FROM {table} '
+                        f'WHERE id NOT IN (SELECT id FROM {table}_rtree)'
+                    )
+                self.has_rtree = True
+            except sqlite3.OperationalError:
+                # SQLite ohne R-Tree-Modul: Fallback auf den (latitude, longitude) Index
+                pass
+            conn.commit()
+
+            for pothole_id, lat, lon in conn.execute('SELECT id, latitude, longitude FROM potholes'):
+                self.pothole_index.insert(pothole_id, lat, lon)
+            self._build_potholes(conn)
+
+    def _build_potholes(self, conn):
+        """Ordnet bereits vorhandene Rohdaten einmalig Schlaglöchern zu"""
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'potholes_built'").fetchone():
+            return
+        with self._transaction(conn) as undo:
+            rows = conn.execute(
+                'SELECT latitude, longitude, confidence, pothole_count, timestamp '
+                'FROM detections ORDER BY timestamp, id'
+            ).fetchall()
+            for row in rows:
+                self._snap(conn, undo, *row)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('potholes_built', ?)",
+                         (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),))
+
+    @contextlib.contextmanager
+    def _transaction(self, conn):
+        """Schreib-Transaktion -> Undo-Liste für den pothole_index
+
+        Der Index wird sofort geändert (spätere Meldungen derselben Transaktion
+        müssen neue Schlaglöcher finden). Bei einem Rollback werden die Änderungen
+        rückwärts zurückgenommen - sonst zeigt der Index auf Zeilen, die es nicht gibt.
+        """
+        undo = []
+        try:
+            with conn:
+                yield undo
+        except BaseException:
+            for action in reversed(undo):
+                action()
+            raise
+
+    def _snap(self, conn, undo, latitude, longitude, confidence, pothole_count, timestamp):
+        """Ordnet eine Meldung dem nächsten Schlagloch im Umkreis zu (oder legt ein neues an)
+
+        Muss unter dem Schreib-Lock innerhalb von _transaction() aufgerufen werden.
+        """
+        pothole_id, _ = self.pothole_index.nearest(latitude, longitude)
+        if pothole_id is None:
+            cursor = conn.execute(
+                'INSERT INTO potholes (latitude, longitude, first_seen, last_seen, hits, '
+                'max_confidence, max_pothole_count) VALUES (?, ?, ?, ?, 1, ?, ?)',
+                (latitude, longitude, timestamp, timestamp, confidence, pothole_count)
+            )
+            new_id = cursor.lastrowid
+            self.pothole_index.insert(new_id, latitude, longitude)
+            undo.append(lambda: self.pothole_index.remove(new_id))
+            return new_id, True, 1
+
+        old_lat, old_lon, hits = conn.execute(
+            'SELECT latitude, longitude, hits FROM potholes WHERE id = ?', (pothole_id,)
+        ).fetchone()
+        # Position als Mittelwert aller Treffer - GPS-Rauschen mittelt sich heraus
+        new_lat = (old_lat * hits + latitude) / (hits + 1)
+        new_lon = (old_lon * hits + longitude) / (hits + 1)
+        conn.execute(
+            'UPDATE potholes SET latitude = ?, longitude = ?, hits = hits + 1, '
+            'max_confidence = MAX(max_confidence, ?), max_pothole_count = MAX(max_pothole_count, ?), '
+            'first_seen = MIN(first_seen, ?), last_seen = MAX(last_seen, ?) WHERE id = ?',
+            (new_lat, new_lon, confidence, pothole_count, timestamp, timestamp, pothole_id)
+        )
+        self.pothole_index.move(pothole_id, new_lat, new_lon)
+        undo.append(lambda: self.pothole_index.move(pothole_id, old_lat, old_lon))
+        return pothole_id, False, hits + 1
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            # WAL: Leser blockieren den Schreiber nicht (und umgekehrt)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # ---------- Import ----------
+
+    def import_csv(self, csv_path):
+        """Importiert eine bestehende detections.csv genau einmal -> Anzahl Zeilen
+
+        Zeitstempel werden mit parse_time() geprüft und vereinheitlicht - defekte
+        Zeilen werden übersprungen und gezählt (sonst scheitert später das Archivieren).
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        conn = self._connection()
+        key = f'csv_imported:{os.path.abspath(csv_path)}'
+        if conn.execute('SELECT 1 FROM meta WHERE key = ?', (key,)).fetchone():
+            return 0
+
+        rows = []
+        skipped = 0
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                try:
+                    timestamp = parse_time(row['timestamp'])
+                    if timestamp is None:
+                        raise ValueError("Zeitstempel fehlt")
+                    rows.append((
+                        timestamp,
+                        float(row['latitude']),
+                        float(row['longitude']),
+                        float(row.get('confidence') or 0),
+                        int(row.get('pothole_count') or 1)
+                    ))
+                except (AttributeError, KeyError, TypeError, ValueError):
+                    skipped += 1  # Defekte Zeile überspringen
+        if skipped:
+            logger.warning(f"{skipped} defekte Zeilen in '{csv_path}' übersprungen")
+
+        with self._write_lock, self._transaction(conn) as undo:
+            conn.executemany(
+                'INSERT INTO detections (timestamp, latitude, longitude, confidence, pothole_count) '
+                'VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            for timestamp, latitude, longitude, confidence, pothole_count in rows:
+                self._snap(conn, undo, latitude, longitude, confidence, pothole_count, timestamp)
+            conn.execute('INSERT INTO meta (key, value) VALUES (?, ?)',
+                         (key, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        return len(rows)
+
+    # ---------- Schreiben ----------
+
+    def add_detection(self, latitude, longitude, confidence=0, pothole_count=1, timestamp=None):
+        """Speichert eine Meldung und ordnet sie einem Schlagloch zu
+
+        Gibt ein Dictionary mit timestamp, pothole_id, new_pothole und hits zurück.
+        """
+        if timestamp is None:
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        latitude, longitude = float(latitude), float(longitude)
+        confidence, pothole_count = float(confidence), int(pothole_count)
+        conn = self._connection()
+        start = time.perf_counter()
+        with self._write_lock, self._transaction(conn) as undo:
+            conn.execute(
+                'INSERT INTO detections (timestamp, latitude, longitude, confidence, pothole_count) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (timestamp, latitude, longitude, confidence, pothole_count)
+            )
+            pothole_id, new_pothole, hits = self._snap(
+                conn, undo, latitude, longitude, confidence, pothole_count, timestamp
+            )
+        if self.observer is not None:
+            self.observer('insert', time.perf_counter() - start)
+        return {
+            'timestamp': timestamp,
+            'pothole_id': pothole_id,
+            'new_pothole': new_pothole,
+            'hits': hits
+        }
+
+    def add_detections(self, rows):
+        """Speichert mehrere Meldungen in einer Transaktion (Batch-Writer)
+
+        rows: Tupel (latitude, longitude, confidence, pothole_count, timestamp)
+        """
+        conn = self._connection()
+        start = time.perf_counter()
+        with self._write_lock, self._transaction(conn) as undo:
+            for latitude, longitude, confidence, pothole_count, timestamp in rows:
+                conn.execute(
+                    'INSERT INTO detections (timestamp, latitude, longitude, confidence, pothole_count) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (timestamp, latitude, longitude, confidence, pothole_count)
+                )
+                self._snap(conn, undo, latitude, longitude, confidence, pothole_count, timestamp)
+        if self.observer is not None:
+            self.observer('batch', time.perf_counter() - start)
+        return len(rows)
+
+    # ---------- Lesen ----------
+
+    def count(self):
+        return self._connection().execute('SELECT COUNT(*) FROM detections').fetchone()[0]
+
+    def iter_detections(self, batch_size=1000, bbox=None, since=None, until=None, with_ids=False):
+        """Liefert Detections zeilenweise (sortiert nach Zeit) ohne alles zu laden, optional gefiltert
+
+        with_ids=True ergänzt die Zeilen-ID ('id'), z.B. für das Archivieren.
+        """
+        join, where, params = self._filter(bbox, since, until)
+        columns = DETECTION_COLUMNS + (', d.id' if with_ids else '')
+        cursor = self._connection().execute(
+            f'SELECT {columns} FROM detections d {join} {where} ORDER BY d.timestamp, d.id',
+            params
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield _row_to_dict(row)
+
+    def get_detections(self):
+        return list(self.iter_detections())
+
+    def _filter(self, bbox=None, since=None, until=None, table='detections'):
+        """Baut JOIN/WHERE für Bounding-Box und Zeitraum (Tabellen-Alias d)
+
+        since/until wie von parse_time_range() geliefert (until schon bis Tagesende).
+        """
+        join, clauses, params = '', [], []
+        time_column = QUERY_TABLES[table]['time']
+        if bbox is not None:
+            west, south, east, north = bbox
+            if self.has_rtree:
+                join = f"JOIN {QUERY_TABLES[table]['rtree']} r ON r.id = d.id"
+                clauses += ['r.max_lat >= ?', 'r.min_lat <= ?', 'r.max_lon >= ?', 'r.min_lon <= ?']
+                params += [south, north, west, east]
+            # Exakter Filter (R-Tree speichert nur 32-Bit-Floats)
+            clauses += ['d.latitude BETWEEN ? AND ?', 'd.longitude BETWEEN ? AND ?']
+            params += [south, north, west, east]
+        if since:
+            clauses.append(f'd.{time_column} >= ?')
+            params.append(since)
+        if until:
+            clauses.append(f'd.{time_column} <= ?')
+            params.append(until)
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        return join, where, params
+
+    def query_detections(self, bbox=None, since=None, until=None, limit=None):
+        """Detections im Ausschnitt/Zeitraum (neueste zuerst bei gesetztem limit)"""
+        join, where, params = self._filter(bbox, since, until)
+        sql = f'SELECT {DETECTION_COLUMNS} FROM detections d {join} {where} ORDER BY d.timestamp'
+        if limit:
+            sql = f'SELECT * FROM ({sql} DESC LIMIT ?) ORDER BY timestamp'
+            params = params + [int(limit)]
+        return [_row_to_dict(row) for row in self._connection().execute(sql, params)]
+
+    def cluster_detections(self, cell_size, bbox=None, since=None, until=None):
+        """Fasst Detections in Grid-Zellen der Größe cell_size (Grad) zusammen"""
+        join, where, params = self._filter(bbox, since, until)
+        sql = (
+            'SELECT COUNT(*), AVG(d.latitude), AVG(d.longitude), MAX(d.confidence), '
+            'SUM(d.pothole_count), MAX(d.timestamp) '
+            f'FROM detections d {join} {where} '
+            'GROUP BY CAST((d.latitude + 90.0) / ? AS INTEGER), CAST((d.longitude + 180.0) / ? AS INTEGER)'
+        )
+        rows = self._connection().execute(sql, params + [cell_size, cell_size])
+        return [
+            {
+                'count': row[0],
+                'latitude': row[1],
+                'longitude': row[2],
+                'max_confidence': row[3],
+                'pothole_count': row[4],
+                'last_seen': row[5]
+            }
+            for row in rows
+        ]
+
+    def summarize(self, bbox=None, since=None, until=None):
+        """Anzahl, Durchschnitts-Confidence und Zeitraum im Ausschnitt"""
+        join, where, params = self._filter(bbox, since, until)
+        row = self._connection().execute(
+            'SELECT COUNT(*), AVG(d.confidence), SUM(d.pothole_count), MIN(d.timestamp), MAX(d.timestamp) '
+            f'FROM detections d {join} {where}',
+            params
+        ).fetchone()
+        return {
+            'count': row[0],
+            'avg_confidence': round(row[1], 1) if row[1] is not None else 0,
+            'pothole_count': row[2] or 0,
+            'first_seen': row[3],
+            'last_seen': row[4]
+        }
+
+    def iter_csv(self, batch_size=1000):
+        """Streamt alle Detections als CSV-Text (Header + eine Zeile pro Detection)"""
+        return iter_csv_rows(self.iter_detections(batch_size), batch_size)
+
+    def delete_detections_before(self, timestamp, max_id, keep_ids=()):
+        """Löscht Roh-Detections älter als timestamp bis einschließlich ID max_id (nach dem Archivieren)
+
+        max_id ist die höchste archivierte ID - später eingefügte Zeilen (z.B. ein
+        CSV-Import während des Archivierens) bleiben stehen, ebenso keep_ids (nicht
+        archivierbare Zeilen). Schlaglöcher bleiben.
+        """
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS keep_ids (id INTEGER PRIMARY KEY)')
+            conn.execute('DELETE FROM keep_ids')
+            conn.executemany('INSERT OR IGNORE INTO keep_ids (id) VALUES (?)', [(i,) for i in keep_ids])
+            return conn.execute(
+                'DELETE FROM detections WHERE id <= ? AND timestamp < ? AND id NOT IN (SELECT id FROM keep_ids)',
+                (max_id, timestamp)
+            ).rowcount
+
+    # ---------- Schlaglöcher (dedupliziert) ----------
+
+    def count_potholes(self):
+        return len(self.pothole_index)
+
+    def query_potholes(self, bbox=None, since=None, until=None, limit=None):
+        """Eindeutige Schlaglöcher im Ausschnitt (zuletzt gesehen innerhalb des Zeitraums)"""
+        join, where, params = self._filter(bbox, since, until, table='potholes')
+        sql = f'SELECT {POTHOLE_COLUMNS} FROM potholes d {join} {where} ORDER BY d.last_seen DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params = params + [int(limit)]
+        return [_pothole_to_dict(row) for row in self._connection().execute(sql, params)]
+
+    def cluster_potholes(self, cell_size, bbox=None, since=None, until=None):
+        """Fasst Schlaglöcher in Grid-Zellen der Größe cell_size (Grad) zusammen"""
+        join, where, params = self._filter(bbox, since, until, table='potholes')
+        sql = (
+            'SELECT COUNT(*), AVG(d.latitude), AVG(d.longitude), MAX(d.max_confidence), '
+            'SUM(d.hits), MAX(d.last_seen) '
+            f'FROM potholes d {join} {where} '
+            'GROUP BY CAST((d.latitude + 90.0) / ? AS INTEGER), CAST((d.longitude + 180.0) / ? AS INTEGER)'
+        )
+        rows = self._connection().execute(sql, params + [cell_size, cell_size])
+        return [
+            {
+                'count': row[0],
+                'latitude': row[1],
+                'longitude': row[2],
+                'max_confidence': row[3],
+                'hits': row[4],
+                'last_seen': row[5]
+            }
+            for row in rows
+        ]
+
+    def summarize_potholes(self, bbox=None, since=None, until=None):
+        """Anzahl eindeutiger Schlaglöcher, Treffer und Durchschnitts-Confidence"""
+        join, where, params = self._filter(bbox, since, until, table='potholes')
+        row = self._connection().execute(
+            'SELECT COUNT(*), SUM(d.hits), AVG(d.max_confidence), MIN(d.first_seen), MAX(d.last_seen) '
+            f'FROM potholes d {join} {where}',
+            params
+        ).fetchone()
+        return {
+            'count': row[0],
+            'hits': row[1] or 0,
+            'avg_confidence': round(row[2], 1) if row[2] is not None else 0,
+            'first_seen': row[3],
+            'last_seen': row[4]
+        }
+
+
+class BatchedDetectionWriter:
+    """Schreibt Detections gepuffert im Hintergrund-Thread
+
+    submit() blockiert nie - der Frame-Loop macht damit keinerlei Disk-I/O.
+    Geschrieben wird, sobald batch_size Meldungen anstehen oder spätestens
+    nach flush_interval Sekunden.
+    """
+
+    def __init__(self, store, batch_size=50, flush_interval=2.0):
+        self.store = store
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='detection-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stoppt den Writer - noch gepufferte Meldungen werden vorher geschrieben"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, latitude, longitude, confidence=0, pothole_count=1, timestamp=None):
+        if timestamp is None:
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._queue.put((float(latitude), float(longitude), float(confidence), int(pothole_count), timestamp))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        try:
+            self.written += self.store.add_detections(batch)
+            self.batches += 1
+        except sqlite3.Error:
+            self.errors += 1
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            timeout = 0.5 if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            except queue.Empty:
+                pass
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline
+                          or self._stop_event.is_set()):
+                self._flush(batch)
+                batch = []
+                deadline = None
+        if batch:
+            self._flush(batch)
+
+    def get_stats(self):
+        return {
+            'written': self.written,
+            'batches': self.batches,
+            'pending': self.pending(),
+            'errors': self.errors,
+            'last_flush_ms': round(self.last_flush_ms, 2)
+        }
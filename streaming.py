@@ -0,0 +1,323 @@
+"""
+PyResearch Stream-Profile
+
+Jeder /video_feed Client wählt ein Profil (Breite, JPEG-Qualität, max. FPS) über
+Query-Parameter, z.B. /video_feed?profile=low oder /video_feed?width=640&quality=60&fps=10.
+
+Der StreamHub kodiert jeden Frame genau einmal pro aktivem Profil und verteilt
+die Bytes über einen FrameBroadcaster an alle Clients mit diesem Profil. Ohne
+Clients wird gar nicht kodiert.
+
+Mit adaptive=True misst jeder StreamClient seinen Durchsatz (Sendezeit pro
+Frame, übersprungene Frames) und wechselt bei Engpässen auf eine niedrigere
+Stufe (weniger Qualität / Auflösung) - und bei genug Reserve wieder zurück.
+"""
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+from pipeline import FrameBroadcaster, StageStats, TooManyClientsError
+
+PRESETS = {
+    'low': (480, 50, 8),
+    'medium': (854, 70, 15),
+    'high': (1280, 90, 30)
+}
+
+# Adaptive Stufen relativ zum angefragten Profil: (Breiten-Faktor, Qualitäts-Abzug)
+ADAPTIVE_LADDER = [(1.0, 0), (1.0, 15), (0.75, 25), (0.5, 35)]
+
+
+class StreamProfile(namedtuple('StreamProfile', 'width quality fps')):
+    """Breite (px), JPEG-Qualität (0-100), maximale FPS - Werte sind gerundet, damit Clients sich Profile teilen"""
+
+    @classmethod
+    def create(cls, width, quality, fps):
+        width = int(min(max(int(width), 160), 1920)) // 16 * 16
+        quality = int(min(max(int(quality), 20), 95)) // 5 * 5
+        fps = int(min(max(int(fps), 1), 30))
+        return cls(width, quality, fps)
+
+    @property
+    def key(self):
+        return f"{self.width}w_q{self.quality}_{self.fps}fps"
+
+    def step(self, level):
+        """Profil der adaptiven Stufe level (0 = wie angefragt)"""
+        factor, quality_drop = ADAPTIVE_LADDER[level]
+        return StreamProfile.create(max(320, self.width * factor), max(30, self.quality - quality_drop), self.fps)
+
+
+def parse_profile(args, default):
+    """Profil aus Query-Parametern (profile=low|medium|high, width, quality, fps), Rest vom Standard"""
+    width, quality, fps = PRESETS.get(args.get('profile', ''), default)
+    try:
+        return StreamProfile.create(
+            args.get('width', width),
+            args.get('quality', quality),
+            args.get('fps', fps)
+        )
+    except (TypeError, ValueError):
+        raise ValueError("width, quality und fps müssen Zahlen sein")
+
+
+class JpegEncoder:
+    """Wiederverwendbarer JPEG-Encoder: libjpeg-turbo (PyTurboJPEG) wenn installiert, sonst OpenCV
+
+    Verkleinerte Frames landen in vorallokierten Puffern (einer pro Zielgröße).
+    """
+
+    def __init__(self, use_turbojpeg=True):
+        self._turbo = None
+        if use_turbojpeg:
+            try:
+                from turbojpeg import TurboJPEG
+                self._turbo = TurboJPEG()
+            except Exception:
+                self._turbo = None
+        self._resize_buffers = {}
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return 'turbojpeg' if self._turbo is not None else 'opencv'
+
+    def resize(self, frame, width):
+        """Verkleinert auf width (nie vergrößern)"""
+        height, frame_width = frame.shape[:2]
+        if width >= frame_width:
+            return frame
+        size = (width, max(2, round(height * width / frame_width)))
+        key = (frame.shape, size)
+        buffer = self._resize_buffers.get(key)
+        if buffer is None:
+            buffer = self._resize_buffers[key] = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            return buffer
+        return cv2.resize(frame, size, dst=buffer, interpolation=cv2.INTER_AREA)
+
+    def encode(self, frame, quality):
+        if self._turbo is not None:
+            return self._turbo.encode(frame, quality=quality)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
+
+    def encode_profile(self, frame, profile):
+        """Verkleinern + Kodieren für ein Profil (Puffer sind geteilt, daher gesperrt)"""
+        with self._lock:
+            return self.encode(self.resize(frame, profile.width), profile.quality)
+
+
+class ProfileStream:
+    """Ein Profil: eigener Broadcaster, eigener FPS-Takt, eigene Encoding-Statistik"""
+
+    def __init__(self, profile, buffer_size=2):
+        self.profile = profile
+        self.broadcaster = FrameBroadcaster(max_clients=0, buffer_size=buffer_size)
+        self.stats = StageStats(profile.key)
+        self._next_due = 0.0
+        self.encoded_bytes = 0
+
+    def due(self, now):
+        """True wenn laut max. FPS ein neuer Frame fällig ist"""
+        if now < self._next_due:
+            return False
+        interval = 1.0 / self.profile.fps
+        # Takt halten, aber nach Pausen nicht nachholen
+        self._next_due = max(self._next_due + interval, now + interval * 0.5)
+        return True
+
+    def encode(self, encoder, frame):
+        start = time.perf_counter()
+        frame_bytes = encoder.encode_profile(frame, self.profile)
+        self.stats.record(time.perf_counter() - start)
+        self.encoded_bytes += len(frame_bytes)
+        return frame_bytes
+
+    def get_stats(self):
+        stats = self.stats.snapshot()
+        stats.update({
+            'profile': self.profile._asdict(),
+            'clients': self.broadcaster.client_count(),
+            'avg_frame_kb': round(self.encoded_bytes / stats['frames'] / 1024, 1) if stats['frames'] else 0
+        })
+        return stats
+
+
+class StreamClient:
+    """Ein /video_feed Client - abonniert den ProfileStream seiner aktuellen Stufe"""
+
+    def __init__(self, hub, client_id, requested, adaptive=True, window=2.0):
+        self.hub = hub
+        self.client_id = client_id
+        self.requested = requested
+        self.adaptive = adaptive
+        self.window = window
+        self.level = 0
+        self.profile = requested
+        self._subscriber = hub._attach(requested)
+        self._closed = False
+        self._window_start = time.perf_counter()
+        self._window_bytes = 0
+        self._window_send = 0.0
+        self._window_frames = 0
+        self._skipped_at_window = 0
+        self._headroom_windows = 0
+        self.throughput_kbps = 0.0
+        self.fps = 0.0
+        self.switches = 0
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def next_frame(self, timeout=1.0):
+        return self._subscriber.next_frame(timeout)
+
+    def report_sent(self, size, seconds):
+        """Vom Generator nach jedem gesendeten Frame aufgerufen (Bytes, Sendezeit)"""
+        self._window_bytes += size
+        self._window_send += seconds
+        self._window_frames += 1
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+
+        self.throughput_kbps = self._window_bytes * 8 / 1024 / elapsed
+        self.fps = self._window_frames / elapsed
+        skipped = self._subscriber.skipped - self._skipped_at_window
+        # Anteil der Zeit, in der der Client mit Empfangen beschäftigt war
+        busy = self._window_send / elapsed
+        if self.adaptive:
+            if (skipped > self._window_frames * 0.25 or busy > 0.8) and self.level < len(ADAPTIVE_LADDER) - 1:
+                self._switch(self.level + 1)
+            elif skipped == 0 and busy < 0.3 and self.level > 0:
+                # Erst nach mehreren entspannten Fenstern wieder hochschalten (kein Flattern)
+                self._headroom_windows += 1
+                if self._headroom_windows >= 3:
+                    self._switch(self.level - 1)
+            else:
+                self._headroom_windows = 0
+
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_send = 0.0
+        self._window_frames = 0
+        self._skipped_at_window = self._subscriber.skipped
+
+    def _switch(self, level):
+        profile = self.requested.step(level)
+        self.level = level
+        self._headroom_windows = 0
+        if profile == self.profile:
+            return
+        old_subscriber = self._subscriber
+        self._subscriber = self.hub._attach(profile)
+        old_subscriber.close()
+        self.profile = profile
+        self.switches += 1
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._subscriber.close()
+        self.hub._detach(self)
+
+    def snapshot(self):
+        return {
+            'client_id': self.client_id,
+            'requested': self.requested.key,
+            'profile': self.profile.key,
+            'level': self.level,
+            'adaptive': self.adaptive,
+            'fps': round(self.fps, 2),
+            'throughput_kbps': round(self.throughput_kbps, 1),
+            'switches': self.switches,
+            'skipped': self._subscriber.skipped
+        }
+
+
+class StreamHub:
+    """Kodiert jeden Frame einmal pro aktivem Profil und verteilt ihn an dessen Clients"""
+
+    def __init__(self, default_profile, max_clients=5, buffer_size=2, encoder=None):
+        self.default_profile = default_profile
+        self.max_clients = max_clients
+        self.buffer_size = buffer_size
+        self.encoder = encoder or JpegEncoder()
+        self._lock = threading.Lock()
+        self._streams = {}
+        self._clients = {}
+        self._next_client_id = 0
+        self._latest_frame = None
+
+    def subscribe(self, profile=None, adaptive=True):
+        """Neuer Client (TooManyClientsError wenn voll)"""
+        with self._lock:
+            if self.max_clients and len(self._clients) >= self.max_clients:
+                raise TooManyClientsError(
+                    f"Maximal {self.max_clients} gleichzeitige Stream-Clients erlaubt"
+                )
+            self._next_client_id += 1
+            client_id = self._next_client_id
+            # Platz unter demselben Lock reservieren wie die Prüfung (StreamClient
+            # selbst braucht den Lock für _attach und wird deshalb danach erstellt)
+            self._clients[client_id] = None
+        try:
+            client = StreamClient(self, client_id, profile or self.default_profile, adaptive)
+        except Exception:
+            with self._lock:
+                self._clients.pop(client_id, None)
+            raise
+        with self._lock:
+            self._clients[client_id] = client
+        return client
+
+    def _attach(self, profile):
+        with self._lock:
+            stream = self._streams.get(profile)
+            if stream is None:
+                stream = self._streams[profile] = ProfileStream(profile, self.buffer_size)
+            # Unter dem Hub-Lock abonnieren, sonst räumt publish() das leere Profil wieder ab
+            subscriber = stream.broadcaster.subscribe()
+            latest = self._latest_frame
+        if stream.broadcaster.latest is None and latest is not None:
+            # Neues Profil: letztes Bild sofort kodieren statt auf den nächsten Frame zu warten
+            subscriber.push(0, stream.encode(self.encoder, latest))
+        return subscriber
+
+    def _detach(self, client):
+        with self._lock:
+            self._clients.pop(client.client_id, None)
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def publish(self, frame):
+        """Encoder-Stufe der Pipeline: kodiert für alle Profile mit Clients (gibt None zurück)"""
+        now = time.perf_counter()
+        with self._lock:
+            self._latest_frame = frame
+            # Profile ohne Clients aufräumen
+            for profile in [p for p, s in self._streams.items() if s.broadcaster.client_count() == 0]:
+                del self._streams[profile]
+            streams = [s for s in self._streams.values() if s.due(now)]
+        for stream in streams:
+            stream.broadcaster.publish(stream.encode(self.encoder, frame))
+        return None
+
+    def get_stats(self):
+        with self._lock:
+            streams = list(self._streams.values())
+            clients = [client for client in self._clients.values() if client is not None]
+        return {
+            'encoder': self.encoder.name,
+            'clients': len(clients),
+            'max_clients': self.max_clients,
+            'profiles': {stream.profile.key: stream.get_stats() for stream in streams},
+            'subscribers': [client.snapshot() for client in clients]
+        }
@@ -0,0 +1,231 @@
+import atexit
+import os
+import time
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+sv = pytest.importorskip('supervision')
+
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    # app.py legt Log-Datei, Datenbank und Archiv relativ zum Arbeitsverzeichnis an
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    import app
+    yield app
+    # Noch während pytest stdout abfängt beenden und die Log-Queue leeren
+    app.shutdown()
+    app.log_listener.stop()
+    atexit.unregister(app.log_listener.stop)
+    os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def read_until(chunks, marker, limit=20):
+    """Liest SSE-Blöcke bis einer marker enthält"""
+    for _ in range(limit):
+        chunk = next(chunks)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if marker in chunk:
+            return chunk
+    raise AssertionError(f"{marker!r} nicht im Stream")
+
+
+# ---------- /detection_events (SSE) ----------
+
+def test_detection_events_stream(app_module, client):
+    response = client.get('/detection_events')
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    read_until(chunks, 'event: camera')
+
+    detections = sv.Detections(xyxy=np.array([[10, 20, 30, 40]], dtype=np.float32),
+                               confidence=np.array([0.87]), class_id=np.array([0]))
+    app_module.publish_detection_event(detections, source=0)
+    event = read_until(chunks, 'event: detections')
+    assert '"count": 1' in event and '[10, 20, 30, 40]' in event
+    assert '"unique_total": null' in event  # Schlüssel immer vorhanden, null ohne Tracking
+
+    response.close()
+    assert app_module.detection_events.client_count() == 0
+
+
+def test_detection_events_rejects_clients_over_limit(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module.detection_events, 'max_clients', 1)
+    first = client.get('/detection_events')
+    try:
+        assert client.get('/detection_events').status_code == 503
+    finally:
+        first.close()
+    assert app_module.detection_events.client_count() == 0
+
+
+# ---------- Backend-GPS ohne Browser ----------
+
+def test_headless_logging_starts_at_server_start(app_module, monkeypatch):
+    from pipeline import SharedResource
+
+    opened = []
+    camera = SharedResource(lambda: opened.append(True), lambda: None, idle_timeout=0.01)
+    monkeypatch.setattr(app_module, 'camera_usage', camera)
+    monkeypatch.setattr(app_module.model_loader, 'start', lambda: None)
+    monkeypatch.setitem(app_module.PR_GPS_CONFIG, 'source', 'fixed:48.1,11.5')
+    monkeypatch.setattr(app_module, 'yolo_enabled', False)
+    monkeypatch.setattr(app_module, 'gps_reader', None)
+    monkeypatch.setattr(app_module, 'detection_writer', None)
+
+    app_module.start_headless_logging()
+    try:
+        assert app_module.yolo_enabled
+        assert app_module.gps_reader is not None
+        # Dauerhafter Nutzer: auch nach einem kommenden und gehenden Browser bleibt die Kamera offen
+        camera.acquire()
+        camera.release()
+        time.sleep(0.05)
+        assert camera.active and camera.users == 1 and opened == [True]
+    finally:
+        app_module.gps_reader.stop()
+        app_module.detection_writer.stop()
+        camera.close_now()
+
+
+# ---------- Stream-Clients ----------
+
+def test_video_feed_releases_camera_when_closed_before_first_frame(app_module, monkeypatch):
+    from pipeline import SharedResource
+
+    camera = SharedResource(lambda: None, lambda: None, idle_timeout=0)
+    monkeypatch.setattr(app_module, 'camera_usage', camera)
+    clients = app_module.stream_hub.client_count()
+
+    # View direkt aufrufen - der Test-Client würde schon auf das erste Bild warten
+    with app_module.app.test_request_context('/video_feed?profile=low'):
+        response = app_module.video_feed()
+    assert response.status_code == 200 and camera.users == 1
+    assert app_module.stream_hub.client_count() == clients + 1
+    response.close()  # Generator wurde nie gestartet
+    assert camera.users == 0
+    assert app_module.stream_hub.client_count() == clients
+    camera.close_now()
+
+
+def test_video_feed_rejects_invalid_profile(client):
+    assert client.get('/video_feed?width=breit').status_code == 400
+
+
+def test_multi_video_feed_unknown_camera_and_limit(app_module, client, monkeypatch):
+    from pipeline import TooManyClientsError
+
+    monkeypatch.setattr(app_module, 'multicam_manager', None)
+    assert client.get('/multi_video_feed/0').status_code == 404
+
+    class FullManager:
+        def subscribe(self, camera_id):
+            raise TooManyClientsError('voll')
+
+    monkeypatch.setattr(app_module, 'multicam_manager', FullManager())
+    response = client.get('/multi_video_feed/0')
+    assert response.status_code == 503 and response.get_json()['error'] == 'voll'
+
+
+# ---------- Quellenwechsel ----------
+
+def test_switch_to_same_camera_holds_lock_until_reopened(app_module, monkeypatch):
+    events = []
+
+    class FakeSource:
+        state = 'open'
+
+        def __init__(self, name):
+            self.name = name
+
+        def open(self):
+            events.append((self.name, 'open', app_module.camera_lock.locked()))
+            return True
+
+        def release(self):
+            events.append((self.name, 'release', app_module.camera_lock.locked()))
+
+    old, new = FakeSource('alt'), FakeSource('neu')
+    monkeypatch.setattr(app_module, 'camera_index', 0)
+    monkeypatch.setattr(app_module, 'video_source', old)
+    monkeypatch.setattr(app_module, 'make_video_source', lambda spec: new)
+    old.state = 'lost'
+
+    success, _ = app_module.switch_video_source(0)
+    assert success and app_module.video_source is new
+    # Freigeben und neu Öffnen ohne Lücke, in der der Capture-Thread die alte Quelle öffnet
+    assert events[:2] == [('alt', 'release', True), ('neu', 'open', True)]
+
+
+# ---------- Export und Archiv ----------
+
+@pytest.fixture
+def archived_store(app_module, tmp_path, monkeypatch):
+    from datetime import datetime
+
+    from archive import DetectionArchive
+    from storage import DetectionStore
+
+    store = DetectionStore(str(tmp_path / 'detections.db'))
+    store.add_detection(48.10, 11.50, 80, 1, timestamp='2025-02-10 08:00:00')
+    store.add_detection(48.20, 11.60, 60, 2, timestamp='2025-03-05 09:00:00')
+    store.add_detection(48.15, 11.55, 70, 1, timestamp='2025-04-01 11:00:00')
+    archive = DetectionArchive(str(tmp_path / 'archive'))
+    archive.roll(store, now=datetime(2025, 4, 15))
+    monkeypatch.setattr(app_module, 'detection_store', store)
+    monkeypatch.setattr(app_module, 'detection_archive', archive)
+    return store
+
+
+@pytest.mark.parametrize('query', ['format=xlsx', 'since=gestern', 'since=2025-04-01&until=2025-03-01',
+                                   'bbox=1,2,3'])
+def test_download_rejects_invalid_parameters(archived_store, client, query):
+    response = client.get(f'/download_csv?{query}')
+    assert response.status_code == 400 and 'error' in response.get_json()
+
+
+def test_download_combines_archive_and_database(archived_store, client):
+    response = client.get('/download_csv?format=geojson&since=2025-03-01')
+    assert response.mimetype == 'application/geo+json'
+    assert 'pothole_detections_2025-03-01.geojson' in response.headers['Content-Disposition']
+    features = response.get_json()['features']
+    assert [feature['properties']['timestamp'] for feature in features] == [
+        '2025-03-05 09:00:00', '2025-04-01 11:00:00'
+    ]
+
+
+def test_get_detections_reads_archived_months(archived_store, client):
+    everything = client.get('/get_detections').get_json()['detections']
+    assert len(everything) == 3
+
+    data = client.get('/get_detections?since=2025-01-01&until=2025-03-31').get_json()
+    assert data['mode'] == 'detections' and data['summary']['count'] == 2
+    assert [d['timestamp'] for d in data['detections']] == ['2025-02-10 08:00:00', '2025-03-05 09:00:00']
+
+    clusters = client.get('/get_detections?since=2025-01-01&zoom=3').get_json()
+    assert clusters['mode'] == 'clusters' and sum(c['count'] for c in clusters['clusters']) == 3
+
+
+def test_get_detections_rejects_invalid_range(client):
+    assert client.get('/get_detections?until=2025-02-30').status_code == 400
+
+
+# ---------- /metrics ----------
+
+def test_metrics_endpoint(app_module, client):
+    app_module.observe_stage('yolo', 0.02)
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    assert 'pothole_stage_latency_seconds_count{stage="yolo"}' in text
+    assert '# TYPE pothole_stream_clients gauge' in text
+    assert '# Collector-Fehler' not in text
@@ -0,0 +1,207 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from archive import (DetectionArchive, cluster_columns, combined_columns, export_rows, iter_export,
+                     newest_rows, rows_to_columns, summarize_range)
+from storage import DetectionStore
+
+NOW = datetime(2025, 4, 15, 12, 0, 0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DetectionStore(str(tmp_path / 'detections.db'))
+    store.add_detection(48.10, 11.50, 80, 1, timestamp='2025-02-10 08:00:00')
+    store.add_detection(48.20, 11.60, 60, 2, timestamp='2025-03-05 09:00:00')
+    store.add_detection(52.50, 13.40, 90, 1, timestamp='2025-03-20 10:00:00')
+    store.add_detection(48.15, 11.55, 70, 1, timestamp='2025-04-01 11:00:00')  # Laufender Monat
+    return store
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return DetectionArchive(str(tmp_path / 'archive'))
+
+
+def timestamps(rows):
+    return [row['timestamp'] for row in rows]
+
+
+# ---------- roll ----------
+
+def test_roll_moves_completed_months(store, archive):
+    assert archive.roll(store, now=NOW) == ['2025-02', '2025-03']
+    assert store.count() == 1
+    assert archive.count() == 3 and archive.archived_until == '2025-04-01 00:00:00'
+    march = archive.manifest['partitions']['2025-03']
+    assert march['count'] == 2 and march['file'] == f"detections_2025-03_{march['max_id']}.npz"
+    assert march['bbox'] == [11.6, 48.2, 13.4, 52.5]
+    assert timestamps(export_rows(store, archive)) == [
+        '2025-02-10 08:00:00', '2025-03-05 09:00:00', '2025-03-20 10:00:00', '2025-04-01 11:00:00'
+    ]
+
+
+def test_roll_twice_changes_nothing(store, archive):
+    archive.roll(store, now=NOW)
+    assert archive.roll(store, now=NOW) == []
+    assert archive.count() == 3 and store.count() == 1
+
+
+def test_roll_after_crash_before_delete_does_not_duplicate(store, archive, monkeypatch):
+    def crash(timestamp, max_id, keep_ids=()):
+        raise RuntimeError('Abbruch')
+
+    monkeypatch.setattr(store, 'delete_detections_before', crash)
+    with pytest.raises(RuntimeError):
+        archive.roll(store, now=NOW)
+    monkeypatch.undo()
+    assert store.count() == 4  # Archiv geschrieben, Datenbank noch nicht aufgeräumt
+
+    # Manifest vom Datenträger wie nach einem Neustart
+    reopened = DetectionArchive(archive.directory)
+    assert reopened.roll(store, now=NOW) == []
+    assert reopened.count() == 3 and store.count() == 1
+
+
+def test_late_rows_are_appended_to_existing_partition(store, archive):
+    archive.roll(store, now=NOW)
+    old_file = archive.manifest['partitions']['2025-03']['file']
+    store.add_detection(48.30, 11.70, 50, 1, timestamp='2025-03-10 12:00:00')
+
+    assert archive.roll(store, now=NOW) == ['2025-03']
+    march = archive.manifest['partitions']['2025-03']
+    assert march['count'] == 3 and march['file'] != old_file
+    assert not os.path.exists(os.path.join(archive.directory, old_file))
+    assert timestamps(archive.iter_rows(since='2025-03-01 00:00:00', until='2025-03-31 23:59:59')) == [
+        '2025-03-05 09:00:00', '2025-03-10 12:00:00', '2025-03-20 10:00:00'
+    ]
+    assert store.count() == 1
+
+
+def test_rows_inserted_during_roll_are_kept(store, archive, monkeypatch):
+    original = store.iter_detections
+
+    def iter_and_import(*args, **kwargs):
+        yield from original(*args, **kwargs)
+        # Ein CSV-Import alter Fahrten läuft, nachdem roll() gelesen hat
+        store.add_detection(48.40, 11.80, 55, 1, timestamp='2025-02-20 12:00:00')
+
+    monkeypatch.setattr(store, 'iter_detections', iter_and_import)
+    archive.roll(store, now=NOW)
+    monkeypatch.undo()
+    assert archive.count() == 3
+    assert timestamps(store.iter_detections()) == ['2025-02-20 12:00:00', '2025-04-01 11:00:00']
+
+    archive.roll(store, now=NOW)
+    assert archive.manifest['partitions']['2025-02']['count'] == 2 and store.count() == 1
+
+
+def test_bad_timestamp_does_not_block_the_month(store, archive):
+    store.add_detection(48.50, 11.90, 40, 1, timestamp='2025-03-32 10:00:00')  # z.B. alter Import
+    assert archive.roll(store, now=NOW) == ['2025-02', '2025-03']
+    assert archive.count() == 3
+    # Die defekte Zeile bleibt in der Datenbank, alle anderen sind archiviert
+    assert timestamps(store.iter_detections()) == ['2025-03-32 10:00:00', '2025-04-01 11:00:00']
+    assert archive.roll(store, now=NOW) == [] and store.count() == 2
+
+
+def test_rows_to_columns_skips_bad_timestamps():
+    rows = [
+        {'timestamp': '2025-03-01 10:00:00', 'latitude': 48.1, 'longitude': 11.5, 'confidence': 80, 'pothole_count': 1},
+        {'timestamp': 'kaputt', 'latitude': 48.2, 'longitude': 11.6, 'confidence': 70, 'pothole_count': 1},
+        {'timestamp': '2025-03-02T08:00', 'latitude': 48.3, 'longitude': 11.7, 'confidence': 60, 'pothole_count': 2},
+    ]
+    columns = rows_to_columns(rows)
+    assert np.datetime_as_string(columns['timestamp']).tolist() == ['2025-03-01T10:00:00', '2025-03-02T08:00:00']
+    assert columns['latitude'].tolist() == [48.1, 48.3]
+
+
+def test_archive_rejects_unknown_settings(tmp_path):
+    with pytest.raises(ValueError):
+        DetectionArchive(str(tmp_path), partition='week')
+    with pytest.raises(ValueError):
+        DetectionArchive(str(tmp_path), fmt='xlsx')
+
+
+# ---------- Lesen ----------
+
+def test_partitions_for_uses_manifest_ranges(store, archive):
+    archive.roll(store, now=NOW)
+    assert archive.partitions_for() == ['2025-02', '2025-03']
+    assert archive.partitions_for(since='2025-03-01 00:00:00') == ['2025-03']
+    assert archive.partitions_for(until='2025-02-28 23:59:59') == ['2025-02']
+    assert archive.partitions_for(since='2025-04-01 00:00:00') == []
+    assert archive.partitions_for(bbox=(13.0, 52.0, 14.0, 53.0)) == ['2025-03']   # Berlin
+    assert archive.get_stats(since='2025-03-01 00:00:00')['count'] == 2
+
+
+def test_export_filters_archive_and_database(store, archive):
+    archive.roll(store, now=NOW)
+    rows = list(export_rows(store, archive, bbox=(11.0, 48.0, 12.0, 49.0), since='2025-03-01 00:00:00'))
+    assert timestamps(rows) == ['2025-03-05 09:00:00', '2025-04-01 11:00:00']
+    assert rows[0] == {'timestamp': '2025-03-05 09:00:00', 'latitude': 48.2, 'longitude': 11.6,
+                       'confidence': 60.0, 'pothole_count': 2}
+
+
+def test_iter_export_csv_and_geojson(store, archive):
+    archive.roll(store, now=NOW)
+    text = ''.join(iter_export(export_rows(store, archive), 'csv', batch_size=2))
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0] == ['timestamp', 'latitude', 'longitude', 'confidence', 'pothole_count'] and len(rows) == 5
+
+    geojson = json.loads(''.join(iter_export(export_rows(store, archive), 'geojson', batch_size=2)))
+    assert len(geojson['features']) == 4
+    assert geojson['features'][0]['geometry']['coordinates'] == [11.5, 48.1]
+
+    with pytest.raises(ValueError):
+        iter_export([], 'xlsx')
+
+
+def test_iter_export_parquet(store, archive):
+    pq = pytest.importorskip('pyarrow.parquet')
+    archive.roll(store, now=NOW)
+    data = b''.join(iter_export(export_rows(store, archive), 'parquet'))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 4 and table.column_names[0] == 'timestamp'
+
+
+def test_parquet_archive_round_trip(store, tmp_path):
+    pytest.importorskip('pyarrow')
+    archive = DetectionArchive(str(tmp_path / 'parquet'), fmt='parquet')
+    archive.roll(store, now=NOW)
+    assert archive.manifest['partitions']['2025-03']['file'].endswith('.parquet')
+    assert timestamps(archive.iter_rows()) == ['2025-02-10 08:00:00', '2025-03-05 09:00:00', '2025-03-20 10:00:00']
+
+
+# ---------- Abfragen über Archiv und Datenbank ----------
+
+def test_combined_queries_match_database_queries(tmp_path, store):
+    # Gleiche Daten einmal ganz in der Datenbank, einmal größtenteils im Archiv
+    reference = DetectionStore(str(tmp_path / 'reference.db'))
+    reference.add_detections([(row['latitude'], row['longitude'], row['confidence'], row['pothole_count'],
+                               row['timestamp']) for row in store.iter_detections()])
+    archive = DetectionArchive(str(tmp_path / 'archive'))
+    archive.roll(store, now=NOW)
+
+    columns = combined_columns(store, archive)
+    assert summarize_range(columns) == reference.summarize()
+    assert newest_rows(columns, limit=2) == reference.query_detections(limit=2)
+
+    def by_position(clusters):
+        return sorted((c['count'], round(c['latitude'], 6), round(c['longitude'], 6), c['max_confidence'],
+                       c['pothole_count'], c['last_seen']) for c in clusters)
+
+    assert by_position(cluster_columns(columns, 1.0)) == by_position(reference.cluster_detections(1.0))
+
+
+def test_combined_queries_on_empty_range(store, archive):
+    columns = combined_columns(store, archive, since='2030-01-01 00:00:00')
+    assert summarize_range(columns)['count'] == 0
+    assert cluster_columns(columns, 1.0) == [] and newest_rows(columns) == []
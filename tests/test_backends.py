@@ -0,0 +1,157 @@
+import os
+import threading
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+import backends
+from backends import artifact_path, export_model, load_calibration_frames, load_model, preprocess
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    path = tmp_path / 'best.pt'
+    path.write_bytes(b'gewichte')
+    return str(path)
+
+
+def test_artifact_paths(model_file):
+    stem = os.path.splitext(model_file)[0]
+    assert artifact_path(model_file, 'onnx') == stem + '.onnx'
+    assert artifact_path(model_file, 'onnx', int8=True) == stem + '_int8.onnx'
+    assert artifact_path(model_file, 'openvino') == stem + '_openvino_model'
+    assert artifact_path(model_file, 'pytorch') == model_file
+
+
+def test_export_cache_is_invalidated_by_new_weights(model_file):
+    artifact = artifact_path(model_file, 'onnx')
+    with open(artifact, 'wb') as f:
+        f.write(b'onnx')
+    backends._write_stamp(artifact, model_file, 640)
+    assert backends._is_fresh(artifact, model_file, 640)
+    assert not backends._is_fresh(artifact, model_file, 320)
+    os.utime(model_file, (0, 0))
+    assert not backends._is_fresh(artifact, model_file, 640)
+
+
+def test_unknown_backend_is_rejected(model_file):
+    with pytest.raises(ValueError):
+        export_model(model_file, 'tensorrt')
+    assert export_model(model_file, 'pytorch') == model_file
+
+
+def test_failed_export_falls_back_to_pytorch(model_file, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("onnxruntime fehlt")
+
+    monkeypatch.setattr(backends, 'export_model', fail)
+    monkeypatch.setattr(backends, '_load_pytorch', lambda path: 'pytorch-modell')
+    model, info = load_model(model_file, backend='onnx')
+    assert model == 'pytorch-modell'
+    assert info['backend'] == 'pytorch'
+    with pytest.raises(RuntimeError):
+        load_model(model_file, backend='onnx', fallback=False)
+
+
+def test_calibration_frames_from_image_directory(tmp_path):
+    for i in range(10):
+        cv2.imwrite(str(tmp_path / f'{i:02d}.png'), np.full((8, 8, 3), i, dtype=np.uint8))
+    frames = load_calibration_frames(str(tmp_path), limit=5)
+    assert len(frames) == 5
+    assert [int(frame[0, 0, 0]) for frame in frames] == [0, 2, 4, 6, 8]
+    assert load_calibration_frames(str(tmp_path / 'fehlt')) == []
+
+
+def test_preprocess_letterboxes_to_square_blob():
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    blob = preprocess(frame, 64)
+    assert blob.shape == (1, 3, 64, 64) and blob.dtype == np.float32
+    # Oben und unten grauer Rand (114), in der Mitte das Bild
+    assert blob[0, 0, 0, 0] == pytest.approx(114 / 255)
+    assert blob[0, 0, 32, 32] == 0
+
+
+# ---------- ModelLoader ----------
+
+def test_model_loader_loads_and_warms_up_in_background():
+    release_factory = threading.Event()
+
+    def factory():
+        release_factory.wait(2.0)
+        return 'modell'
+
+    loader = backends.ModelLoader(factory, warmup=lambda model: [0.01, 0.02])
+    loader.start()
+    assert loader.state == 'loading'
+    assert loader.get() is None  # Blockiert nie
+    release_factory.set()
+    assert loader.wait(timeout=2.0) == 'modell'
+    assert loader.state == 'ready'
+    assert loader.get_stats()['warmup_runs_ms'] == [10.0, 20.0]
+
+
+def test_model_loader_start_is_idempotent():
+    calls = []
+    loader = backends.ModelLoader(lambda: calls.append(1) or 'modell')
+    threads = [threading.Thread(target=loader.start) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    loader.wait(timeout=2.0)
+    loader.start()
+    assert calls == [1]
+
+
+def test_model_loader_reports_errors_and_can_retry():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise FileNotFoundError("best.pt fehlt")
+        return 'modell'
+
+    loader = backends.ModelLoader(factory)
+    loader.start()
+    loader._thread.join(2.0)
+    assert loader.state == 'error' and 'best.pt' in loader.error
+    assert loader.wait(timeout=2.0) == 'modell'
+
+
+def test_model_loader_release():
+    loader = backends.ModelLoader(lambda: 'modell')
+    loader.wait(timeout=2.0)
+    assert loader.release() == 'modell'
+    assert loader.state == 'idle' and loader.get() is None
+
+
+# ---------- LetterboxBuffer ----------
+
+def test_letterbox_crops_roi_and_remaps_boxes():
+    pytest.importorskip('torch')
+    buffer = backends.LetterboxBuffer(width=320, roi=(0.0, 0.5, 1.0, 1.0))
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    tensor = buffer.prepare([frame])
+
+    # Untere Bildhälfte 640x240 -> 320x120, aufgefüllt auf ein Vielfaches von 32
+    assert tuple(tensor.shape) == (1, 3, 128, 320)
+    assert buffer.pad == (0, 4)
+    boxes = buffer.remap(np.array([[10, 14, 110, 54]], dtype=np.float32))
+    np.testing.assert_allclose(boxes, [[20, 260, 220, 340]])
+    assert buffer.get_stats()['pixel_ratio'] == pytest.approx(320 * 128 / (640 * 480), abs=0.001)
+
+
+def test_letterbox_reuses_buffers_and_never_upscales():
+    pytest.importorskip('torch')
+    buffer = backends.LetterboxBuffer(width=640, max_batch=2)
+    frames = [np.full((100, 200, 3), 255, dtype=np.uint8)] * 2
+    first = buffer.prepare(frames)
+    second = buffer.prepare(frames[:1])
+    assert buffer.scale == 1.0
+    assert first.data_ptr() == second.data_ptr()
+    assert tuple(second.shape) == (1, 3, 128, 224)
+    np.testing.assert_allclose(buffer.remap(np.array([[300, 300, 400, 400]], dtype=np.float32)),
+                               [[199, 99, 199, 99]])
@@ -0,0 +1,187 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+import batch_process
+
+
+class FakeDetections:
+    def __init__(self, boxes):
+        self.xyxy = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidence = np.full(len(boxes), 0.9)
+        self.class_id = np.zeros(len(boxes), dtype=int)
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class FakeVisualizer:
+    """Eine Detection pro Frame, optional Fehler ab einem bestimmten Frame"""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.calls = 0
+
+    def detect(self, frame):
+        self.calls += 1
+        if self.fail_at is not None and self.calls >= self.fail_at:
+            raise RuntimeError("Worker abgestürzt")
+        return FakeDetections([[1, 2, 3, 4]])
+
+    def annotate(self, frame, detections):
+        return frame
+
+
+def write_video(path, frames=10, size=(64, 48)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10.0, size)
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), i * 20, dtype=np.uint8))
+    writer.release()
+
+
+@pytest.fixture
+def visualizer(monkeypatch):
+    fake = FakeVisualizer()
+    monkeypatch.setattr(batch_process, '_visualizer', fake)
+    return fake
+
+
+def test_plan_shards_splits_videos_and_image_groups(tmp_path):
+    video = str(tmp_path / 'fahrt.avi')
+    write_video(video, frames=10)
+    images = tmp_path / 'bilder'
+    images.mkdir()
+    for i in range(5):
+        cv2.imwrite(str(images / f'{i}.jpg'), np.zeros((8, 8, 3), dtype=np.uint8))
+
+    shards = batch_process.plan_shards([str(tmp_path)], chunk_frames=4, images_per_shard=2)
+
+    videos = [shard for shard in shards if shard['type'] == 'video']
+    groups = [shard for shard in shards if shard['type'] == 'images']
+    assert [(shard['start'], shard['end']) for shard in videos] == [(0, 4), (4, 8), (8, 10)]
+    assert [len(shard['files']) for shard in groups] == [2, 2, 1]
+    # Stabile IDs - Grundlage für das Fortsetzen
+    assert [s['id'] for s in shards] == [s['id'] for s in batch_process.plan_shards([str(tmp_path)], 4, 2)]
+
+
+def test_process_shard_writes_results_and_annotated_video(tmp_path, visualizer):
+    video = str(tmp_path / 'fahrt.avi')
+    write_video(video, frames=6)
+    output = tmp_path / 'out'
+    (output / 'detections').mkdir(parents=True)
+    shard = batch_process.plan_shards([video], chunk_frames=3)[1]
+
+    result = batch_process.process_shard((shard, str(output), True))
+
+    assert result['frames'] == 3
+    with open(output / 'detections' / (shard['id'] + '.jsonl'), encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3
+    assert os.path.exists(output / 'annotated' / (shard['id'] + '.mp4'))
+    assert not os.path.exists(output / 'annotated' / (shard['id'] + '.part.mp4'))
+
+
+def test_failed_shard_keeps_partial_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_process, '_visualizer', FakeVisualizer(fail_at=3))
+    video = str(tmp_path / 'fahrt.avi')
+    write_video(video, frames=6)
+    output = tmp_path / 'out'
+    (output / 'detections').mkdir(parents=True)
+    shard = batch_process.plan_shards([video])[0]
+
+    with pytest.raises(RuntimeError):
+        batch_process.process_shard((shard, str(output), True))
+
+    # Kein fertiges Ergebnis - der Shard wird beim nächsten Lauf wiederholt
+    assert not os.path.exists(output / 'detections' / (shard['id'] + '.jsonl'))
+    assert not os.path.exists(output / 'annotated' / (shard['id'] + '.mp4'))
+    assert os.path.exists(output / 'annotated' / (shard['id'] + '.part.mp4'))
+
+
+def test_run_shard_returns_error_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_process, '_visualizer', FakeVisualizer(fail_at=1))
+    video = str(tmp_path / 'fahrt.avi')
+    write_video(video, frames=3)
+    (tmp_path / 'detections').mkdir()
+    shard = batch_process.plan_shards([video])[0]
+
+    result = batch_process.run_shard((shard, str(tmp_path), False))
+    assert result == {'id': shard['id'], 'source': video, 'error': 'RuntimeError: Worker abgestürzt'}
+
+
+class InlinePool:
+    """Pool-Ersatz: verarbeitet die Shards im Testprozess (ohne Modell-Initializer)"""
+
+    def __init__(self, workers, initializer=None, initargs=()):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def imap_unordered(self, func, tasks):
+        return map(func, tasks)
+
+
+def test_failed_shard_does_not_abort_run(tmp_path, monkeypatch):
+    class BrokenVideoVisualizer(FakeVisualizer):
+        def detect(self, frame):
+            if frame.mean() > 200:
+                raise RuntimeError("Video defekt")
+            return super().detect(frame)
+
+    monkeypatch.setattr(batch_process, '_visualizer', BrokenVideoVisualizer())
+    monkeypatch.setattr(batch_process.multiprocessing, 'Pool', InlinePool)
+    inputs = tmp_path / 'aufnahmen'
+    inputs.mkdir()
+    write_video(str(inputs / 'a_gut.avi'), frames=4)
+    writer = cv2.VideoWriter(str(inputs / 'b_defekt.avi'), cv2.VideoWriter_fourcc(*'MJPG'), 10.0, (64, 48))
+    writer.write(np.full((48, 64, 3), 255, dtype=np.uint8))
+    writer.release()
+    output = tmp_path / 'out'
+
+    args = batch_process.parse_args([str(inputs), '--output', str(output), '--workers', '2'])
+    assert batch_process.run(args) == 1
+
+    with open(output / 'summary.json', encoding='utf-8') as f:
+        summary = json.load(f)
+    assert summary['processed_shards'] == 1 and summary['frames'] == 4
+    assert [shard['source'] for shard in summary['failed_shards']] == [str(inputs / 'b_defekt.avi')]
+    # Nur der fertige Shard gilt beim nächsten Aufruf als erledigt
+    assert len(os.listdir(output / 'detections')) == 2
+    assert sum(name.endswith('.jsonl') for name in os.listdir(output / 'detections')) == 1
+
+
+def test_worker_threads_split_cores(monkeypatch):
+    monkeypatch.setattr(batch_process.os, 'cpu_count', lambda: 8)
+    assert batch_process.worker_threads(4) == 2
+    assert batch_process.worker_threads(16) == 1
+
+
+def test_limit_threads(monkeypatch):
+    torch = pytest.importorskip('torch')
+    for name in batch_process.THREAD_ENV_VARS:
+        monkeypatch.delenv(name, raising=False)  # Wird nach dem Test wiederhergestellt
+    previous = torch.get_num_threads(), cv2.getNumThreads()
+    try:
+        batch_process.limit_threads(1)
+        assert os.environ['OMP_NUM_THREADS'] == '1'
+        assert torch.get_num_threads() == 1 and cv2.getNumThreads() == 1
+    finally:
+        torch.set_num_threads(previous[0])
+        cv2.setNumThreads(previous[1])
+
+
+def test_workers_do_not_import_app():
+    pytest.importorskip('supervision')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, batch_process, visualizer; sys.exit('app' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], cwd=root, env=dict(os.environ)).returncode == 0
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+pytest.importorskip('psutil')
+
+import benchmark
+
+
+def test_percentiles_nearest_rank():
+    values = [i / 1000 for i in range(1, 101)]  # 1..100 ms
+    result = benchmark.percentiles(values)
+    assert result['count'] == 100
+    assert (result['p50_ms'], result['p95_ms'], result['p99_ms']) == (50.0, 95.0, 99.0)
+    assert result['mean_ms'] == 50.5
+    assert benchmark.percentiles([])['p95_ms'] is None
+
+
+def test_synthetic_frames_are_deterministic():
+    first = benchmark.synthetic_frames(count=3, size=(72, 128), seed=1)
+    second = benchmark.synthetic_frames(count=3, size=(72, 128), seed=1)
+    assert len(first) == 3 and first[0].shape == (72, 128, 3)
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+
+
+def test_replay_source_loops_and_copies():
+    frames = [np.full((2, 2, 3), i, dtype=np.uint8) for i in range(2)]
+    source = benchmark.ReplaySource(frames, fps=0)
+    values = [int(source.read_frame()[1][0, 0, 0]) for _ in range(3)]
+    assert values == [0, 1, 0]
+    success, frame = source.read_frame()
+    frame[:] = 255
+    assert frames[1][0, 0, 0] == 1  # Annotation darf die Vorlage nicht verändern
+
+
+def run(fps, p95, batch=1):
+    return {'config': {'backend': 'onnx', 'width': 640, 'batch': batch, 'clients': 1},
+            'fps': fps, 'stages': {'end_to_end': {'p95_ms': p95}}}
+
+
+def test_compare_runs_reports_regressions(tmp_path):
+    previous = tmp_path / 'vorher.json'
+    previous.write_text(json.dumps({'runs': [run(30.0, 40.0)]}), encoding='utf-8')
+
+    assert benchmark.compare_runs([run(29.0, 42.0)], str(previous), tolerance=0.1) == []
+    assert benchmark.compare_runs([run(20.0, 40.0)], str(previous), tolerance=0.1) == ['onnx|w640|b1|c1']
+    assert benchmark.compare_runs([run(30.0, 60.0)], str(previous), tolerance=0.1) == ['onnx|w640|b1|c1']
+    # Konfigurationen ohne Vergleichswert zählen nicht
+    assert benchmark.compare_runs([run(1.0, 999.0, batch=4)], str(previous), tolerance=0.1) == []
+
+
+def test_parse_args_matrix():
+    args = benchmark.parse_args(['pipeline', '--backend', 'pytorch', 'onnx', '--clients', '1', '5'])
+    assert args.backend == ['pytorch', 'onnx'] and args.clients == [1, 5]
+    assert args.width == [640] and args.batch == [1] and args.source == 'synthetic'
@@ -0,0 +1,87 @@
+import time
+from functools import reduce
+
+import pytest
+
+from gps import GpsReader, parse_nmea
+
+
+def sentence(body):
+    """NMEA-Satz mit korrekter Prüfsumme"""
+    checksum = reduce(lambda value, char: value ^ ord(char), body, 0)
+    return f"${body}*{checksum:02X}"
+
+
+GGA = sentence('GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,')
+RMC = sentence('GPRMC,123520,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W')
+
+
+def test_parse_gga():
+    fix = parse_nmea(GGA)
+    assert fix['latitude'] == pytest.approx(48.1173)
+    assert fix['longitude'] == pytest.approx(11.516667)
+    assert fix['satellites'] == 8
+    assert fix['altitude'] == 545.4
+    assert fix['nmea_time'] == 12 * 3600 + 35 * 60 + 19
+
+
+def test_parse_rmc_converts_knots():
+    fix = parse_nmea(RMC)
+    assert fix['speed_kmh'] == pytest.approx(22.4 * 1.852)
+    assert fix['course'] == 84.4
+
+
+def test_southern_and_western_hemisphere():
+    fix = parse_nmea(sentence('GPGGA,000000,3351.000,S,15112.000,W,1,05,1.0,10.0,M,,M,,'))
+    assert fix['latitude'] == pytest.approx(-33.85)
+    assert fix['longitude'] == pytest.approx(-151.2)
+
+
+@pytest.mark.parametrize('line', [
+    sentence('GPGGA,123519,4807.038,N,01131.000,E,0,00,,,M,,M,,'),  # kein Fix
+    sentence('GPRMC,123520,V,4807.038,N,01131.000,E,,,230394,,'),     # ungültig
+    GGA[:-2] + '00',                                                   # falsche Prüfsumme
+    sentence('GPGSV,3,1,11,03,03,111,00'),                             # anderer Satz
+    sentence('GPGGA,123519,abc,N,01131.000,E,1,08,0.9,545.4,M,,M,,'),  # kaputte Zahl
+    'kein nmea'
+])
+def test_invalid_sentences_are_ignored(line):
+    assert parse_nmea(line) is None
+
+
+def test_reader_replays_file_and_merges_sentences(tmp_path):
+    path = tmp_path / 'fahrt.nmea'
+    path.write_text('\n'.join([GGA, 'Rauschen', RMC]) + '\n', encoding='ascii')
+    reader = GpsReader(f'file:{path}', realtime=False)
+    reader.start()
+    try:
+        deadline = time.monotonic() + 2.0
+        while reader.fixes < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        fix = reader.latest(max_age=5)
+    finally:
+        reader.stop()
+    # GGA liefert Höhe, RMC Geschwindigkeit - der Fix enthält beides
+    assert fix['altitude'] == 545.4
+    assert fix['speed_kmh'] == pytest.approx(41.48, abs=0.01)
+
+
+def test_stale_fix_is_dropped():
+    reader = GpsReader('fixed:1,2')
+    reader._update({'latitude': 1.0, 'longitude': 2.0})
+    reader._fix['received_at'] -= 10
+    assert reader.latest() is not None
+    assert reader.latest(max_age=5) is None
+
+
+def test_reader_backs_off_on_missing_source(tmp_path):
+    reader = GpsReader(f'file:{tmp_path / "fehlt.nmea"}')
+    reader.start()
+    try:
+        deadline = time.monotonic() + 2.0
+        while reader.errors == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        reader.stop()
+    assert reader.errors == 1
+    assert reader.latest() is None
@@ -0,0 +1,68 @@
+import logging
+
+from metrics import Histogram, MetricsRegistry, gauge, start_queue_logging
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency_seconds', 'Latenz', buckets=(0.1, 1.0), labelnames=('stage',))
+    histogram.observe(0.05, 'yolo')
+    histogram.observe(0.1, 'yolo')   # Grenzwert zählt zum Bucket (le)
+    histogram.observe(0.5, 'yolo')
+    histogram.observe(5.0, 'yolo')   # Nur in +Inf
+
+    lines = histogram.render()
+    assert lines[:2] == ['# HELP latency_seconds Latenz', '# TYPE latency_seconds histogram']
+    assert 'latency_seconds_bucket{stage="yolo",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{stage="yolo",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{stage="yolo",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{stage="yolo"} 5.65' in lines
+    assert 'latency_seconds_count{stage="yolo"} 4' in lines
+
+
+def test_histogram_without_observations_renders_header_only():
+    assert len(Histogram('x', 'X').render()) == 2
+
+
+def test_registry_renders_prefixed_gauges_and_escapes_labels():
+    registry = MetricsRegistry()
+    registry.histogram('db_write_seconds', 'DB').observe(0.002)
+    registry.add_collector(lambda: [gauge('clients', 'Clients', [({'profile': 'a"b'}, 3), ({}, None)])])
+
+    text = registry.render()
+    assert text.endswith('\n')
+    assert 'pothole_db_write_seconds_count 1' in text
+    assert '# TYPE pothole_clients gauge' in text
+    assert 'pothole_clients{profile="a\\"b"} 3.0' in text
+    assert 'pothole_clients NaN' in text
+
+
+def test_failing_collector_does_not_break_render():
+    registry = MetricsRegistry()
+
+    def broken():
+        raise RuntimeError('kaputt')
+
+    registry.add_collector(broken)
+    registry.add_collector(lambda: [gauge('ok', 'OK', [({}, 1)], kind='counter')])
+    text = registry.render()
+    assert '# Collector-Fehler: kaputt' in text
+    assert '# TYPE pothole_ok counter' in text
+
+
+def test_queue_logging_writes_in_listener_thread():
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(record.getMessage())
+
+    logger = logging.getLogger('test_queue_logging')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = start_queue_logging(logger, [Collect()])
+    try:
+        logger.info('Hallo %s', 'Welt')
+    finally:
+        listener.stop()  # Leert die Queue
+        logger.handlers.clear()
+    assert records == ['Hallo Welt']
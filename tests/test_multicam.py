@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('cv2')  # multicam -> sources
+
+from multicam import BatchInferenceEngine, MultiCameraManager
+from pipeline import FrameBroadcaster, TooManyClientsError
+
+
+def run_parallel(engine, frames):
+    results = [None] * len(frames)
+
+    def worker(i):
+        results[i] = engine.infer(frames[i], timeout=5.0)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(frames))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5.0)
+    return results
+
+
+def test_engine_batches_frames_of_several_cameras():
+    batch_sizes = []
+
+    def infer_batch(frames):
+        batch_sizes.append(len(frames))
+        return [frame * 10 for frame in frames]
+
+    # Großes Wartefenster: alle vier Frames landen im selben Batch
+    engine = BatchInferenceEngine(infer_batch, max_batch_size=4, max_wait=1.0)
+    engine.start()
+    try:
+        assert run_parallel(engine, [1, 2, 3, 4]) == [10, 20, 30, 40]
+    finally:
+        engine.stop()
+    assert batch_sizes == [4]
+    assert engine.get_stats()['avg_batch_size'] == 4
+
+
+def test_engine_respects_max_batch_size():
+    batch_sizes = []
+
+    def infer_batch(frames):
+        batch_sizes.append(len(frames))
+        return frames
+
+    engine = BatchInferenceEngine(infer_batch, max_batch_size=2, max_wait=0.2)
+    engine.start()
+    try:
+        assert run_parallel(engine, list(range(5))) == list(range(5))
+    finally:
+        engine.stop()
+    assert max(batch_sizes) <= 2
+    assert sum(batch_sizes) == 5
+
+
+def test_engine_propagates_model_errors_to_every_caller():
+    def infer_batch(frames):
+        raise RuntimeError("Modell kaputt")
+
+    engine = BatchInferenceEngine(infer_batch, max_wait=0.0)
+    engine.start()
+    try:
+        with pytest.raises(RuntimeError, match="Modell kaputt"):
+            engine.infer('frame', timeout=5.0)
+    finally:
+        engine.stop()
+    assert engine.get_stats()['errors'] == 1
+
+
+def test_stopped_engine_releases_waiting_callers():
+    engine = BatchInferenceEngine(lambda frames: frames)
+    # Nicht gestartet: die Anfrage bleibt liegen, bis stop() sie beendet
+    errors = []
+
+    def worker():
+        try:
+            engine.infer('frame', timeout=5.0)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    while engine.get_stats()['pending'] == 0:
+        time.sleep(0.01)
+    engine.stop()
+    thread.join(2.0)
+    assert len(errors) == 1
+
+
+def test_detect_batch_groups_frames_by_shape():
+    np = pytest.importorskip('numpy')
+    pytest.importorskip('supervision')
+    from visualizer import PyResearchVisualizer
+
+    calls = []
+
+    def infer(frames, max_batch=1):
+        calls.append((len(frames), frames[0].shape))
+        return [frame.shape for frame in frames]
+
+    # Ohne __init__ - kein Modell nötig
+    visualizer = PyResearchVisualizer.__new__(PyResearchVisualizer)
+    visualizer._infer = infer
+    small, large = np.zeros((4, 4, 3), np.uint8), np.zeros((8, 8, 3), np.uint8)
+
+    results = visualizer.detect_batch([small, large, small, small], max_batch=2)
+
+    assert results == [small.shape, large.shape, small.shape, small.shape]
+    assert sorted(calls) == [(1, small.shape), (1, large.shape), (2, small.shape)]
+
+
+# ---------- MultiCameraManager ----------
+
+class FakeStream:
+    """Nur der Broadcaster - ohne Quelle und Pipeline-Threads"""
+
+    def __init__(self):
+        self.pipeline = self
+        self.broadcaster = FrameBroadcaster(max_clients=0)
+
+
+def make_manager(cameras=2, max_clients=3):
+    manager = MultiCameraManager(lambda frames: frames, None, None, None, max_clients=max_clients)
+    manager.streams = {camera_id: FakeStream() for camera_id in range(cameras)}
+    return manager
+
+
+def test_multicam_client_limit_counts_all_cameras():
+    manager = make_manager(cameras=2, max_clients=3)
+    clients = [manager.subscribe(0), manager.subscribe(1), manager.subscribe(1)]
+    with pytest.raises(TooManyClientsError):
+        manager.subscribe(0)
+    clients[0].close()
+    assert manager.subscribe(0) is not None  # Platz wieder frei
+    assert manager._client_count() == 3
+
+
+def test_multicam_unknown_camera():
+    assert make_manager().subscribe(7) is None
+
+
+def test_multicam_client_limit_holds_under_concurrent_subscribe():
+    manager = make_manager(cameras=2, max_clients=3)
+    accepted, rejected = [], []
+    barrier = threading.Barrier(20)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            accepted.append(manager.subscribe(i % 2))
+        except TooManyClientsError:
+            rejected.append(i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5.0)
+    assert len(accepted) == 3 and len(rejected) == 17
+    assert manager._client_count() == 3
@@ -0,0 +1,223 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import FrameBroadcaster, FramePipeline, LatestFrameQueue, SharedResource, TooManyClientsError
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+# ---------- LatestFrameQueue ----------
+
+def test_latest_frame_queue_drops_oldest():
+    queue = LatestFrameQueue(maxsize=2)
+    for i in range(5):
+        queue.put(i)
+    assert queue.qsize() == 2
+    assert queue.dropped == 3
+    assert queue.get(timeout=0) == 3
+    assert queue.get(timeout=0) == 4
+
+
+def test_latest_frame_queue_get_times_out():
+    queue = LatestFrameQueue()
+    start = time.monotonic()
+    assert queue.get(timeout=0.05) is None
+    assert time.monotonic() - start >= 0.04
+
+
+def test_latest_frame_queue_wakes_waiting_consumer():
+    queue = LatestFrameQueue()
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(queue.get(timeout=2.0)))
+    consumer.start()
+    queue.put('frame')
+    consumer.join(2.0)
+    assert result == ['frame']
+
+
+# ---------- FramePipeline ----------
+
+def test_pipeline_runs_all_stages():
+    frames = iter(range(1000))
+    pipeline = FramePipeline(
+        read_frame=lambda: (True, next(frames)),
+        process_frame=lambda frame: frame * 2,
+        encode_frame=lambda frame: str(frame).encode()
+    )
+    subscriber = pipeline.broadcaster.subscribe()
+    pipeline.start()
+    try:
+        item = subscriber.next_frame(timeout=2.0)
+        assert item is not None
+        assert int(item[1]) % 2 == 0
+        assert wait_until(lambda: pipeline.stats['end_to_end'].count > 0)
+    finally:
+        pipeline.stop()
+    assert not pipeline.running
+
+
+def test_pipeline_start_is_idempotent():
+    pipeline = FramePipeline(lambda: (False, None), lambda f: f, lambda f: b'', error_interval=0.01)
+    pipeline.start()
+    threads = list(pipeline._threads)
+    pipeline.start()
+    try:
+        assert pipeline._threads == threads
+    finally:
+        pipeline.stop()
+
+
+def test_pipeline_shows_error_frame_without_inference():
+    processed = []
+    pipeline = FramePipeline(
+        read_frame=lambda: (False, 'fehlerbild'),
+        process_frame=lambda frame: processed.append(frame) or frame,
+        encode_frame=lambda frame: frame.encode(),
+        error_interval=0.01
+    )
+    subscriber = pipeline.broadcaster.subscribe()
+    pipeline.start()
+    try:
+        assert subscriber.next_frame(timeout=2.0)[1] == b'fehlerbild'
+    finally:
+        pipeline.stop()
+    assert processed == []
+    assert pipeline.stats['capture'].errors > 0
+
+
+def test_pipeline_survives_processing_errors():
+    def fail(frame):
+        raise RuntimeError("kaputt")
+
+    pipeline = FramePipeline(lambda: (True, 'frame'), fail, lambda frame: frame.encode())
+    subscriber = pipeline.broadcaster.subscribe()
+    pipeline.start()
+    try:
+        # Unverarbeiteter Frame wird trotzdem ausgeliefert
+        assert subscriber.next_frame(timeout=2.0)[1] == b'frame'
+        assert wait_until(lambda: pipeline.stats['inference'].errors > 0)
+    finally:
+        pipeline.stop()
+
+
+# ---------- FrameBroadcaster ----------
+
+def test_broadcaster_delivers_same_bytes_to_all_clients():
+    broadcaster = FrameBroadcaster(max_clients=3)
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+    payload = b'jpeg'
+    broadcaster.publish(payload)
+    assert first.next_frame(timeout=0)[1] is payload
+    assert second.next_frame(timeout=0)[1] is payload
+
+
+def test_broadcaster_rejects_clients_over_limit():
+    broadcaster = FrameBroadcaster(max_clients=1)
+    subscriber = broadcaster.subscribe()
+    with pytest.raises(TooManyClientsError):
+        broadcaster.subscribe()
+    subscriber.close()
+    broadcaster.subscribe().close()
+    assert broadcaster.client_count() == 0
+
+
+def test_new_subscriber_gets_latest_frame():
+    broadcaster = FrameBroadcaster()
+    broadcaster.publish(b'eins')
+    broadcaster.publish(b'zwei')
+    with broadcaster.subscribe() as subscriber:
+        assert subscriber.next_frame(timeout=0) == (2, b'zwei')
+
+
+def test_slow_subscriber_skips_frames_without_blocking():
+    broadcaster = FrameBroadcaster(buffer_size=2)
+    subscriber = broadcaster.subscribe()
+    for i in range(10):
+        broadcaster.publish(str(i).encode())
+    assert subscriber.skipped == 8
+    assert subscriber.next_frame(timeout=0)[1] == b'8'
+    assert subscriber.next_frame(timeout=0)[1] == b'9'
+    assert subscriber.next_frame(timeout=0) is None
+
+
+def test_close_wakes_waiting_subscriber():
+    broadcaster = FrameBroadcaster()
+    subscriber = broadcaster.subscribe()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(subscriber.next_frame(timeout=5.0)))
+    waiter.start()
+    subscriber.close()
+    waiter.join(1.0)
+    assert not waiter.is_alive()
+    assert result == [None]
+    assert broadcaster.client_count() == 0
+
+
+# ---------- SharedResource ----------
+
+def make_resource(idle_timeout):
+    calls = []
+    resource = SharedResource(lambda: calls.append('open'), lambda: calls.append('close'), idle_timeout)
+    return resource, calls
+
+
+def test_shared_resource_opens_once_and_closes_after_idle_timeout():
+    resource, calls = make_resource(idle_timeout=0.05)
+    resource.acquire()
+    resource.acquire()
+    assert calls == ['open'] and resource.users == 2
+    resource.release()
+    resource.release()
+    assert resource.active  # Noch im Leerlauf-Fenster
+    assert wait_until(lambda: not resource.active)
+    assert calls == ['open', 'close']
+
+
+def test_shared_resource_reacquire_keeps_it_open():
+    resource, calls = make_resource(idle_timeout=0.05)
+    resource.acquire()
+    resource.release()
+    resource.acquire()  # Neuer Nutzer im Leerlauf-Fenster
+    time.sleep(0.1)
+    assert resource.active and calls == ['open']
+    resource.close_now()
+
+
+def test_shared_resource_ignores_stale_timer():
+    resource, calls = make_resource(idle_timeout=60)
+    resource.acquire()
+    resource.release()
+    stale = resource._timer
+    resource.acquire()  # cancel() kommt zu spät, wenn stale schon auf den Lock wartet
+    resource.release()  # Neuer Leerlauf-Timer
+    resource._expire(stale)
+    assert resource.active and calls == ['open']
+    resource._expire(resource._timer)
+    assert not resource.active and calls == ['open', 'close']
+
+
+def test_shared_resource_without_idle_timeout_stays_open():
+    resource, calls = make_resource(idle_timeout=0)
+    resource.acquire()
+    resource.release()
+    time.sleep(0.05)
+    assert resource.active and not resource.get_stats()['closing']
+    resource.close_now()
+    resource.close_now()
+    assert calls == ['open', 'close']
+    assert resource.get_stats()['closed'] == 1
+
+
+def test_shared_resource_release_without_users_is_harmless():
+    resource, calls = make_resource(idle_timeout=0.01)
+    resource.release()
+    assert resource.users == 0 and calls == []
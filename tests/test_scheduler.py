@@ -0,0 +1,105 @@
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from scheduler import InferenceScheduler, measure_cpu
+
+
+def frame(value=0, shape=(72, 128)):
+    return np.full(shape + (3,), value, dtype=np.uint8)
+
+
+def test_first_frame_always_runs_inference():
+    scheduler = InferenceScheduler()
+    assert scheduler.should_infer(frame())
+
+
+def test_static_scene_is_skipped_until_max_interval():
+    scheduler = InferenceScheduler(cpu_budget=0, min_interval=1, max_interval=5, motion_threshold=0.02)
+    scheduler.record(frame(), detections='letzte', cpu_seconds=0.01)
+    decisions = [scheduler.should_infer(frame()) for _ in range(5)]
+    assert decisions == [False, False, False, False, True]
+
+
+def test_motion_triggers_inference():
+    scheduler = InferenceScheduler(cpu_budget=0, max_interval=30, motion_threshold=0.02)
+    scheduler.record(frame(0), detections='letzte', cpu_seconds=0.01)
+    assert not scheduler.should_infer(frame(0))
+    assert scheduler.should_infer(frame(200))
+    assert scheduler.last_motion > 0.5
+
+
+def test_frame_skipping_respects_interval():
+    scheduler = InferenceScheduler(cpu_budget=0, min_interval=3, motion_threshold=0)
+    scheduler.record(frame(), detections='letzte', cpu_seconds=0.01)
+    assert [scheduler.should_infer(frame()) for _ in range(3)] == [False, False, True]
+
+
+def test_cpu_budget_widens_and_narrows_interval():
+    # window=0: jede Inferenz schließt ein Messfenster ab
+    scheduler = InferenceScheduler(cpu_budget=0.5, min_interval=1, max_interval=4, window=0.0)
+
+    # Mehr CPU-Zeit als Wall-Time (mehrere Intra-Op-Threads) -> über dem Budget, seltener rechnen
+    time.sleep(0.01)
+    scheduler.record(frame(), None, cpu_seconds=1.0)
+    assert scheduler.interval == 2
+    assert scheduler.cpu_usage > 1.0
+
+    # Weit unter dem Budget -> wieder häufiger
+    time.sleep(0.01)
+    scheduler.record(frame(), None, cpu_seconds=0.0)
+    assert scheduler.interval == 1
+
+
+@pytest.mark.skipif((os.cpu_count() or 1) < 2, reason="braucht mindestens zwei CPU-Kerne")
+def test_measure_cpu_counts_all_threads():
+    def parallel_work():
+        # hashlib gibt den GIL frei - die Threads rechnen wirklich parallel
+        data = b'x' * (1 << 20)
+        threads = [threading.Thread(target=lambda: [hashlib.sha256(data) for _ in range(200)]) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return 'fertig'
+
+    start = time.perf_counter()
+    result, cpu_seconds = measure_cpu(parallel_work)
+    wall_seconds = time.perf_counter() - start
+    assert result == 'fertig'
+    assert cpu_seconds > wall_seconds * 1.3
+
+
+def test_measure_cpu_ignores_idle_time():
+    _, cpu_seconds = measure_cpu(time.sleep, 0.05)
+    assert cpu_seconds < 0.03
+
+
+def test_reset_forces_next_inference():
+    scheduler = InferenceScheduler(cpu_budget=0, max_interval=30)
+    scheduler.record(frame(), detections='letzte', cpu_seconds=0.01)
+    scheduler.reset()
+    assert scheduler.should_infer(frame())
+
+
+def test_carry_forward_shifts_boxes_with_camera_motion():
+    sv = pytest.importorskip('supervision')
+    scheduler = InferenceScheduler(cpu_budget=0, probe_size=(64, 64))
+    rng = np.random.default_rng(0)
+    texture = (rng.random((256, 256)) * 255).astype(np.uint8)
+    reference = np.dstack([texture] * 3)
+    detections = sv.Detections(xyxy=np.array([[100, 100, 140, 140]], dtype=np.float32))
+    scheduler.record(reference, detections, cpu_seconds=0.01)
+
+    shifted = np.roll(reference, 16, axis=1)  # Bild 16 px nach rechts
+    moved = scheduler.carry_forward(shifted)
+
+    assert moved.xyxy[0, 0] == pytest.approx(116, abs=4)
+    assert moved.xyxy[0, 1] == pytest.approx(100, abs=4)
+    assert scheduler.skipped == 1
@@ -0,0 +1,154 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+from sources import (EndOfStream, FileSource, ImageSequenceSource, ReconnectingSource, VideoSource,
+                     create_source, parse_source)
+
+
+class FakeSource(VideoSource):
+    """Quelle mit vorgegebenen Ergebnissen: True = Bild, False = Lesefehler, 'end' = EndOfStream"""
+
+    def __init__(self, reads=(), open_results=()):
+        super().__init__('fake')
+        self.reads = list(reads)
+        self.open_results = list(open_results)
+        self.is_open = False
+        self.opens = 0
+
+    @property
+    def opened(self):
+        return self.is_open
+
+    def open(self):
+        self.opens += 1
+        self.is_open = self.open_results.pop(0) if self.open_results else True
+        return self.is_open
+
+    def read(self):
+        result = self.reads.pop(0) if self.reads else False
+        if result == 'end':
+            raise EndOfStream(self.spec)
+        return (True, np.zeros((2, 2, 3), dtype=np.uint8)) if result else (False, None)
+
+    def release(self):
+        self.is_open = False
+
+
+def make_video(path, frames=3):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 30.0, (32, 24))
+    if not writer.isOpened():
+        pytest.skip("Kein Video-Encoder verfügbar")
+    for i in range(frames):
+        writer.write(np.full((24, 32, 3), i * 60, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+# ---------- Quellen ----------
+
+def test_create_source_picks_source_type(tmp_path):
+    assert parse_source(' 1 ') == 1
+    assert type(create_source('rtsp://kamera/stream')).__name__ == 'StreamSource'
+    assert isinstance(create_source(str(tmp_path)), ImageSequenceSource)
+    assert isinstance(create_source('fahrt.mp4', loop=False), FileSource)
+    with pytest.raises(ValueError):
+        create_source('bild.jpg')
+
+
+def test_file_source_loops(tmp_path):
+    source = FileSource(make_video(tmp_path / 'fahrt.avi'), realtime=False, loop=True)
+    assert source.open()
+    assert all(source.read()[0] for _ in range(7))
+    source.release()
+
+
+def test_file_source_without_loop_ends(tmp_path):
+    source = FileSource(make_video(tmp_path / 'fahrt.avi'), realtime=False, loop=False)
+    assert source.open()
+    assert [source.read()[0] for _ in range(3)] == [True, True, True]
+    with pytest.raises(EndOfStream):
+        source.read()
+    assert not source.opened
+
+
+def test_image_sequence_skips_unreadable_images_and_ends(tmp_path):
+    for name in ('a.jpg', 'c.jpg'):
+        cv2.imwrite(str(tmp_path / name), np.zeros((8, 8, 3), dtype=np.uint8))
+    (tmp_path / 'b.jpg').write_bytes(b'kein Bild')
+    (tmp_path / 'notizen.txt').write_text('ignoriert')
+
+    source = ImageSequenceSource(str(tmp_path), fps=10.0, realtime=False, loop=False)
+    assert source.open() and len(source.files) == 3
+    assert source.read()[0] and source.read()[0]  # a.jpg, dann c.jpg statt b.jpg
+    assert source.info()['position'] == 3
+    with pytest.raises(EndOfStream):
+        source.read()
+
+
+def test_image_sequence_loops_with_virtual_clock(tmp_path):
+    cv2.imwrite(str(tmp_path / 'a.png'), np.zeros((8, 8, 3), dtype=np.uint8))
+    cv2.imwrite(str(tmp_path / 'b.png'), np.zeros((8, 8, 3), dtype=np.uint8))
+    source = ImageSequenceSource(str(tmp_path / '*.png'), fps=4.0, realtime=False, loop=True)
+    source.open()
+    source.read(), source.read()
+    assert source.clock.time == 0.25
+    source.read()
+    assert source.clock.time == 0.0  # Von vorn
+
+
+def test_video_source_requires_the_interface():
+    class Incomplete(VideoSource):
+        def open(self):
+            return True
+
+    with pytest.raises(TypeError):
+        Incomplete('kaputt')
+
+
+# ---------- ReconnectingSource ----------
+
+def test_reconnect_backs_off_while_open_fails():
+    source = ReconnectingSource(FakeSource(open_results=[False, False, True], reads=[True]),
+                                min_backoff=0.0, max_backoff=1.0)
+    assert source.read() == (False, None)
+    assert source.state == 'waiting' and source.failures == 1
+    source.read()
+    assert source.failures == 2
+    assert source.read()[0]
+    assert source.state == 'open' and source.reconnects == 1
+
+
+def test_backoff_grows_until_first_frame():
+    fake = FakeSource(reads=[False, False, True])
+    source = ReconnectingSource(fake, min_backoff=0.01, max_backoff=1.0)
+    # Öffnen klappt, aber kein Bild - darf den Backoff nicht zurücksetzen
+    for expected in (0.02, 0.04):
+        source._next_attempt = 0.0
+        assert source.read() == (False, None)
+        assert source.state == 'waiting' and source._backoff == expected
+    source._next_attempt = 0.0
+    assert source.read()[0]
+    assert source._backoff == 0.01  # Erst das erste Bild setzt zurück
+    assert fake.opens == 3
+
+
+def test_lost_connection_retries_immediately():
+    fake = FakeSource(reads=[True, False, True])
+    source = ReconnectingSource(fake, min_backoff=10.0)
+    assert source.read()[0]
+    assert source.read() == (False, None)
+    assert source.state == 'lost' and source.failures == 0
+    assert source.read()[0]  # Kein Warten auf den Backoff
+    assert source.reconnects == 1 and fake.opens == 2
+
+
+def test_end_of_stream_is_final():
+    fake = FakeSource(reads=[True, 'end'])
+    source = ReconnectingSource(fake, min_backoff=0.0)
+    assert source.read()[0]
+    assert source.read() == (False, None)
+    assert source.state == 'ended' and not fake.opened
+    assert source.read() == (False, None)
+    assert fake.opens == 1 and source.get_stats()['state'] == 'ended'
@@ -0,0 +1,241 @@
+import csv
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from storage import BatchedDetectionWriter, DetectionStore, SpatialHash, parse_bbox, parse_time, parse_time_range
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DetectionStore(str(tmp_path / 'detections.db'))
+
+
+def test_add_and_read_detections_in_time_order(store):
+    store.add_detection(48.1, 11.5, 80, 1, timestamp='2025-03-02 10:00:00')
+    store.add_detection(48.2, 11.6, 70, 2, timestamp='2025-03-01 10:00:00')
+    detections = store.get_detections()
+    assert [d['timestamp'] for d in detections] == ['2025-03-01 10:00:00', '2025-03-02 10:00:00']
+    assert detections[0] == {'timestamp': '2025-03-01 10:00:00', 'latitude': 48.2, 'longitude': 11.6,
+                             'confidence': 70.0, 'pothole_count': 2}
+    assert store.count() == 2
+
+
+def test_csv_is_imported_only_once(tmp_path, store):
+    path = tmp_path / 'detections.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'latitude', 'longitude', 'confidence', 'pothole_count'])
+        writer.writerow(['2025-03-01 10:00:00', '48.1', '11.5', '80', '1'])
+        writer.writerow(['2025-03-01 10:00:01', 'kaputt', '11.5', '80', '1'])
+        writer.writerow(['2025-03-01 10:00:02', '48.2', '11.6', '', ''])
+    assert store.import_csv(str(path)) == 2
+    assert store.import_csv(str(path)) == 0
+    assert store.count() == 2
+
+
+def test_csv_import_normalizes_and_skips_bad_timestamps(tmp_path, store):
+    path = tmp_path / 'detections.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'latitude', 'longitude', 'confidence', 'pothole_count'])
+        writer.writerow(['2025-03-01T10:00', '48.1', '11.5', '80', '1'])
+        writer.writerow(['01.03.2025 10:00', '48.2', '11.6', '80', '1'])
+        writer.writerow(['2025-02-30 10:00:00', '48.3', '11.7', '80', '1'])
+        writer.writerow(['', '48.4', '11.8', '80', '1'])
+    assert store.import_csv(str(path)) == 1
+    assert [d['timestamp'] for d in store.get_detections()] == ['2025-03-01 10:00:00']
+
+
+def test_iter_csv_streams_header_and_rows(store):
+    for i in range(5):
+        store.add_detection(48.0 + i, 11.0, 50, 1, timestamp=f'2025-03-0{i + 1} 10:00:00')
+    chunks = list(store.iter_csv(batch_size=2))
+    assert len(chunks) > 1
+    rows = list(csv.reader(''.join(chunks).splitlines()))
+    assert rows[0] == ['timestamp', 'latitude', 'longitude', 'confidence', 'pothole_count']
+    assert len(rows) == 6
+
+
+def test_concurrent_writers(store):
+    def writer(offset):
+        for i in range(20):
+            store.add_detection(40.0 + offset, 10.0 + i * 0.01, 50)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.count() == 80
+
+
+# ---------- Ausschnitt, Zeitraum, Cluster ----------
+
+@pytest.fixture
+def city(store):
+    # Zwei Orte weit auseinander, je drei Meldungen an verschiedenen Tagen
+    for day in (1, 2, 3):
+        store.add_detection(51.10, 10.10, 60 + day, 1, timestamp=f'2025-11-0{day} 12:00:00')
+        store.add_detection(48.10, 11.50, 70 + day, 2, timestamp=f'2025-11-0{day} 13:00:00')
+    return store
+
+
+def test_parse_bbox():
+    assert parse_bbox(None) is None
+    assert parse_bbox('10.2,51.3,9.9,51.0') == (9.9, 51.0, 10.2, 51.3)
+    assert parse_bbox('-200,-100,200,100') == (-180.0, -90.0, 180.0, 90.0)
+    for value in ('1,2,3', 'a,b,c,d', '1,2,3,nan'):
+        with pytest.raises(ValueError):
+            parse_bbox(value)
+
+
+def test_query_by_bbox(city):
+    assert city.has_rtree
+    detections = city.query_detections(bbox=(9.9, 51.0, 10.2, 51.3))
+    assert len(detections) == 3
+    assert all(d['latitude'] == 51.10 for d in detections)
+
+
+def test_query_without_rtree_gives_same_result(city):
+    city.has_rtree = False
+    assert len(city.query_detections(bbox=(9.9, 51.0, 10.2, 51.3))) == 3
+
+
+def test_until_date_includes_whole_day(city):
+    since, until = parse_time_range('2025-11-02', '2025-11-02')
+    detections = city.query_detections(since=since, until=until)
+    assert [d['timestamp'] for d in detections] == ['2025-11-02 12:00:00', '2025-11-02 13:00:00']
+
+
+def test_limit_returns_newest_in_time_order(city):
+    detections = city.query_detections(limit=2)
+    assert [d['timestamp'] for d in detections] == ['2025-11-03 12:00:00', '2025-11-03 13:00:00']
+
+
+def test_summarize_and_cluster(city):
+    summary = city.summarize(bbox=(11.0, 48.0, 12.0, 49.0))
+    assert summary == {'count': 3, 'avg_confidence': 72.0, 'pothole_count': 6,
+                       'first_seen': '2025-11-01 13:00:00', 'last_seen': '2025-11-03 13:00:00'}
+    clusters = city.cluster_detections(1.0)
+    assert sorted(c['count'] for c in clusters) == [3, 3]
+    assert sum(c['pothole_count'] for c in clusters) == 9
+
+
+# ---------- Schlaglöcher (dedupliziert) ----------
+
+def test_spatial_hash_finds_nearest_within_radius():
+    index = SpatialHash(radius_m=10)
+    index.insert(1, 48.0, 11.0)
+    index.insert(2, 48.0, 11.0001)  # ca. 7 m östlich
+    assert index.nearest(48.0, 11.00008)[0] == 2
+    assert index.nearest(48.001, 11.0) == (None, None)  # ca. 111 m
+    index.move(2, 49.0, 11.0)
+    assert index.nearest(48.0, 11.00008)[0] == 1
+    index.remove(1)
+    assert len(index) == 1
+
+
+def test_nearby_reports_merge_into_one_pothole(store):
+    first = store.add_detection(48.0, 11.0, 60, 1, timestamp='2025-03-01 10:00:00')
+    second = store.add_detection(48.00002, 11.00002, 90, 3, timestamp='2025-03-02 10:00:00')
+    far = store.add_detection(48.01, 11.0, 50, 1, timestamp='2025-03-03 10:00:00')
+
+    assert first['new_pothole'] and not second['new_pothole'] and far['new_pothole']
+    assert second['pothole_id'] == first['pothole_id'] and second['hits'] == 2
+    assert store.count_potholes() == 2
+
+    pothole = next(p for p in store.query_potholes() if p['id'] == first['pothole_id'])
+    assert pothole['hits'] == 2
+    assert pothole['max_confidence'] == 90
+    assert pothole['pothole_count'] == 3
+    assert pothole['latitude'] == pytest.approx(48.00001)
+    assert (pothole['first_seen'], pothole['last_seen']) == ('2025-03-01 10:00:00', '2025-03-02 10:00:00')
+
+
+def test_potholes_survive_restart(tmp_path):
+    path = str(tmp_path / 'detections.db')
+    DetectionStore(path).add_detection(48.0, 11.0, 60)
+    reopened = DetectionStore(path)
+    assert reopened.count_potholes() == 1
+    assert not reopened.add_detection(48.00001, 11.0, 60)['new_pothole']
+
+
+def test_failed_insert_rolls_back_pothole_index(store, monkeypatch):
+    first = store.add_detection(48.0, 11.0, 60)
+    snap = store._snap
+
+    def failing_snap(*args):
+        snap(*args)
+        raise sqlite3.OperationalError('disk I/O error')
+
+    monkeypatch.setattr(store, '_snap', failing_snap)
+    for latitude, longitude in ((48.00001, 11.0), (52.0, 13.0)):  # Verschiebt bzw. legt neu an
+        with pytest.raises(sqlite3.OperationalError):
+            store.add_detection(latitude, longitude, 70)
+    monkeypatch.undo()
+
+    assert len(store.pothole_index) == store.count_potholes() == 1
+    assert store.pothole_index.nearest(48.0, 11.0) == (first['pothole_id'], 0.0)
+    assert store.add_detection(52.0, 13.0, 70)['new_pothole']
+    assert store.count_potholes() == 2
+
+
+def test_pothole_summary_and_clusters(store):
+    store.add_detection(48.0, 11.0, 60)
+    store.add_detection(48.0, 11.0, 80)
+    store.add_detection(52.0, 13.0, 70)
+    summary = store.summarize_potholes()
+    assert summary['count'] == 2 and summary['hits'] == 3
+    clusters = store.cluster_potholes(1.0)
+    assert sorted(c['hits'] for c in clusters) == [1, 2]
+
+
+# ---------- BatchedDetectionWriter ----------
+
+def test_writer_flushes_full_batches_in_background(store):
+    writer = BatchedDetectionWriter(store, batch_size=3, flush_interval=60)
+    writer.start()
+    try:
+        for i in range(3):
+            writer.submit(48.0 + i, 11.0, 80)
+        deadline = time.monotonic() + 2.0
+        while writer.written < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.get_stats()['batches'] == 1
+    finally:
+        writer.stop()
+    assert store.count() == 3
+
+
+def test_writer_stop_writes_pending_detections(store):
+    writer = BatchedDetectionWriter(store, batch_size=100, flush_interval=60)
+    writer.start()
+    writer.submit(48.0, 11.0, 80, timestamp='2025-03-01 10:00:00')
+    writer.stop()
+    assert store.get_detections()[0]['timestamp'] == '2025-03-01 10:00:00'
+
+
+# ---------- since/until ----------
+
+def test_parse_time_normalizes_formats():
+    assert parse_time('2025-03-01') == '2025-03-01 00:00:00'
+    assert parse_time('2025-03-01', end_of_day=True) == '2025-03-01 23:59:59'
+    assert parse_time('2025-03-01T08:30') == '2025-03-01 08:30:00'
+    assert parse_time(' 2025-03-01 08:30:15 ') == '2025-03-01 08:30:15'
+    assert parse_time('') is None and parse_time(None) is None
+
+
+@pytest.mark.parametrize('value', ['gestern', '2025-13-01', '2025-03-01 25:00', "2025-03-01' OR 1=1"])
+def test_parse_time_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_time(value)
+
+
+def test_parse_time_range():
+    assert parse_time_range('2025-03-01', '2025-03-01') == ('2025-03-01 00:00:00', '2025-03-01 23:59:59')
+    assert parse_time_range(None, '2025-03-31') == (None, '2025-03-31 23:59:59')
+    with pytest.raises(ValueError):
+        parse_time_range('2025-04-01', '2025-03-01')
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+from pipeline import TooManyClientsError
+from streaming import JpegEncoder, StreamHub, StreamProfile, parse_profile
+
+DEFAULT = StreamProfile.create(854, 70, 15)
+
+
+def frame(width=1280, height=720):
+    return np.zeros((height, width, 3), dtype=np.uint8)
+
+
+def test_profile_values_are_clamped_and_rounded():
+    assert StreamProfile.create(1000, 73, 60) == (992, 70, 30)
+    assert StreamProfile.create(10, 0, 0) == (160, 20, 1)
+    assert StreamProfile.create(640, 60, 10).key == '640w_q60_10fps'
+
+
+def test_parse_profile_presets_and_overrides():
+    assert parse_profile({}, DEFAULT) == DEFAULT
+    assert parse_profile({'profile': 'low'}, DEFAULT) == StreamProfile.create(480, 50, 8)
+    assert parse_profile({'profile': 'low', 'quality': '90'}, DEFAULT).quality == 90
+    with pytest.raises(ValueError):
+        parse_profile({'width': 'breit'}, DEFAULT)
+
+
+def test_adaptive_steps_reduce_quality_then_width():
+    requested = StreamProfile.create(1280, 90, 30)
+    assert [requested.step(level)[:2] for level in range(4)] == [(1280, 90), (1280, 75), (960, 65), (640, 55)]
+
+
+def test_encoder_never_upscales():
+    encoder = JpegEncoder(use_turbojpeg=False)
+    small = frame(320, 240)
+    assert encoder.resize(small, 640) is small
+    assert encoder.resize(frame(), 640).shape == (360, 640, 3)
+    data = encoder.encode(small, 80)
+    assert data[:2] == b'\xff\xd8'  # JPEG
+
+
+def test_hub_encodes_once_per_profile():
+    hub = StreamHub(DEFAULT, max_clients=5, encoder=JpegEncoder(use_turbojpeg=False))
+    low = StreamProfile.create(480, 50, 30)
+    first, second = hub.subscribe(low, adaptive=False), hub.subscribe(low, adaptive=False)
+    high = hub.subscribe(StreamProfile.create(1280, 90, 30), adaptive=False)
+
+    hub.publish(frame())
+
+    first_bytes, second_bytes = first.next_frame(timeout=0)[1], second.next_frame(timeout=0)[1]
+    assert first_bytes is second_bytes  # Dieselben Bytes, einmal kodiert
+    assert len(high.next_frame(timeout=0)[1]) != len(first_bytes)
+    stats = hub.get_stats()
+    assert stats['clients'] == 3
+    assert {key: value['frames'] for key, value in stats['profiles'].items()} == {
+        low.key: 1, StreamProfile.create(1280, 90, 30).key: 1
+    }
+
+
+def test_hub_without_clients_does_not_encode():
+    hub = StreamHub(DEFAULT, encoder=JpegEncoder(use_turbojpeg=False))
+    client = hub.subscribe(adaptive=False)
+    client.close()
+    hub.publish(frame())
+    assert hub.get_stats()['profiles'] == {}
+
+
+def test_profile_fps_limit():
+    hub = StreamHub(DEFAULT, encoder=JpegEncoder(use_turbojpeg=False))
+    client = hub.subscribe(StreamProfile.create(320, 50, 1), adaptive=False)
+    for _ in range(5):
+        hub.publish(frame(320, 240))
+    assert client._subscriber.received == 1
+
+
+def test_late_client_gets_latest_frame_immediately():
+    hub = StreamHub(DEFAULT, encoder=JpegEncoder(use_turbojpeg=False))
+    hub.publish(frame(320, 240))
+    client = hub.subscribe(StreamProfile.create(320, 50, 10), adaptive=False)
+    assert client.next_frame(timeout=0) is not None
+
+
+def test_slow_client_steps_down_and_back_up():
+    hub = StreamHub(DEFAULT, encoder=JpegEncoder(use_turbojpeg=False))
+    client = hub.subscribe(StreamProfile.create(1280, 90, 30), adaptive=True)
+    client.window = 0.0  # Jede Meldung schließt ein Messfenster ab
+
+    # Senden dauert länger als das Fenster -> Engpass
+    client.report_sent(100000, seconds=10.0)
+    assert client.level == 1 and client.switches == 1
+
+    for _ in range(3):
+        client.report_sent(1000, seconds=0.0)
+    assert client.level == 0
+    assert client.profile == client.requested
+
+
+def test_hub_client_limit_holds_under_concurrent_subscribe():
+    hub = StreamHub(DEFAULT, max_clients=3, encoder=JpegEncoder(use_turbojpeg=False))
+    accepted, rejected = [], []
+    barrier = threading.Barrier(20)
+
+    def worker():
+        barrier.wait()
+        try:
+            accepted.append(hub.subscribe(adaptive=False))
+        except TooManyClientsError:
+            rejected.append(True)
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5.0)
+    assert len(accepted) == 3 and len(rejected) == 17
+    assert hub.client_count() == 3 and hub.get_stats()['clients'] == 3
+
+    accepted[0].close()
+    assert hub.client_count() == 2
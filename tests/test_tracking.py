@@ -0,0 +1,104 @@
+import os
+import time
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+sv = pytest.importorskip('supervision')
+
+from tracking import CropWriter, PotholeTracker, crop_box, encode_thumbnail
+
+
+def frame(value=0):
+    return np.full((100, 200, 3), value, dtype=np.uint8)
+
+
+def detections(confidence, box=(50, 40, 90, 70)):
+    return sv.Detections(xyxy=np.array([box], dtype=np.float32),
+                         confidence=np.array([confidence], dtype=np.float32),
+                         class_id=np.array([0]))
+
+
+def empty():
+    return sv.Detections.empty()
+
+
+# ---------- PotholeTracker ----------
+
+def test_one_event_per_pothole_with_best_crop():
+    events = []
+    tracker = PotholeTracker(events.append, lost_track_buffer=2, min_hits=3)
+    for i, confidence in enumerate([0.6, 0.9, 0.7, 0.8]):
+        tracker.update(frame(i * 50), detections(confidence), context={'frame': i})
+    assert events == []
+    for _ in range(5):
+        tracker.update(frame(), empty())
+
+    assert len(events) == 1
+    event = events[0]
+    assert event['confidence'] == pytest.approx(0.9, abs=1e-4)
+    assert event['context'] == {'frame': 1}   # Kontext des besten Treffers
+    assert event['crop'][0, 0, 0] == 50       # Crop aus dem Frame mit der besten Confidence
+    assert event['hits'] >= 3
+    assert tracker.get_stats()['unique_total'] == 1 and tracker.get_stats()['active_tracks'] == 0
+
+
+def test_short_tracks_are_suppressed():
+    events = []
+    tracker = PotholeTracker(events.append, lost_track_buffer=1, min_hits=3)
+    tracker.update(frame(), detections(0.9))
+    for _ in range(3):
+        tracker.update(frame(), empty())
+    assert events == []
+    assert tracker.suppressed == 1 and tracker.unique_total == 0
+
+
+def test_flush_ends_open_tracks():
+    events = []
+    tracker = PotholeTracker(events.append, lost_track_buffer=30, min_hits=2)
+    for _ in range(3):
+        tracker.update(frame(), detections(0.8))
+    assert tracker.get_stats()['active_tracks'] == 1
+    tracker.flush()
+    assert len(events) == 1 and tracker.get_stats()['active_tracks'] == 0
+    tracker.flush()
+    assert len(events) == 1
+
+
+# ---------- Crops ----------
+
+def test_crop_box_pads_and_clips_to_frame():
+    image = np.arange(100 * 200 * 3, dtype=np.uint32).reshape(100, 200, 3)
+    crop = crop_box(image, (10, 10, 30, 20), padding=0.5)
+    assert crop.shape == (21, 41, 3)   # 10px bzw. 5px Rand auf jeder Seite
+    assert crop_box(image, (-20, -20, 5, 5), padding=0).shape == (6, 6, 3)
+    assert crop_box(image, (300, 300, 400, 400)) is None
+    crop[:] = 0
+    assert image[10, 10, 0] != 0      # Kopie, kein View
+
+
+def test_encode_thumbnail_shrinks_only_wide_crops():
+    wide = encode_thumbnail(np.zeros((50, 400, 3), dtype=np.uint8), width=100)
+    assert cv2.imdecode(np.frombuffer(wide, np.uint8), cv2.IMREAD_COLOR).shape == (12, 100, 3)
+    small = encode_thumbnail(np.zeros((20, 40, 3), dtype=np.uint8), width=100)
+    assert cv2.imdecode(np.frombuffer(small, np.uint8), cv2.IMREAD_COLOR).shape == (20, 40, 3)
+
+
+def test_crop_writer_saves_in_background_and_flushes_on_stop(tmp_path):
+    writer = CropWriter(str(tmp_path / 'crops'))
+    assert writer._thread is None  # Startet erst mit dem ersten Crop
+    paths = [writer.submit(f'crop_{i}.jpg', frame(i)) for i in range(3)]
+    writer.stop()
+    assert all(os.path.exists(path) for path in paths)
+    assert writer.get_stats()['written'] == 3 and writer.get_stats()['pending'] == 0
+
+
+def test_crop_writer_drops_when_queue_is_full(tmp_path, monkeypatch):
+    writer = CropWriter(str(tmp_path), max_pending=2)
+    monkeypatch.setattr(writer, 'start', lambda: None)   # Kein Thread - nichts wird abgearbeitet
+    assert writer.submit('a.jpg', frame()) and writer.submit('b.jpg', frame())
+    start = time.perf_counter()
+    assert writer.submit('c.jpg', frame()) is None
+    assert time.perf_counter() - start < 0.1   # Blockiert nicht
+    assert writer.get_stats()['dropped'] == 1
@@ -0,0 +1,248 @@
+"""
+PyResearch Schlagloch-Tracking
+
+ByteTrack (supervision) vergibt über die Frames hinweg stabile Track-IDs. Pro
+Track merkt sich der PotholeTracker die beste Confidence samt Bildausschnitt
+(Crop) und Kontext (z.B. GPS-Fix in diesem Moment). Endet ein Track - also ist
+das Schlagloch lost_track_buffer Inferenz-Schritte lang nicht mehr zu sehen -,
+wird genau ein Event für dieses Schlagloch ausgelöst.
+
+So wird ein Schlagloch, das 30 Frames lang im Bild ist, einmal gezählt und
+einmal gespeichert statt bei jedem Anstieg der Detection-Anzahl. Die Crops
+schreibt der CropWriter im Hintergrund, damit der Inferenz-Thread keine
+Disk-I/O macht.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+import cv2
+import supervision as sv
+
+logger = logging.getLogger(__name__)
+
+
+class TrackState:
+    """Verlauf eines Tracks: Treffer, beste Confidence, bester Crop"""
+
+    def __init__(self, track_id, update_index, now):
+        self.track_id = track_id
+        self.first_seen = now
+        self.last_seen = now
+        self.last_update = update_index
+        self.hits = 0
+        self.confidence = 0.0
+        self.box = None
+        self.class_id = None
+        self.crop = None
+        self.context = None
+
+    def observe(self, frame, box, confidence, class_id, update_index, now, padding, context):
+        self.hits += 1
+        self.last_seen = now
+        self.last_update = update_index
+        if self.box is not None and confidence <= self.confidence:
+            return
+        self.confidence = confidence
+        self.box = [int(v) for v in box]
+        self.class_id = class_id
+        self.context = context
+        self.crop = crop_box(frame, box, padding)
+
+    def to_event(self):
+        return {
+            'track_id': self.track_id,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'duration': round(self.last_seen - self.first_seen, 2),
+            'hits': self.hits,
+            'confidence': round(self.confidence, 4),
+            'box': self.box,
+            'class_id': self.class_id,
+            'context': self.context,
+            'crop': self.crop
+        }
+
+
+def crop_box(frame, box, padding=0.1):
+    """Kopie des Bildausschnitts um box (mit Rand in Prozent der Box-Größe)"""
+    height, width = frame.shape[:2]
+    x1, y1, x2, y2 = box
+    pad_x = (x2 - x1) * padding
+    pad_y = (y2 - y1) * padding
+    x1, y1 = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+    x2, y2 = min(width, int(x2 + pad_x) + 1), min(height, int(y2 + pad_y) + 1)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return frame[y1:y2, x1:x2].copy()
+
+
+def encode_thumbnail(crop, width, quality=80):
+    """Verkleinertes JPEG des Crops -> bytes (eigene Puffer, unabhängig vom Stream-Encoder)"""
+    height = crop.shape[0]
+    if crop.shape[1] > width:
+        height = max(1, round(crop.shape[0] * width / crop.shape[1]))
+        crop = cv2.resize(crop, (width, height), interpolation=cv2.INTER_AREA)
+    success, buffer = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not success:
+        raise ValueError("Vorschaubild konnte nicht kodiert werden")
+    return buffer.tobytes()
+
+
+class CropWriter:
+    """Speichert Schlagloch-Crops im Hintergrund-Thread
+
+    submit() blockiert nie - ist die Queue voll (Disk zu langsam), wird der Crop
+    verworfen und gezählt statt den Inferenz-Thread aufzuhalten. Der Thread
+    startet erst mit dem ersten Crop.
+    """
+
+    def __init__(self, directory, max_pending=32):
+        self.directory = directory
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='crop-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stoppt den Writer - noch ausstehende Crops werden vorher gespeichert"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, filename, crop):
+        """Reiht einen Crop ein -> Pfad der Datei (None wenn verworfen)"""
+        self.start()
+        path = os.path.join(self.directory, filename)
+        try:
+            self._queue.put_nowait((path, crop))
+        except queue.Full:
+            self.dropped += 1
+            return None
+        return path
+
+    def _write(self, path, crop):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if cv2.imwrite(path, crop):
+                self.written += 1
+                return
+        except (OSError, cv2.error) as e:
+            logger.warning(f"Crop konnte nicht gespeichert werden ({path}): {e}")
+        self.errors += 1
+
+    def _run(self):
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            try:
+                path, crop = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self._write(path, crop)
+
+    def get_stats(self):
+        return {
+            'directory': self.directory,
+            'written': self.written,
+            'pending': self._queue.qsize(),
+            'dropped': self.dropped,
+            'errors': self.errors
+        }
+
+
+class PotholeTracker:
+    """ByteTrack plus Track-Verlauf - on_track_end(event) wird einmal pro Schlagloch aufgerufen
+
+    update() nur mit echten Inferenz-Ergebnissen aufrufen (nicht mit vom
+    Scheduler übernommenen Detections) - lost_track_buffer zählt Inferenz-Schritte.
+    Tracks mit weniger als min_hits Treffern gelten als Fehl-Detection.
+    """
+
+    def __init__(self, on_track_end=None, track_thresh=0.25, lost_track_buffer=30, match_thresh=0.8,
+                 frame_rate=30, min_hits=3, crop_padding=0.1):
+        self.on_track_end = on_track_end
+        self.lost_track_buffer = lost_track_buffer
+        self.min_hits = min_hits
+        self.crop_padding = crop_padding
+        self._tracker_args = dict(
+            track_thresh=track_thresh,
+            track_buffer=lost_track_buffer,
+            match_thresh=match_thresh,
+            frame_rate=frame_rate
+        )
+        self._lock = threading.Lock()
+        self._tracker = sv.ByteTrack(**self._tracker_args)
+        self._tracks = {}
+        self._updates = 0
+        self.unique_total = 0
+        self.suppressed = 0
+
+    def update(self, frame, detections, context=None):
+        """Ordnet die Detections Tracks zu -> Detections mit tracker_id (nur bestätigte Tracks)"""
+        now = time.time()
+        with self._lock:
+            self._updates += 1
+            tracked = self._tracker.update_with_detections(detections)
+            confidences = tracked.confidence if tracked.confidence is not None else [1.0] * len(tracked)
+            class_ids = tracked.class_id if tracked.class_id is not None else [None] * len(tracked)
+            for box, track_id, confidence, class_id in zip(tracked.xyxy, tracked.tracker_id, confidences, class_ids):
+                track_id = int(track_id)
+                state = self._tracks.get(track_id)
+                if state is None:
+                    state = self._tracks[track_id] = TrackState(track_id, self._updates, now)
+                state.observe(frame, box, float(confidence), None if class_id is None else int(class_id),
+                              self._updates, now, self.crop_padding, context)
+            ended = [state for state in self._tracks.values()
+                     if self._updates - state.last_update > self.lost_track_buffer]
+            finished = self._finish(ended)
+        self._emit(finished)
+        return tracked
+
+    def _finish(self, states):
+        """Entfernt beendete Tracks -> Events der echten Schlaglöcher (unter self._lock)"""
+        finished = []
+        for state in states:
+            del self._tracks[state.track_id]
+            if state.hits < self.min_hits:
+                self.suppressed += 1
+                continue
+            self.unique_total += 1
+            finished.append(state.to_event())
+        return finished
+
+    def _emit(self, events):
+        if self.on_track_end is None:
+            return
+        for event in events:
+            self.on_track_end(event)
+
+    def flush(self):
+        """Beendet alle offenen Tracks (z.B. Kamera-Wechsel, Server-Ende) und setzt ByteTrack zurück"""
+        with self._lock:
+            finished = self._finish(list(self._tracks.values()))
+            self._tracker = sv.ByteTrack(**self._tracker_args)
+        self._emit(finished)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'active_tracks': len(self._tracks),
+                'unique_total': self.unique_total,
+                'suppressed': self.suppressed,
+                'updates': self._updates,
+                'lost_track_buffer': self.lost_track_buffer,
+                'min_hits': self.min_hits
+            }
@@ -0,0 +1,163 @@
+"""
+PyResearch Visualizer
+
+YOLO Modell laden, Detection (einzeln oder als Batch) und Annotation. Das Modul
+hat keine Seiteneffekte beim Import (kein Flask, keine Log-Dateien, keine
+Threads) - batch_process.py lädt es in jedem Worker-Prozess.
+
+Der Live-Stream erweitert die Klasse in app.py um Scheduler, Tracking, Events
+und GPS-Logging (LiveVisualizer).
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import supervision as sv
+
+from backends import LetterboxBuffer, load_model
+
+logger = logging.getLogger(__name__)
+
+# PyResearch Configuration Constants
+PR_MODEL_PATH = "best.pt"
+PR_BACKEND_CONFIG = {
+    # Inferenz-Backend: 'pytorch' (Standard), 'onnx' (ONNX Runtime) oder 'openvino'
+    # Der Export wird einmalig neben best.pt abgelegt (siehe backends.py)
+    'backend': os.environ.get('PR_BACKEND', 'pytorch'),
+    'imgsz': 640,
+    'int8': os.environ.get('PR_INT8', '0') == '1',  # INT8-Quantisierung (braucht Kalibrierungs-Frames)
+    'calibration_source': 'calibration',            # Bild-Verzeichnis oder Video aus dem Fahrzeug
+    'calibration_frames': 200,
+    'fallback': True                                # Bei Fehlern auf PyTorch zurückfallen
+}
+PR_INFERENCE_CONFIG = {
+    'width': 640,  # Breite des Inferenz-Bildes (Stream bleibt in voller Auflösung)
+    # Region of Interest relativ zum Frame (x1, y1, x2, y2), z.B. (0, 0.4, 1, 1) = nur die Straße
+    # unten im Bild. None = ganzer Frame
+    'roi': None
+}
+
+
+def check_model_exists():
+    """Prüft ob das Modell existiert"""
+    if not os.path.exists(PR_MODEL_PATH):
+        raise FileNotFoundError(f"Modell-Datei '{PR_MODEL_PATH}' nicht gefunden!")
+    return True
+
+
+class PyResearchVisualizer:
+    """PyResearch Standard Visualization Engine
+
+    observer(stufe, sekunden) bekommt die Dauer jedes Modell-Aufrufs ('yolo'), z.B. für /metrics.
+    """
+
+    def __init__(self, observer=None):
+        try:
+            check_model_exists()
+            # PyTorch 2.6 Fix (weights_only=False) steckt in backends.load_model
+            logger.info(f"Lade YOLO Modell (Backend: {PR_BACKEND_CONFIG['backend']})...")
+            self.model, self.backend_info = load_model(PR_MODEL_PATH, **PR_BACKEND_CONFIG)
+            logger.info(f"✓✓✓ YOLO Modell erfolgreich geladen! ({self.backend_info['backend']}"
+                        f"{', INT8' if self.backend_info['int8'] else ''})")
+        except FileNotFoundError as e:
+            raise e
+        except Exception as e:
+            raise Exception(f"Fehler beim Laden des Modells: {str(e)}")
+
+        self.observer = observer
+        # Wiederverwendete Vorverarbeitungs-Puffer (pro Frame-Größe) und Lock für den Modell-Aufruf
+        self.letterboxes = {}
+        self.inference_lock = threading.Lock()
+
+        self.box_annotator = sv.BoundingBoxAnnotator(
+            thickness=2,
+            color=sv.Color.from_hex("#0055FF")
+        )
+        self.label_annotator = sv.LabelAnnotator(
+            text_scale=0.7,
+            text_thickness=1,
+            text_color=sv.Color.WHITE,
+            text_padding=10
+        )
+
+    def _observe(self, stage, seconds):
+        if self.observer is not None:
+            self.observer(stage, seconds)
+
+    def _letterbox(self, frame_shape, max_batch=1):
+        """Puffer pro Frame-Größe und Batch-Größe (nur unter self.inference_lock aufrufen)"""
+        key = (frame_shape, max_batch)
+        if key not in self.letterboxes:
+            self.letterboxes[key] = LetterboxBuffer(
+                width=PR_INFERENCE_CONFIG['width'],
+                roi=PR_INFERENCE_CONFIG['roi'],
+                max_batch=max_batch
+            )
+        return self.letterboxes[key]
+
+    def _infer(self, frames, max_batch=1):
+        """Modell-Aufruf auf dem verkleinerten ROI, Boxen zurück in Frame-Koordinaten
+
+        Live-Stream und Multi-Kamera-Batch teilen sich Modell und Puffer - beides
+        nur unter self.inference_lock.
+        """
+        with self.inference_lock:
+            letterbox = self._letterbox(frames[0].shape, max_batch)
+            start = time.perf_counter()
+            results = self.model(letterbox.prepare(frames))
+            detections = [sv.Detections.from_ultralytics(result) for result in results]
+            self._observe('yolo', time.perf_counter() - start)
+        for frame_detections in detections:
+            frame_detections.xyxy = letterbox.remap(frame_detections.xyxy)
+        return detections
+
+    def detect(self, frame):
+        """YOLO Detection für einen einzelnen Frame"""
+        return self._infer([frame])[0]
+
+    def warmup(self, runs=3, frame_size=(720, 1280)):
+        """Dummy-Inferenzen (Graph-Optimierung, Speicher-Allokation) -> Laufzeiten in Sekunden"""
+        dummy = np.zeros((frame_size[0], frame_size[1], 3), dtype=np.uint8)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            self.detect(dummy)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    def detect_batch(self, frames, max_batch=4):
+        """YOLO Detection für mehrere Frames in einem einzigen Modell-Aufruf (pro Frame-Größe)"""
+        frames = list(frames)
+        detections = [None] * len(frames)
+        groups = {}
+        for i, frame in enumerate(frames):
+            groups.setdefault(frame.shape, []).append(i)
+        for indices in groups.values():
+            for start in range(0, len(indices), max_batch):
+                chunk = indices[start:start + max_batch]
+                for i, result in zip(chunk, self._infer([frames[i] for i in chunk], max_batch)):
+                    detections[i] = result
+        return detections
+
+    def get_inference_stats(self):
+        """Eingabe-Größe und Pixel-Anteil pro Frame-Größe"""
+        return [letterbox.get_stats() for letterbox in list(self.letterboxes.values())]
+
+    def annotate(self, frame, detections):
+        """Zeichnet Bounding-Boxen und Labels in den Frame"""
+        annotated_frame = self.box_annotator.annotate(
+            scene=frame,
+            detections=detections
+        )
+        labels = None
+        if detections.tracker_id is not None:
+            labels = [f"Pothole #{int(track_id)}" for track_id in detections.tracker_id]
+        annotated_frame = self.label_annotator.annotate(
+            scene=annotated_frame,
+            detections=detections,
+            labels=labels
+        )
+
+        return annotated_frame